@@ -0,0 +1,423 @@
+# encoding: utf-8
+"""
+                   GNU GENERAL PUBLIC LICENSE
+                       Version 3, 29 June 2007
+ Copyright (C) 2007 Free Software Foundation, Inc. <http://fsf.org/>
+ Everyone is permitted to copy and distribute verbatim copies
+ of this license document, but changing it is not allowed.
+ """
+
+__author__ = "Yoann Berenguer"
+__credits__ = ["Yoann Berenguer"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Yoann Berenguer"
+__email__ = "yoyoberenguer@hotmail.com"
+__status__ = "Joystick Demo"
+
+import json
+import time
+
+import numpy
+
+from InputServer import EVENT_DTYPE, KIND_BUTTON, KIND_AXIS, KIND_HAT, KIND_REMOVED
+
+KIND_NAMES = {KIND_BUTTON: 'button', KIND_AXIS: 'axis', KIND_HAT: 'hat', KIND_REMOVED: 'removed'}
+
+# Percentiles reported by the analyzer
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def group_percentiles(values_: numpy.ndarray, groups_: numpy.ndarray, count_: int,
+                      percentiles_: tuple = PERCENTILES) -> numpy.ndarray:
+    """
+    Percentiles (nearest rank) of values_ for every group, without python loops.
+
+    :param values_: 1D numpy array
+    :param groups_: 1D numpy array (int) same length as values_, group number of each value
+    :param count_: number of groups
+    :param percentiles_: percentiles in range [0, 1]
+    :return: 2D numpy array (count_, len(percentiles_)), nan for empty groups
+    """
+    result = numpy.full((count_, len(percentiles_)), numpy.nan)
+    if values_.size == 0:
+        return result
+    order = numpy.lexsort((values_, groups_))
+    sorted_values = values_[order]
+    sizes = numpy.bincount(groups_, minlength=count_)
+    offsets = numpy.concatenate(([0], numpy.cumsum(sizes)[:-1]))
+    ranks = numpy.round((sizes[:, numpy.newaxis] - 1) * numpy.asarray(percentiles_)).astype(numpy.int64)
+    valid = sizes > 0
+    result[valid] = sorted_values[(offsets[:, numpy.newaxis] + ranks)[valid]]
+    return result
+
+
+# Polling rate and jitter analyzer
+# Input records (see InputSampler) are kept over a rolling window, statistics are
+# computed per device and per input (button, axis, hat) with vectorized numpy operations.
+# e.g
+# ANALYZER = PollingAnalyzer(window_=5.0)
+# ANALYZER.feed(SAMPLER.drain())
+# report = ANALYZER.report()
+# ANALYZER.export('polling_report.json')
+
+class PollingAnalyzer:
+
+    def __init__(self, window_: float = 5.0, capacity_: int = 1 << 16, interval_: float = 0.5):
+        """
+        :param window_: rolling window in seconds
+        :param capacity_: maximum number of records kept in the window
+        :param interval_: minimum time between two computations of the report (seconds),
+                          report() returns the previous report in between
+        """
+        self.window = int(window_ * 1e9)
+        self.capacity = capacity_
+        # records are appended at self.size, the second half is used to avoid a copy per call to feed
+        self.buffer = numpy.zeros(capacity_ * 2, dtype=EVENT_DTYPE)
+        self.start = 0
+        self.size = 0
+        self.interval = interval_
+        self.last_report = None
+        self.last_time = 0.0
+
+    def feed(self, records_: numpy.ndarray):
+        """ Add input records (EVENT_DTYPE) to the rolling window. """
+        n = len(records_)
+        if n == 0:
+            return
+        if n >= self.capacity:
+            records_ = records_[-self.capacity:]
+            n = self.capacity
+            self.start = self.size = 0
+        elif self.size + n > len(self.buffer):
+            # move the most recent records to the front of the buffer
+            keep = min(self.size - self.start, self.capacity - n)
+            self.buffer[:keep] = self.buffer[self.size - keep:self.size]
+            self.start, self.size = 0, keep
+        self.buffer[self.size:self.size + n] = records_
+        self.size += n
+
+        # drop the records older than the window (and over capacity)
+        records = self.buffer[self.start:self.size]
+        cutoff = records['time'][-1] - self.window
+        self.start += int(numpy.searchsorted(records['time'], cutoff, side='left'))
+        self.start = max(self.start, self.size - self.capacity)
+
+    def records(self) -> numpy.ndarray:
+        """ Return the records of the rolling window (view). """
+        return self.buffer[self.start:self.size]
+
+    def compute(self) -> dict:
+        """
+        Compute the statistics of the rolling window.
+
+        Records delivered in the same poll share the same timestamp and are counted as one report.
+        For each input: number of reports, effective report rate (Hz), inter-arrival interval
+        percentiles (ms), jitter percentiles (absolute deviation from the median interval, ms),
+        duplicated reports (same value twice in a row) and dropped reports (axis and hat intervals
+        between 1.5 and 10 x the median interval, counted in median intervals).
+
+        :return: python dictionary {device: {'rate_hz': .., 'jitter_ms': .., 'inputs': {name: {...}}}}
+        """
+        records = self.records()
+        report = {}
+        if len(records) < 2:
+            return report
+
+        # group records by (device, kind, index), time ordered
+        order = numpy.lexsort((records['time'], records['index'], records['kind'], records['device']))
+        r = records[order]
+        key = (r['device'].astype(numpy.int64) << 32) | (r['kind'].astype(numpy.int64) << 16) | \
+            r['index'].astype(numpy.int64)
+        first = numpy.concatenate(([True], key[1:] != key[:-1]))
+        group = numpy.cumsum(first) - 1
+        count = int(group[-1]) + 1
+        starts = numpy.flatnonzero(first)
+
+        same = ~first[1:]
+        dt = numpy.diff(r['time'])
+        # records of the same poll (dt == 0) belong to the same report
+        valid = same & (dt > 0)
+        igroup = group[1:][valid]
+        intervals = dt[valid].astype(numpy.float64)
+        duplicated = numpy.bincount(group[1:][same & (r['value'][1:] == r['value'][:-1])], minlength=count)
+
+        reports = numpy.bincount(igroup, minlength=count) + 1
+        duration = numpy.bincount(igroup, weights=intervals, minlength=count)
+        interval_p = group_percentiles(intervals, igroup, count)
+        median = interval_p[:, 0]
+        deviation = numpy.abs(intervals - median[igroup])
+        jitter_p = group_percentiles(deviation, igroup, count)
+        # gaps longer than 10 median intervals are idle periods (SDL only reports changes),
+        # buttons are not periodic and never counted as dropped.
+        late = (intervals > 1.5 * median[igroup]) & (intervals < 10 * median[igroup]) & \
+            (r['kind'][1:][valid] != KIND_BUTTON)
+        dropped = numpy.bincount(igroup[late], weights=numpy.round(intervals[late] / median[igroup][late]) - 1,
+                                 minlength=count)
+
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            rate = numpy.where(duration > 0, (reports - 1) / (duration * 1e-9), 0.0)
+
+        for g in range(count):
+            s = starts[g]
+            device, kind, index = int(r['device'][s]), int(r['kind'][s]), int(r['index'][s])
+            entry = report.setdefault(device, {'inputs': {}})
+            entry['inputs']['%s %d' % (KIND_NAMES.get(kind, kind), index)] = {
+                'reports': int(reports[g]),
+                'rate_hz': round(float(rate[g]), 2),
+                'interval_ms': [round(float(v) * 1e-6, 3) for v in interval_p[g]],
+                'jitter_ms': [round(float(v) * 1e-6, 3) for v in jitter_p[g]],
+                'duplicated': int(duplicated[g]),
+                'dropped': int(dropped[g])}
+
+        # device level, one report per distinct timestamp
+        for device in report:
+            times = numpy.unique(records['time'][records['device'] == device])
+            intervals = numpy.diff(times).astype(numpy.float64)
+            entry = report[device]
+            entry['rate_hz'] = round(float(len(intervals) / (intervals.sum() * 1e-9)), 2) if intervals.size else 0.0
+            if intervals.size:
+                median = numpy.median(intervals)
+                jitter = numpy.quantile(numpy.abs(intervals - median), PERCENTILES)
+                entry['interval_ms'] = round(float(median) * 1e-6, 3)
+                entry['jitter_ms'] = [round(float(v) * 1e-6, 3) for v in jitter]
+            else:
+                entry['interval_ms'] = 0.0
+                entry['jitter_ms'] = [0.0] * len(PERCENTILES)
+            entry['duplicated'] = sum(i['duplicated'] for i in entry['inputs'].values())
+            entry['dropped'] = sum(i['dropped'] for i in entry['inputs'].values())
+        return report
+
+    def report(self) -> dict:
+        """ Return the statistics (see compute), computed at most every self.interval seconds. """
+        now = time.perf_counter()
+        if self.last_report is None or now - self.last_time >= self.interval:
+            self.last_report = self.compute()
+            self.last_time = now
+        return self.last_report
+
+    def export(self, file: str) -> dict:
+        """ Write the statistics of the rolling window to a JSON file, return the report. """
+        report = self.compute()
+        document = {'window_s': self.window * 1e-9,
+                    'percentiles': list(PERCENTILES),
+                    'devices': {str(device): entry for device, entry in report.items()}}
+        with open(file, 'w') as file_:
+            json.dump(document, file_, indent=2)
+        return report
+
+
+def stick_positions(records_: numpy.ndarray, axes_: tuple, last_: tuple) -> tuple:
+    """
+    Positions of a stick rebuilt from its axis records, without python loops.
+    Each record takes the last known value of the other axis (forward fill), records
+    delivered in the same poll (same timestamp) form a single position.
+
+    :param records_: input records (EVENT_DTYPE) of a single device
+    :param axes_: (X axis, Y axis) of the stick
+    :param last_: (x, y) position before the first record
+    :return: tuple (numpy array (n, 2) float32 of (x, y) positions, last (x, y) position)
+    """
+    ax, ay = axes_
+    r = records_[(records_['kind'] == KIND_AXIS) & ((records_['index'] == ax) | (records_['index'] == ay))]
+    if len(r) == 0:
+        return numpy.zeros((0, 2), dtype=numpy.float32), last_
+    position = numpy.arange(len(r))
+    is_x = r['index'] == ax
+    last_x = numpy.maximum.accumulate(numpy.where(is_x, position, -1))
+    last_y = numpy.maximum.accumulate(numpy.where(is_x, -1, position))
+    values = r['value']
+    x = numpy.where(last_x >= 0, values[last_x], last_[0])
+    y = numpy.where(last_y >= 0, values[last_y], last_[1])
+    keep = numpy.concatenate((r['time'][1:] != r['time'][:-1], [True]))
+    return numpy.column_stack((x[keep], y[keep])).astype(numpy.float32), (float(x[-1]), float(y[-1]))
+
+
+# Analog stick analyzer
+# Stick positions (x, y) are rebuilt from the axis records of the registered sticks, each
+# batch of new positions updates per stick accumulators with vectorized numpy operations
+# (envelope per angle bucket, smallest moved radius, saturation counters). Only a small ring
+# of released positions is kept for the centre and the noise floor, computing the report
+# does not depend on the number of samples.
+# Circularity : outer envelope (largest radius) per angle bucket, error against the unit circle
+# Centre drift: median position of the released stick (radius below rest_)
+# Noise floor : 95th percentile of the distance to the centre of the released stick
+# Dead zone   : smallest radius reported outside the centre
+# Saturation  : fraction of the deflected samples pinned at the end of the range
+# e.g
+# STICKS = StickAnalyzer()
+# STICKS.register(device, [(0, 1), (2, 3)])      # X and Y axes of each stick
+# STICKS.feed(SAMPLER.drain())
+# report = STICKS.report()[device][0]           # {'drift': .., 'dead_zone': .., 'envelope': [..], ...}
+
+class StickAnalyzer:
+
+    def __init__(self, capacity_: int = 4096, buckets_: int = 36, rest_: float = 0.2,
+                 outer_: float = 0.5, limit_: float = 0.999, interval_: float = 0.5):
+        """
+        :param capacity_: number of released positions kept per stick (centre drift, noise floor)
+        :param buckets_: number of angle buckets of the circularity analysis
+        :param rest_: radius below which the stick is considered released (centre drift, noise floor)
+        :param outer_: minimum radius of the samples used by the circularity and saturation analysis
+        :param limit_: axis value (or radius) considered as the end of the range (saturation)
+        :param interval_: minimum time between two computations of the report (seconds)
+        """
+        self.capacity = capacity_
+        self.buckets = buckets_
+        self.rest = rest_
+        self.outer = outer_
+        self.limit = limit_
+        self.interval = interval_
+        self.sticks = {}  # device -> [stick accumulators (see new_stick), ..]
+        self.last_report = None
+        self.last_time = 0.0
+
+    def new_stick(self, axes_: tuple) -> dict:
+        """ Empty accumulators of a stick. """
+        return {'axes': tuple(axes_),
+                'last': (0.0, 0.0),  # position after the last record
+                'samples': 0,
+                'envelope': numpy.zeros(self.buckets),  # largest radius per angle bucket
+                'counts': numpy.zeros(self.buckets, dtype=numpy.int64),  # deflected samples per bucket
+                'dead_zone': numpy.inf,  # smallest radius outside the centre
+                'max_radius': 0.0,
+                'outer': 0,  # deflected samples (radius above outer_)
+                'pinned': 0,  # deflected samples at the end of the range
+                'released': numpy.zeros((self.capacity, 2), dtype=numpy.float32),  # ring of released positions
+                'rest': 0}  # number of released positions written into the ring
+
+    def register(self, device_: int, sticks_: list):
+        """
+        Declare the sticks of a device, the accumulators are kept
+        when the same axes are registered again.
+        :param device_: device instance id
+        :param sticks_: list of (X axis, Y axis) tuples
+        """
+        previous = {stick['axes']: stick for stick in self.sticks.get(device_, [])}
+        self.sticks[device_] = [previous.get(tuple(axes)) or self.new_stick(axes) for axes in sticks_]
+        self.last_report = None
+
+    def remove(self, device_: int):
+        """ Forget a device and its accumulators. """
+        self.sticks.pop(device_, None)
+        self.last_report = None
+
+    def clear(self):
+        """ Reset the accumulators of all the sticks. """
+        for device, sticks in self.sticks.items():
+            self.sticks[device] = [self.new_stick(stick['axes']) for stick in sticks]
+        self.last_report = None
+
+    def accumulate(self, stick_: dict, samples_: numpy.ndarray):
+        """ Update the accumulators of a stick with new positions (n, 2). """
+        x = samples_[:, 0].astype(numpy.float64)
+        y = samples_[:, 1].astype(numpy.float64)
+        radius = numpy.hypot(x, y)
+        stick_['samples'] += len(samples_)
+        stick_['max_radius'] = max(stick_['max_radius'], float(radius.max()))
+        # one quantization step of a 16 bit axis
+        moved = radius[radius > 1.5 / 32767]
+        if moved.size:
+            stick_['dead_zone'] = min(stick_['dead_zone'], float(moved.min()))
+
+        released = samples_[radius < self.rest][-self.capacity:]
+        if len(released):
+            ring = stick_['released']
+            ring[(stick_['rest'] + numpy.arange(len(released))) % self.capacity] = released
+            stick_['rest'] += len(released)
+
+        outer = radius >= self.outer
+        if outer.any():
+            xo, yo, ro = x[outer], y[outer], radius[outer]
+            bucket = ((numpy.arctan2(yo, xo) + numpy.pi) * (self.buckets / (2 * numpy.pi))).astype(numpy.int64) \
+                % self.buckets
+            numpy.maximum.at(stick_['envelope'], bucket, ro)
+            stick_['counts'] += numpy.bincount(bucket, minlength=self.buckets)
+            stick_['outer'] += len(ro)
+            stick_['pinned'] += int(numpy.count_nonzero((numpy.maximum(numpy.abs(xo), numpy.abs(yo)) >= self.limit) |
+                                                        (ro >= self.limit)))
+
+    def feed(self, records_: numpy.ndarray):
+        """ Add the stick positions of input records (EVENT_DTYPE), one sample per poll. """
+        if len(records_) == 0 or not self.sticks:
+            return
+        records_ = records_[records_['kind'] == KIND_AXIS]
+        for device, sticks in self.sticks.items():
+            records = records_[records_['device'] == device]
+            if len(records) == 0:
+                continue
+            for stick in sticks:
+                samples, stick['last'] = stick_positions(records, stick['axes'], stick['last'])
+                if len(samples):
+                    self.accumulate(stick, samples)
+
+    def analyse(self, stick_: dict) -> dict:
+        """
+        Analysis of a stick from its accumulators.
+        :param stick_: stick accumulators (see new_stick)
+        :return: python dictionary, nan when there is not enough data (e.g no released samples)
+                 'envelope' and 'error' are numpy arrays (buckets,), nan for the buckets not reached
+        """
+        released = stick_['released'][:min(stick_['rest'], self.capacity)].astype(numpy.float64)
+        if len(released):
+            centre = numpy.median(released, axis=0)
+            noise = float(numpy.percentile(numpy.hypot(released[:, 0] - centre[0], released[:, 1] - centre[1]), 95))
+        else:
+            centre = numpy.full(2, numpy.nan)
+            noise = numpy.nan
+
+        reached = stick_['counts'] > 0
+        envelope = numpy.where(reached, stick_['envelope'], numpy.nan)
+        error = envelope - 1.0
+        return {'samples': stick_['samples'],
+                'centre': centre,
+                'drift': float(numpy.hypot(centre[0], centre[1])),
+                'noise': noise,
+                'dead_zone': float(stick_['dead_zone']) if numpy.isfinite(stick_['dead_zone']) else numpy.nan,
+                'saturation': stick_['pinned'] / stick_['outer'] if stick_['outer'] else numpy.nan,
+                'max_radius': stick_['max_radius'] if stick_['samples'] else numpy.nan,
+                'coverage': float(reached.mean()),
+                'circularity_error': float(numpy.abs(error[reached]).mean() * 100) if reached.any() else numpy.nan,
+                'envelope': envelope,
+                'error': error}
+
+    def compute(self) -> dict:
+        """
+        Analyse every registered stick (see analyse).
+        :return: python dictionary {device: [{'axes': (x, y), ...analysis}, ..]}
+        """
+        report = {}
+        for device, sticks in self.sticks.items():
+            entries = report[device] = []
+            for stick in sticks:
+                entry = self.analyse(stick)
+                entry['axes'] = stick['axes']
+                entries.append(entry)
+        return report
+
+    def report(self) -> dict:
+        """ Return the analysis (see compute), computed at most every self.interval seconds. """
+        now = time.perf_counter()
+        if self.last_report is None or now - self.last_time >= self.interval:
+            self.last_report = self.compute()
+            self.last_time = now
+        return self.last_report
+
+    def export(self, file: str) -> dict:
+        """ Write the stick analysis to a JSON file (nan written as null), return the report. """
+        report = self.compute()
+
+        def rounded(value_):
+            if isinstance(value_, numpy.ndarray):
+                return [rounded(v) for v in value_.tolist()]
+            if isinstance(value_, float):
+                return None if numpy.isnan(value_) else round(value_, 4)
+            return list(value_) if isinstance(value_, tuple) else value_
+
+        document = {'buckets': self.buckets, 'rest': self.rest, 'outer': self.outer,
+                    'devices': {str(device): [{key: rounded(value) for key, value in entry.items()}
+                                              for entry in entries]
+                                for device, entries in report.items()}}
+        with open(file, 'w') as file_:
+            json.dump(document, file_, indent=2)
+        return report
@@ -0,0 +1,142 @@
+# encoding: utf-8
+"""
+                   GNU GENERAL PUBLIC LICENSE
+                       Version 3, 29 June 2007
+ Copyright (C) 2007 Free Software Foundation, Inc. <http://fsf.org/>
+ Everyone is permitted to copy and distribute verbatim copies
+ of this license document, but changing it is not allowed.
+ """
+
+__author__ = "Yoann Berenguer"
+__credits__ = ["Yoann Berenguer"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Yoann Berenguer"
+__email__ = "yoyoberenguer@hotmail.com"
+__status__ = "Joystick Demo"
+
+import json
+import time
+
+import pygame
+
+
+# Lazy image manager
+# Images are loaded on first use and always converted to the display pixel format
+# (convert_alpha, or convert for opaque images), scaled variants are cached by size.
+# Only the images actually used are loaded (e.g the schemes of the connected controllers).
+# Load and scale times (ms) and the memory used by every asset are recorded (see report).
+# The display mode must be set before the first get.
+# e.g
+# ASSETS = AssetManager('Assets/')
+# ASSETS.declare('ps3-logo2.png', alpha_=False)
+# scheme = ASSETS.get('PS4.png', size_=(600, 272))      # loaded, converted and scaled once
+# scheme = ASSETS.get('PS4.png', size_=(600, 272))      # cached
+# ASSETS.export('assets.json')
+
+class AssetManager:
+
+    def __init__(self, path_: str):
+        """
+        :param path_: directory of the images
+        """
+        self.path = path_
+        self.options = {}  # name -> (alpha, colorkey)
+        self.images = {}  # name -> converted surface (original size)
+        self.variants = {}  # (name, size) -> converted and scaled surface
+        self.stats = {}  # name -> {'load_ms', 'scale_ms', 'hits', 'variants', 'bytes'}
+
+    def declare(self, name_: str, alpha_: bool = True, colorkey_=None):
+        """
+        Loading options of an image (default convert_alpha, no colorkey).
+        :param name_: file name of the image
+        :param alpha_: True keeps the per-pixel alpha (convert_alpha), False for opaque images (convert)
+        :param colorkey_: transparent color applied to the image and its scaled variants
+        """
+        self.options[name_] = (alpha_, colorkey_)
+
+    def load(self, name_: str) -> pygame.Surface:
+        """ Return the image at its original size, loaded and converted on the first call. """
+        image = self.images.get(name_)
+        if image is not None:
+            return image
+        alpha, colorkey = self.options.get(name_, (True, None))
+        t = time.perf_counter()
+        try:
+            image = pygame.image.load(self.path + name_)
+            image = image.convert_alpha() if alpha else image.convert()
+        except pygame.error:
+            raise SystemExit('\n[-] Error : Could not load image %s %s ' % (self.path + name_, pygame.get_error()))
+        if colorkey is not None:
+            image.set_colorkey(colorkey)
+        self.images[name_] = image
+        self.stats[name_] = {'load_ms': (time.perf_counter() - t) * 1e3, 'scale_ms': 0.0,
+                             'hits': 0, 'variants': 0, 'bytes': self.size_of(image)}
+        return image
+
+    def get(self, name_: str, size_: tuple = None) -> pygame.Surface:
+        """
+        Return an image, loaded on the first call.
+        :param name_: file name of the image
+        :param size_: size of the image (smoothscale), default original size
+        :return: pygame.Surface in the display pixel format, shared (do not draw onto it)
+        """
+        image = self.load(name_)
+        stats = self.stats[name_]
+        stats['hits'] += 1
+        if size_ is None or tuple(size_) == image.get_size():
+            return image
+
+        key = (name_, tuple(size_))
+        variant = self.variants.get(key)
+        if variant is None:
+            t = time.perf_counter()
+            variant = pygame.transform.smoothscale(image, key[1])
+            colorkey = self.options.get(name_, (True, None))[1]
+            if colorkey is not None:
+                variant.set_colorkey(colorkey)
+            self.variants[key] = variant
+            stats['scale_ms'] += (time.perf_counter() - t) * 1e3
+            stats['variants'] += 1
+            stats['bytes'] += self.size_of(variant)
+        return variant
+
+    def release(self, name_: str, size_: tuple):
+        """ Forget a scaled variant (e.g a size not used anymore), it is rebuilt if requested again. """
+        variant = self.variants.pop((name_, tuple(size_)), None)
+        if variant is not None:
+            stats = self.stats[name_]
+            stats['variants'] -= 1
+            stats['bytes'] -= self.size_of(variant)
+
+    def __contains__(self, name_: str) -> bool:
+        """ True when the image is loaded. """
+        return name_ in self.images
+
+    def __len__(self):
+        return len(self.images)
+
+    @staticmethod
+    def size_of(surface_: pygame.Surface) -> int:
+        """ Memory used by the pixels of a surface (bytes). """
+        return surface_.get_pitch() * surface_.get_height()
+
+    def memory(self) -> int:
+        """ Memory used by all the loaded images and their scaled variants (bytes). """
+        return sum(stats['bytes'] for stats in self.stats.values())
+
+    def report(self) -> dict:
+        """
+        Load time and memory per asset.
+        :return: python dictionary {name: {'load_ms', 'scale_ms', 'hits', 'variants', 'bytes'}}
+        """
+        return {name: {'load_ms': round(stats['load_ms'], 3), 'scale_ms': round(stats['scale_ms'], 3),
+                       'hits': stats['hits'], 'variants': stats['variants'], 'bytes': stats['bytes']}
+                for name, stats in self.stats.items()}
+
+    def export(self, file: str) -> dict:
+        """ Write the asset report to a JSON file, return the report. """
+        report = self.report()
+        with open(file, 'w') as file_:
+            json.dump(report, file_, indent=2)
+        return report
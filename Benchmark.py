@@ -0,0 +1,310 @@
+# encoding: utf-8
+"""
+                   GNU GENERAL PUBLIC LICENSE
+                       Version 3, 29 June 2007
+ Copyright (C) 2007 Free Software Foundation, Inc. <http://fsf.org/>
+ Everyone is permitted to copy and distribute verbatim copies
+ of this license document, but changing it is not allowed.
+ """
+
+__author__ = "Yoann Berenguer"
+__credits__ = ["Yoann Berenguer"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Yoann Berenguer"
+__email__ = "yoyoberenguer@hotmail.com"
+__status__ = "Joystick Demo"
+
+# Headless benchmark suite for the render and input hot paths.
+# Every benchmark runs with synthetic controller input (see DeviceBackend.synthetic_records),
+# no joystick, display or sound card is needed.
+# e.g
+# python Benchmark.py --output benchmark.json                  # run and save the results
+# python Benchmark.py --baseline benchmark.json                # compare against a stored run
+# python Benchmark.py --filter halo --repeat 50
+
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy
+import pygame
+from pygame import freetype
+
+import Joystick
+from Joystick import GL, ASSETS_PATH, LAYOUTS_PATH, Halo, HaloPool, JoystickEmulator, \
+    LayeredUpdatesModified, blend_texture, make_surface, load_rgba, load_halos
+from AssetManager import AssetManager
+from ControllerLayout import LayoutDatabase
+from DeviceBackend import ReplayBackend, synthetic_records
+from InputServer import InputControl
+from GameClock import GameClock
+from SoundServer import SoundControl
+from TextCache import TextCache
+
+# Halo animation steps (same as Joystick.py)
+STEPS = numpy.linspace(0.0, 0.96666667, 30)
+
+# A benchmark is slower than the baseline when its median is above THRESHOLD x baseline median
+THRESHOLD = 1.20
+
+
+def setup(device_name_: str = 'Wireless Controller') -> dict:
+    """
+    Initialise pygame (dummy drivers) and the globals of Joystick.py as the tester does,
+    with a replay backend feeding synthetic input records to a single panel.
+    Return a python dictionary of the objects used by the benchmarks.
+    """
+    pygame.init()
+    pygame.mixer.init()
+    freetype.init(cache_size=64, resolution=72)
+
+    font = freetype.Font(ASSETS_PATH + 'ARCADE_R.TTF', size=14)
+    font.antialiased = True
+    GL.MAIN_MENU_FONT = font
+    GL.TEXT_CACHE = TextCache(font, size_=8)
+    GL.LAYOUTS = LayoutDatabase(LAYOUTS_PATH)
+
+    screenrect = pygame.Rect(0, 0, 800, 600)
+    screen = pygame.display.set_mode(screenrect.size, 0, 32)
+    GL.ASSETS = AssetManager(ASSETS_PATH)
+    GL.ASSETS.declare('ps3-logo2.png', alpha_=False)
+    background = GL.ASSETS.get('ps3-logo2.png', size_=screenrect.size)
+
+    border = GL.ASSETS.load('dModScreens06.png')
+    Joystick.SCREENRECT = screenrect
+    Joystick.FRAME_BORDER_LEFT = GL.ASSETS.get('dModScreens06.png', size_=(border.get_width(), 500))
+    Joystick.RED_SWITCH1 = GL.ASSETS.get('switchRed01.png')
+    Joystick.RED_SWITCH2 = GL.ASSETS.get('switchRed02.png')
+    Joystick.RED_SWITCH3 = GL.ASSETS.get('switchRed03.png')
+
+    SoundControl.SCREENRECT = screenrect
+    GL.SOUND_SERVER = SoundControl(10)
+    sound = pygame.mixer.Sound(ASSETS_PATH + 'MouseClick.ogg')
+    Joystick.MOUSE_CLICK_SOUND = sound
+
+    GL.All = LayeredUpdatesModified()
+    GL.INPUT_SERVER = InputControl()
+    GL.CLOCK = GameClock(rate_=60)
+
+    Halo.images = load_halos(ASSETS_PATH + 'WhiteHalo.png', STEPS, [pygame.Color(255, 255, 255, 255)], {})[0]
+    Halo.steps = STEPS
+    Halo.containers = GL.All
+    GL.HALO_POOL = HaloPool(capacity_=64)
+
+    records = synthetic_records(duration_=60.0)
+    GL.BACKEND = ReplayBackend(records, names_={0: device_name_}, speed_=0, batch_=64, loop_=True)
+    JoystickEmulator.containers = GL.All
+    JoystickEmulator.images = GL.ASSETS.get('PS4.png', size_=(600, 272))
+    panel = JoystickEmulator(0, screenrect.center, offset_=(0, 0), layer_=0, timing_=100)
+    if panel.controller is not None:
+        GL.TEXT_CACHE.preload([panel.controller], ((255, 255, 255, 255), (255, 0, 0, 255)))
+    GL.BACKEND.start()
+
+    return {'screen': screen, 'background': background, 'panel': panel, 'sound': sound}
+
+
+def feed(delta_ms_: int = 100):
+    """
+    Advance the clock by delta_ms_ (the panel refreshes every 100 ms) and apply the next
+    batch of synthetic input records to the input server.
+    """
+    GL.CLOCK.tick(delta_ns_=delta_ms_ * 1000000)
+    GL.INPUT_SERVER.process_records(GL.BACKEND.poll())
+
+
+def measure(function_, setup_=None, repeat_: int = 200, warmup_: int = 10, allocations_: int = 20) -> dict:
+    """
+    Time a function.
+    The garbage collector is disabled while timing, setup_ (optional) is called before every
+    call and is not timed. Allocations are measured in a separate pass with tracemalloc
+    (python and numpy memory, SDL surfaces are not traced).
+
+    :param function_: function without argument
+    :param setup_: function without argument called before each call of function_
+    :param repeat_: number of timed calls
+    :param warmup_: number of calls before timing
+    :param allocations_: number of calls traced with tracemalloc
+    :return: python dictionary {'runs', 'median_us', 'p95_us', 'mean_us', 'min_us',
+             'alloc_bytes', 'alloc_blocks'}
+    """
+    for _ in range(warmup_):
+        if setup_ is not None:
+            setup_()
+        function_()
+
+    timings = numpy.empty(repeat_, dtype=numpy.int64)
+    perf_counter_ns = time.perf_counter_ns
+    gc.collect()
+    gc.disable()
+    try:
+        for i in range(repeat_):
+            if setup_ is not None:
+                setup_()
+            t = perf_counter_ns()
+            function_()
+            timings[i] = perf_counter_ns() - t
+    finally:
+        gc.enable()
+
+    # peak memory and number of blocks allocated by a single call
+    peaks = []
+    blocks = []
+    tracemalloc.start()
+    try:
+        for _ in range(allocations_):
+            if setup_ is not None:
+                setup_()
+            before = tracemalloc.take_snapshot()
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            function_()
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+            after = tracemalloc.take_snapshot()
+            blocks.append(sum(max(stat.count_diff, 0) for stat in after.compare_to(before, 'traceback')))
+    finally:
+        tracemalloc.stop()
+
+    timings = timings * 1e-3
+    return {'runs': repeat_,
+            'median_us': round(float(numpy.median(timings)), 2),
+            'p95_us': round(float(numpy.quantile(timings, 0.95)), 2),
+            'mean_us': round(float(timings.mean()), 2),
+            'min_us': round(float(timings.min()), 2),
+            'alloc_bytes': int(numpy.median(peaks)) if peaks else 0,
+            'alloc_blocks': int(numpy.median(blocks)) if blocks else 0}
+
+
+def benchmarks(objects_: dict) -> list:
+    """
+    Return the list of benchmarks (name, function, setup, repeat).
+    """
+    screen = objects_['screen']
+    background = objects_['background']
+    panel = objects_['panel']
+    sound = objects_['sound']
+
+    halo = load_rgba(ASSETS_PATH + 'WhiteHalo.png')
+    halo_surface = make_surface(halo)
+    halo_cache = {}
+    load_halos(ASSETS_PATH + 'WhiteHalo.png', STEPS, [pygame.Color(255, 255, 255, 255)], halo_cache)
+
+    def update_all():
+        # one frame at 60 FPS
+        feed(delta_ms_=17)
+        GL.All.update()
+
+    def press():
+        # one button pressed every call, a halo is started for each press
+        feed()
+        panel.state.hits.add(int(numpy.random.randint(0, 14)))
+
+    return [
+        ('halo_precompute', lambda: load_halos(ASSETS_PATH + 'WhiteHalo.png', STEPS,
+                                               [pygame.Color(255, 255, 255, 255)], {}), None, 10),
+        ('halo_cache_load', lambda: load_halos(ASSETS_PATH + 'WhiteHalo.png', STEPS,
+                                               [pygame.Color(255, 255, 255, 255)], halo_cache), None, 50),
+        ('blend_texture', lambda: blend_texture(halo_surface, 0.5, pygame.Color(255, 0, 0, 255)), None, 200),
+        ('make_surface', lambda: make_surface(halo), None, 200),
+        ('emulator_layout', panel.layout, press, 500),
+        ('emulator_update', panel.update, press, 500),
+        ('group_draw', lambda: GL.All.draw(screen), update_all, 500),
+        ('group_draw_dirty', lambda: GL.All.draw_dirty(screen, background), update_all, 500),
+        ('sound_play', lambda: GL.SOUND_SERVER.play(sound_=sound, loop_=False, priority_=0, volume_=0.1,
+                                                    panning_=True, name_='MOUSE CLICK', x_=400), None, 500),
+        ('sound_update', GL.SOUND_SERVER.update, None, 1000),
+    ]
+
+
+def reset():
+    """
+    Return the halos left by a benchmark to the pool, every benchmark starts with the panel
+    alone and the same pool state (killing the sprites would leave stale entries in the pool).
+    """
+    pool = GL.HALO_POOL
+    for halo in list(pool.active.values()):
+        pool.release(halo)
+    for sprite in GL.All.sprites():
+        if isinstance(sprite, Halo):
+            sprite.kill()
+
+
+def compare(results_: dict, baseline_: dict, threshold_: float = THRESHOLD, noise_: float = 1.0) -> list:
+    """
+    Print the results next to a baseline (same format) and return the names of the benchmarks
+    whose median is above threshold_ x the baseline median (and at least noise_ us slower).
+    """
+    slower = []
+    print('\n%-20s %12s %12s %8s %12s' % ('benchmark', 'median us', 'baseline us', 'ratio', 'alloc bytes'))
+    for name, result in results_.items():
+        reference = baseline_.get(name)
+        if reference is None or not reference['median_us']:
+            print('%-20s %12.2f %12s %8s %12d' % (name, result['median_us'], '-', '-', result['alloc_bytes']))
+            continue
+        ratio = result['median_us'] / reference['median_us']
+        flag = ''
+        if ratio > threshold_ and result['median_us'] - reference['median_us'] > noise_:
+            slower.append(name)
+            flag = ' slower'
+        print('%-20s %12.2f %12.2f %8.2f %12d%s' % (name, result['median_us'], reference['median_us'],
+                                                    ratio, result['alloc_bytes'], flag))
+    return slower
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Headless benchmarks of the controller tester')
+    parser.add_argument('--output', help='write the results to a JSON file')
+    parser.add_argument('--baseline', help='compare the results against a JSON file written with --output')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='median ratio above which a benchmark is reported slower (default %(default)s)')
+    parser.add_argument('--filter', default='', help='only run the benchmarks whose name contains this string')
+    parser.add_argument('--repeat', type=int, help='number of timed calls (default per benchmark)')
+    args = parser.parse_args()
+
+    # reproducible synthetic input
+    numpy.random.seed(0)
+    objects = setup()
+    results = {}
+    for name, function, setup_, repeat in benchmarks(objects):
+        if args.filter not in name:
+            continue
+        results[name] = measure(function, setup_, repeat_=args.repeat or repeat)
+        reset()
+        print('%-20s median %10.2f us  p95 %10.2f us  alloc %8d bytes' %
+              (name, results[name]['median_us'], results[name]['p95_us'], results[name]['alloc_bytes']))
+
+    document = {'meta': {'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                         'python': platform.python_version(),
+                         'pygame': pygame.version.ver,
+                         'sdl': '.'.join(str(v) for v in pygame.get_sdl_version()),
+                         'numpy': numpy.__version__,
+                         'platform': platform.platform(),
+                         'video_driver': pygame.display.get_driver()},
+                'results': results}
+    if args.output:
+        with open(args.output, 'w') as file_:
+            json.dump(document, file_, indent=2)
+
+    slower = []
+    if args.baseline:
+        with open(args.baseline) as file_:
+            slower = compare(results, json.load(file_)['results'], args.threshold)
+        if slower:
+            print('\n[-]INFO - slower than the baseline : %s' % ', '.join(slower))
+
+    GL.BACKEND.stop()
+    pygame.quit()
+    sys.exit(1 if slower else 0)
+
+
+if __name__ == '__main__':
+    main()
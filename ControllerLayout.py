@@ -0,0 +1,443 @@
+# encoding: utf-8
+"""
+                   GNU GENERAL PUBLIC LICENSE
+                       Version 3, 29 June 2007
+ Copyright (C) 2007 Free Software Foundation, Inc. <http://fsf.org/>
+ Everyone is permitted to copy and distribute verbatim copies
+ of this license document, but changing it is not allowed.
+ """
+
+__author__ = "Yoann Berenguer"
+__credits__ = ["Yoann Berenguer"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Yoann Berenguer"
+__email__ = "yoyoberenguer@hotmail.com"
+__status__ = "Joystick Demo"
+
+import json
+import os
+import pickle
+import re
+import time
+
+import numpy
+
+# Halo colour index (see Joystick.HALO_COLORS)
+COLOR_RED, COLOR_GREEN, COLOR_BLUE, COLOR_PURPLE = 0, 1, 2, 3
+COLOR_NAMES = {'red': COLOR_RED, 'green': COLOR_GREEN, 'blue': COLOR_BLUE, 'purple': COLOR_PURPLE}
+
+# Axis type flags
+# AXIS_STICK   : highlighted when moved, value displayed
+# AXIS_TRIGGER : highlighted between rest and full press, shown at rest when fully pressed
+# AXIS_SPLIT   : a single axis for two controls, first position for positive values,
+#                second position for negative values
+AXIS_STICK, AXIS_TRIGGER, AXIS_SPLIT = 1, 2, 4
+AXIS_NAMES = {'stick': AXIS_STICK, 'trigger': AXIS_TRIGGER, 'split': AXIS_SPLIT}
+
+# Default halo colour of the buttons (by button number) and of the axes (by axis type)
+BUTTON_COLORS = {0: COLOR_PURPLE, 1: COLOR_BLUE, 2: COLOR_RED, 6: COLOR_RED, 7: COLOR_RED}
+AXIS_COLORS = {AXIS_STICK: COLOR_RED, AXIS_TRIGGER: COLOR_PURPLE, AXIS_SPLIT: COLOR_RED}
+
+
+def guid_key(guid_: str) -> str:
+    """
+    Return the 'vendor:product' USB ids (e.g '054c:05c4') encoded in an SDL joystick GUID,
+    or an empty string if the GUID does not carry them.
+    SDL2 GUIDs store the bus type, a name CRC, the vendor, product and version ids as little
+    endian 16 bit words separated by zero words (other GUIDs, e.g XInput, have no USB ids).
+    """
+    guid_ = guid_.lower()
+    if not re.fullmatch('[0-9a-f]{32}', guid_) or guid_[12:16] != '0000' or guid_[20:24] != '0000':
+        return ''
+    vendor = guid_[10:12] + guid_[8:10]
+    product = guid_[18:20] + guid_[16:18]
+    return '%s:%s' % (vendor, product)
+
+
+class LayoutError(ValueError):
+    """ Invalid layout file. """
+
+
+def normalize_name(name_: str) -> str:
+    """ Device name without case, punctuation and repeated spaces (name fallback). """
+    return ' '.join(re.sub('[^0-9a-z]+', ' ', name_.lower()).split())
+
+
+# Compiled controller layout
+# The layout dictionary of a device (see CONTROLLER_LAYOUT) flattened into tables indexed
+# by button, axis and hat number.
+# labels   : label table, label + state strings are pre-built
+# xy       : numpy.int32 coordinate arrays, (buttons, 2), (axes, 2, 2) and (4, 2) for the D-pad
+#            (right, left, up, down), the second axis position is only used by split axes
+# colors   : numpy.int8 halo colour index
+# types    : numpy.int8 axis type flags
+# e.g
+# layout = CompiledLayout('Wireless Controller', CONTROLLER_LAYOUT['Wireless Controller'])
+# layout.button_xy[0], layout.button_on[0], layout.axis_types[4] & AXIS_TRIGGER
+
+class CompiledLayout:
+
+    def __init__(self, name_: str, layout_: dict):
+        """
+        :param name_: device name
+        :param layout_: python dictionary {'buttons': [{label: (x, y)}, ..], 'axis': [..], 'hats': [..]}
+                        optional keys: 'guids' list of 'vendor:product' ids or SDL GUIDs, 'scheme'
+                        controller image file,
+                        'axis_types' list of 'stick', 'trigger' or 'split' (default trigger for the
+                        axes 4 and 5, split when two positions are given, stick otherwise),
+                        'axis_colors' and 'button_colors' lists of colour names
+        """
+        self.name = name_
+        self.guids = [guid.lower() for guid in layout_.get('guids', [])]
+        self.scheme = layout_.get('scheme')  # controller image file (optional)
+
+        buttons = [next(iter(button.items())) for button in layout_['buttons']]
+        self.button_labels = [label for label, _ in buttons]
+        self.button_on = [label + 'pressed' for label in self.button_labels]
+        self.button_off = [label + 'n/a' for label in self.button_labels]
+        self.button_xy = numpy.array([xy for _, xy in buttons], dtype=numpy.int32).reshape(-1, 2)
+        colors = layout_.get('button_colors')
+        self.button_colors = numpy.array(
+            [COLOR_NAMES[c] for c in colors] if colors else
+            [BUTTON_COLORS.get(b, COLOR_GREEN) for b in range(len(buttons))], dtype=numpy.int8)
+
+        axes = [next(iter(axis.items())) for axis in layout_['axis']]
+        self.axis_labels = [label for label, _ in axes]
+        self.axis_rest = [label + '0.0' for label in self.axis_labels]
+        self.axis_xy = numpy.zeros((len(axes), 2, 2), dtype=numpy.int32)
+        types = layout_.get('axis_types')
+        self.axis_types = numpy.zeros(len(axes), dtype=numpy.int8)
+        for ax, (_, xy) in enumerate(axes):
+            split = isinstance(xy[0], (list, tuple))
+            self.axis_xy[ax] = xy if split else (xy, xy)
+            if types:
+                self.axis_types[ax] = AXIS_NAMES[types[ax]]
+            else:
+                self.axis_types[ax] = AXIS_SPLIT if split else AXIS_TRIGGER if ax in (4, 5) else AXIS_STICK
+        colors = layout_.get('axis_colors')
+        self.axis_colors = numpy.array(
+            [COLOR_NAMES[c] for c in colors] if colors else
+            [AXIS_COLORS[t] for t in self.axis_types.tolist()], dtype=numpy.int8)
+
+        hats = [next(iter(hat.items())) for hat in layout_['hats']]
+        self.hat_labels = [label for label, _ in hats]
+        self.hat_xy = numpy.array([xy for _, xy in hats], dtype=numpy.int32).reshape(-1, 2)
+
+
+# Layout index
+# Layouts are compiled once and looked up by SDL GUID (exact GUID, then USB vendor:product ids),
+# then by device name (exact, then normalized, then a layout name contained in the device name,
+# e.g 'Sony Interactive Entertainment Wireless Controller').
+# e.g
+# LAYOUTS = LayoutIndex({'Wireless Controller': {'buttons': [..], 'axis': [..], 'hats': [..]}})
+# layout = LAYOUTS.find(joystick.get_guid(), joystick.get_name())
+
+class LayoutIndex:
+
+    def __init__(self, layouts_: dict = None):
+        """
+        :param layouts_: python dictionary {device name: layout dictionary} (see CompiledLayout)
+        """
+        self.layouts = {}  # name -> CompiledLayout
+        self.guids = {}  # SDL GUID or vendor:product -> name
+        self.names = {}  # normalized name -> name
+        self.vendors = {}  # name -> USB vendor ids of the layout GUIDs
+        self.found = {}  # (guid, name) -> layout name or None
+        self.version = 0  # incremented when layouts are replaced (see LayoutDatabase.reload)
+        for name, layout in (layouts_ or {}).items():
+            self.add(name, layout)
+
+    def add(self, name_: str, layout_: dict) -> CompiledLayout:
+        """ Compile and register a layout, return the compiled layout. """
+        compiled = CompiledLayout(name_, layout_)
+        self.layouts[name_] = compiled
+        self.register(name_, compiled.guids)
+        return compiled
+
+    def register(self, name_: str, guids_: list):
+        """ Index a layout name by its GUIDs and normalized name. """
+        for guid in guids_:
+            self.guids[guid] = name_
+        self.names[normalize_name(name_)] = name_
+        # vendor of the 'vendor:product' ids and of the SDL GUIDs carrying them
+        self.vendors[name_] = {(guid if ':' in guid else guid_key(guid)).split(':')[0] for guid in guids_} - {''}
+        self.found.clear()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name_: str):
+        return normalize_name(name_) in self.names
+
+    def get(self, name_: str):
+        """ Return the CompiledLayout of a layout name. """
+        return self.layouts.get(name_)
+
+    def lookup(self, guid_: str = '', name_: str = ''):
+        """
+        Return the name of the layout matching a device, None when no layout matches.
+        A layout is never matched by name when the GUID of the device carries a USB vendor id
+        that is not one of the layout vendors (e.g an 'Xbox Wireless Controller' is not a
+        'Wireless Controller'). Partial names are only matched for a layout of the same vendor.
+        """
+        guid_ = (guid_ or '').lower()
+        key = guid_key(guid_) if guid_ else ''
+        vendor = key.split(':')[0]
+        layout = (self.guids.get(guid_) or self.guids.get(key)) if guid_ else None
+        if layout is None and name_:
+            layout = self.names.get(normalize_name(name_))
+            if layout is not None and vendor and self.vendors.get(layout) and vendor not in self.vendors[layout]:
+                layout = None
+        if layout is None and name_ and vendor:
+            normalized = ' %s ' % normalize_name(name_)
+            # longest layout name of the same vendor contained in the device name
+            for candidate in sorted(self.names, key=len, reverse=True):
+                if ' %s ' % candidate in normalized and vendor in self.vendors.get(self.names[candidate], ()):
+                    layout = self.names[candidate]
+                    break
+        return layout
+
+    def find(self, guid_: str = '', name_: str = ''):
+        """ Return the CompiledLayout of a device, None when no layout matches. """
+        key = (guid_, name_)
+        if key not in self.found:
+            self.found[key] = self.lookup(guid_, name_)
+        name = self.found[key]
+        return self.get(name) if name is not None else None
+
+
+def validate_layout(layout_, file: str = '') -> dict:
+    """
+    Check the structure of a layout dictionary (see CompiledLayout), raise LayoutError.
+    Return the layout.
+    """
+    def error(message_):
+        raise LayoutError('\n[-] Error : invalid layout %s, %s' % (file, message_))
+
+    def is_point(value_):
+        return isinstance(value_, (list, tuple)) and len(value_) == 2 and \
+            all(isinstance(v, int) and not isinstance(v, bool) for v in value_)
+
+    if not isinstance(layout_, dict):
+        error('expecting a dictionary')
+    if not isinstance(layout_.get('name'), str) or not layout_['name'].strip():
+        error('missing device name')
+    for key in ('buttons', 'axis', 'hats'):
+        entries = layout_.get(key)
+        if not isinstance(entries, list):
+            error('"%s" should be a list' % key)
+        for i, entry in enumerate(entries):
+            if not isinstance(entry, dict) or len(entry) != 1:
+                error('%s %d should be a single {label: position} entry' % (key, i))
+            label, position = next(iter(entry.items()))
+            split = key == 'axis' and isinstance(position, (list, tuple)) and len(position) == 2 and \
+                all(is_point(p) for p in position)
+            if not is_point(position) and not split:
+                error('%s %d (%s) position should be [x, y]' % (key, i, label))
+    if len(layout_['hats']) not in (0, 4):
+        error('"hats" should list the 4 D-pad positions (right, left, up, down)')
+    for key, names, size in (('axis_types', AXIS_NAMES, len(layout_['axis'])),
+                             ('axis_colors', COLOR_NAMES, len(layout_['axis'])),
+                             ('button_colors', COLOR_NAMES, len(layout_['buttons']))):
+        values = layout_.get(key)
+        if values is None:
+            continue
+        if not isinstance(values, list) or len(values) != size or any(v not in names for v in values):
+            error('"%s" should list %d values in %s' % (key, size, sorted(names)))
+    guids = layout_.get('guids', [])
+    if not isinstance(guids, list) or not all(isinstance(g, str) for g in guids):
+        error('"guids" should be a list of strings')
+    return layout_
+
+
+def load_layout(file: str) -> dict:
+    """ Read and validate a layout file (JSON), raise LayoutError. """
+    try:
+        with open(file, encoding='utf-8') as file_:
+            layout = json.load(file_)
+    except (OSError, ValueError) as error:
+        raise LayoutError('\n[-] Error : cannot read layout %s, %s' % (file, error))
+    return validate_layout(layout, file)
+
+
+# Layout database
+# One JSON file per controller in a directory (see Assets/Layouts). At startup only the
+# directory is listed, the index (names and GUIDs) and the compiled layouts come from a
+# binary cache; a compiled layout is only unpickled when its device is connected. Files that
+# are new or modified since the cache was written are parsed the first time a lookup misses.
+# reload() checks the files periodically and replaces the layouts modified on disk
+# (self.version is incremented, panels look their layout up again).
+# e.g
+# LAYOUTS = LayoutDatabase('Assets/Layouts/')
+# layout = LAYOUTS.find(joystick.get_guid(), joystick.get_name())
+# LAYOUTS.reload()                # once per frame, checks the files every interval_ seconds
+
+class LayoutDatabase(LayoutIndex):
+
+    # Compiled cache format version, bump when CompiledLayout changes
+    CACHE_VERSION = 1
+
+    def __init__(self, path_: str, cache_: str = None, interval_: float = 1.0):
+        """
+        :param path_: directory of the layout files (*.json)
+        :param cache_: compiled cache file, default layouts.cache in path_
+        :param interval_: minimum time in seconds between two checks of the files (see reload)
+        """
+        LayoutIndex.__init__(self)
+        self.path = path_
+        self.cache_file = cache_ or os.path.join(path_, 'layouts.cache')
+        self.interval = interval_
+        self.last_check = time.perf_counter()
+        self.entries = {}  # file name -> {'stamp', 'name', 'guids', 'blob'} (indexed files)
+        self.pending = {}  # file name -> stamp, files not indexed yet
+        self.rejected = {}  # file name -> stamp, invalid edits of layouts in use (not cached)
+        self.files = {}  # layout name -> file name
+        self.modified = False  # cache to be written
+
+        cache = self.load_cache()
+        for file, stamp in self.scan().items():
+            entry = cache.get(file)
+            if entry is not None and entry['stamp'] == stamp:
+                self.entries[file] = entry
+            else:
+                self.pending[file] = stamp
+        self.modified = len(self.entries) != len(cache)
+        self.rebuild()
+
+    def scan(self) -> dict:
+        """ Return the layout files of the directory {file name: (mtime_ns, size)}. """
+        files = {}
+        try:
+            for entry in os.scandir(self.path):
+                if entry.name.endswith('.json') and entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except OSError as error:
+            print('\n[-]INFO - Cannot read layout directory %s %s ' % (self.path, error))
+        return files
+
+    def load_cache(self) -> dict:
+        """ Load the compiled cache, return an empty cache if the file is missing, outdated or corrupted. """
+        try:
+            with open(self.cache_file, 'rb') as file_:
+                cache = pickle.load(file_)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+            return {}
+        if not isinstance(cache, dict) or cache.get('version') != self.CACHE_VERSION:
+            return {}
+        return cache.get('files', {})
+
+    def save(self):
+        """ Write the compiled cache if the index changed (atomic, several processes may share the cache). """
+        if not self.modified:
+            return
+        temporary = '%s.%d' % (self.cache_file, os.getpid())
+        try:
+            with open(temporary, 'wb') as file_:
+                pickle.dump({'version': self.CACHE_VERSION, 'files': self.entries}, file_, protocol=-1)
+            os.replace(temporary, self.cache_file)
+            self.modified = False
+        except OSError as error:
+            print('\n[-]INFO - Could not write layout cache %s %s ' % (self.cache_file, error))
+
+    def rebuild(self):
+        """ Rebuild the GUID and name index from the indexed files. """
+        self.guids.clear()
+        self.names.clear()
+        self.vendors.clear()
+        self.files.clear()
+        for file, entry in sorted(self.entries.items()):
+            if entry['name'] in self.files:
+                print('\n[-]INFO - Layout %s defined in %s and %s ' % (entry['name'], self.files[entry['name']], file))
+            self.files[entry['name']] = file
+            self.register(entry['name'], entry['guids'])
+
+    def compile(self, file: str, stamp_: tuple) -> bool:
+        """ Parse, validate and compile a layout file into the index, return False if the file is invalid. """
+        try:
+            layout = load_layout(os.path.join(self.path, file))
+        except LayoutError as error:
+            print(error)
+            return False
+        compiled = CompiledLayout(layout['name'], layout)
+        self.entries[file] = {'stamp': stamp_, 'name': compiled.name, 'guids': compiled.guids,
+                              'blob': pickle.dumps(compiled, protocol=-1)}
+        self.layouts[compiled.name] = compiled
+        self.modified = True
+        return True
+
+    def index_pending(self):
+        """ Parse the files not indexed yet. """
+        for file, stamp in sorted(self.pending.items()):
+            self.compile(file, stamp)
+        self.pending.clear()
+        self.rebuild()
+        self.save()
+
+    def lookup(self, guid_: str = '', name_: str = ''):
+        name = LayoutIndex.lookup(self, guid_, name_)
+        if name is None and self.pending:
+            self.index_pending()
+            name = LayoutIndex.lookup(self, guid_, name_)
+        return name
+
+    def get(self, name_: str):
+        """ Return the CompiledLayout of a layout name, unpickled from the cache on first use. """
+        layout = self.layouts.get(name_)
+        if layout is None and name_ in self.files:
+            layout = pickle.loads(self.entries[self.files[name_]]['blob'])
+            self.layouts[name_] = layout
+        return layout
+
+    def reload(self, force_: bool = False) -> bool:
+        """
+        Check the layout files (at most every self.interval seconds unless force_ is True).
+        Modified layouts already in use are recompiled immediately (an invalid file keeps the
+        previous layout), other new or modified files are indexed on the next lookup miss.
+        Return True if layouts in use were replaced or removed.
+        """
+        now = time.perf_counter()
+        if not force_ and now - self.last_check < self.interval:
+            return False
+        self.last_check = now
+
+        files = self.scan()
+        changed = False
+        for file in [file for file in self.rejected if file not in files]:
+            del self.rejected[file]
+        for file in [file for file in self.entries if file not in files]:
+            entry = self.entries.pop(file)
+            changed |= self.layouts.pop(entry['name'], None) is not None
+            self.modified = True
+        for file in [file for file in self.pending if file not in files]:
+            del self.pending[file]
+
+        for file, stamp in files.items():
+            entry = self.entries.get(file)
+            if entry is not None and (entry['stamp'] == stamp or self.rejected.get(file) == stamp):
+                continue
+            self.rejected.pop(file, None)
+            if entry is not None and entry['name'] in self.layouts:
+                # layout in use, recompiled now
+                if self.compile(file, stamp):
+                    if self.entries[file]['name'] != entry['name']:
+                        self.layouts.pop(entry['name'], None)
+                    changed = True
+                else:
+                    # keep the previous layout until the file is fixed, the cached entry keeps
+                    # its stamp so that the invalid file is parsed again on the next start
+                    self.rejected[file] = stamp
+            else:
+                if entry is not None:
+                    del self.entries[file]
+                    self.layouts.pop(entry['name'], None)
+                    self.modified = True
+                self.pending[file] = stamp
+
+        if changed or self.modified:
+            self.rebuild()
+            self.save()
+        if changed:
+            self.version += 1
+        return changed
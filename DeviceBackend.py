@@ -0,0 +1,320 @@
+# encoding: utf-8
+"""
+                   GNU GENERAL PUBLIC LICENSE
+                       Version 3, 29 June 2007
+ Copyright (C) 2007 Free Software Foundation, Inc. <http://fsf.org/>
+ Everyone is permitted to copy and distribute verbatim copies
+ of this license document, but changing it is not allowed.
+ """
+
+__author__ = "Yoann Berenguer"
+__credits__ = ["Yoann Berenguer"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Yoann Berenguer"
+__email__ = "yoyoberenguer@hotmail.com"
+__status__ = "Joystick Demo"
+
+import time
+
+import numpy
+import pygame
+
+from InputServer import InputSampler, EVENT_DTYPE, KIND_BUTTON, KIND_AXIS, KIND_HAT, encode_hat
+
+
+# Device backend interface
+# The tester reads the devices and their input records through a backend, the pygame
+# backend reads the real joysticks and the replay backend feeds recorded or synthetic
+# records through the same code path (no hardware needed, works with SDL dummy drivers).
+# e.g
+# BACKEND = PygameBackend()            or  ReplayBackend(load_recording('session.rec'))
+# BACKEND.start()
+# device = BACKEND.get_device(0)        # pygame.joystick.Joystick like object
+# records = BACKEND.poll()              # EVENT_DTYPE records since the last call
+
+class DeviceBackend:
+
+    # True when the backend pumps the SDL event queue itself (the main loop must not)
+    pump = False
+
+    def get_count(self) -> int:
+        """ Return the number of devices. """
+        raise NotImplementedError
+
+    def get_device(self, index_: int):
+        """ Return a pygame.joystick.Joystick like object for a device index. """
+        raise NotImplementedError
+
+    def poll(self) -> numpy.ndarray:
+        """ Return the input records (EVENT_DTYPE) received since the last call. """
+        raise NotImplementedError
+
+    def start(self):
+        """ Start delivering input records. """
+
+    def stop(self):
+        """ Stop delivering input records. """
+
+    def wait(self, timeout_: float) -> bool:
+        """ Block until input records are available or timeout_ seconds elapsed, return True if available. """
+        time.sleep(timeout_)
+        return False
+
+    def set_idle(self, period_: float = None):
+        """ Main loop idle, the SDL queue is pumped every period_ seconds (None when active again). """
+
+    @property
+    def finished(self) -> bool:
+        """ True when no more records will be delivered. """
+        return False
+
+
+class PygameBackend(DeviceBackend):
+    """
+    Real joysticks (pygame.joystick), records are captured by an InputSampler.
+    """
+
+    def __init__(self, rate_: int = 1000):
+        """
+        :param rate_: sampling rate in Hz (see InputSampler)
+        """
+        self.sampler = InputSampler(rate_=rate_)
+        self.pump = self.sampler.pump
+
+    def get_count(self) -> int:
+        return pygame.joystick.get_count()
+
+    def get_device(self, index_: int):
+        return pygame.joystick.Joystick(index_)
+
+    def poll(self) -> numpy.ndarray:
+        return self.sampler.drain()
+
+    def start(self):
+        self.sampler.start()
+
+    def stop(self):
+        self.sampler.stop()
+
+    def wait(self, timeout_: float) -> bool:
+        return self.sampler.wait(timeout_)
+
+    def set_idle(self, period_: float = None):
+        self.sampler.set_period(period_)
+
+
+class ReplayDevice:
+    """
+    pygame.joystick.Joystick like object replaying the records of one device.
+    Input values are those at the start of the replay, the following values are delivered
+    as records by ReplayBackend.poll.
+    """
+
+    def __init__(self, instance_id_: int, name_: str, buttons_: int, axes_: int, hats_: int):
+        self.instance_id = instance_id_
+        self.name = name_
+        self.buttons = [0] * buttons_
+        self.axes = [0.0] * axes_
+        self.hats = [(0, 0)] * hats_
+
+    def init(self):
+        pass
+
+    def quit(self):
+        pass
+
+    def get_init(self) -> bool:
+        return True
+
+    def get_id(self) -> int:
+        return self.instance_id
+
+    def get_instance_id(self) -> int:
+        return self.instance_id
+
+    def get_guid(self) -> str:
+        return 'replay%026d' % self.instance_id
+
+    def get_name(self) -> str:
+        return self.name
+
+    def get_numbuttons(self) -> int:
+        return len(self.buttons)
+
+    def get_numaxes(self) -> int:
+        return len(self.axes)
+
+    def get_numhats(self) -> int:
+        return len(self.hats)
+
+    def get_button(self, button_: int) -> int:
+        return self.buttons[button_]
+
+    def get_axis(self, axis_: int) -> float:
+        return self.axes[axis_]
+
+    def get_hat(self, hat_: int) -> tuple:
+        return self.hats[hat_]
+
+
+class ReplayBackend(DeviceBackend):
+    """
+    Replay input records (recording file mapped with InputRecorder.load_recording or synthetic
+    records, see synthetic_records) at real time or at maximum speed.
+    """
+
+    def __init__(self, records_: numpy.ndarray, names_: dict = None, counts_: dict = None,
+                 speed_: float = 1.0, batch_: int = 256, loop_: bool = False):
+        """
+        :param records_: EVENT_DTYPE records ordered by time
+        :param names_: python dictionary {device: name}, default 'Generic'
+        :param counts_: python dictionary {device: (buttons, axes, hats)}, default the highest
+                        index found in the records
+        :param speed_: replay speed (1.0 real time), 0 for maximum speed
+        :param batch_: number of records delivered per poll at maximum speed
+        :param loop_: restart the replay at the end of the records
+        """
+        assert records_.dtype == EVENT_DTYPE, 'Argument records_ should be an EVENT_DTYPE array.'
+        self.records = records_
+        self.speed = speed_
+        self.batch = batch_
+        self.loop = loop_
+        self.position = 0
+        self.origin = None  # perf_counter_ns at the start of the replay
+        names_ = names_ or {}
+        counts_ = counts_ or {}
+
+        self.devices = []
+        for device in numpy.unique(records_['device']).tolist():
+            counts = counts_.get(device)
+            if counts is None:
+                mask = records_['device'] == device
+                counts = tuple(int(records_['index'][mask & (records_['kind'] == kind)].max(initial=-1)) + 1
+                               for kind in (KIND_BUTTON, KIND_AXIS, KIND_HAT))
+            self.devices.append(ReplayDevice(device, names_.get(device, 'Generic'), *counts))
+
+    def get_count(self) -> int:
+        return len(self.devices)
+
+    def get_device(self, index_: int):
+        try:
+            return self.devices[index_]
+        except IndexError:
+            raise pygame.error('Invalid joystick device number')
+
+    def start(self):
+        self.origin = time.perf_counter_ns()
+        self.position = 0
+
+    def poll(self) -> numpy.ndarray:
+        if self.origin is None:
+            self.start()
+        records = self.records
+        start = self.position
+        if start >= len(records):
+            if not self.loop or len(records) == 0:
+                return records[:0].copy()
+            self.start()
+            start = 0
+
+        if self.speed > 0:
+            elapsed = (time.perf_counter_ns() - self.origin) * self.speed
+            end = int(numpy.searchsorted(records['time'], records['time'][0] + elapsed, side='right'))
+        else:
+            end = min(start + self.batch, len(records))
+        self.position = end
+
+        chunk = numpy.array(records[start:end])
+        # records are stamped with their delivery time on the replay clock (origin + (t - t0) / speed),
+        # or with the actual delivery time at maximum speed. start() re-bases the origin when the
+        # replay loops, the timestamps keep increasing.
+        if self.speed > 0:
+            chunk['time'] = self.origin + ((chunk['time'] - records['time'][0]) / self.speed).astype(numpy.int64)
+        else:
+            chunk['time'] = time.perf_counter_ns()
+        return chunk
+
+    def wait(self, timeout_: float) -> bool:
+        records = self.records
+        if self.origin is None or self.speed <= 0 or self.position >= len(records):
+            if self.finished or len(records) == 0:
+                time.sleep(timeout_)
+                return False
+            return True
+        # time of the next record on the replay clock
+        delay = (records['time'][self.position] - records['time'][0]) / self.speed * 1e-9 - \
+            (time.perf_counter_ns() - self.origin) * 1e-9
+        if delay > timeout_:
+            time.sleep(timeout_)
+            return False
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+    @property
+    def finished(self) -> bool:
+        return not self.loop and self.position >= len(self.records)
+
+
+def synthetic_records(device_: int = 0, buttons_: int = 14, axes_: int = 6, hats_: int = 1,
+                      duration_: float = 10.0, rate_: int = 250, seed_: int = 0) -> numpy.ndarray:
+    """
+    Deterministic synthetic input records (EVENT_DTYPE) for one device.
+    Sticks turn in full circles in opposite directions (axes 0-3), the other axes (triggers) sweep from -1 to 1,
+    buttons are pressed one at a time and the hats go around the 8 directions.
+
+    :param device_: device instance id
+    :param buttons_: number of buttons
+    :param axes_: number of axes
+    :param hats_: number of hats
+    :param duration_: duration in seconds
+    :param rate_: axis report rate in Hz
+    :param seed_: random seed (noise added to the axis values)
+    :return: numpy array of EVENT_DTYPE records ordered by time
+    """
+    rng = numpy.random.default_rng(seed_)
+    n = int(duration_ * rate_)
+    t = (numpy.arange(n, dtype=numpy.int64) * 1000000000) // rate_
+    phase = 2 * numpy.pi * t * 1e-9 * 0.5
+
+    chunks = []
+    for axis in range(axes_):
+        if axis < 4:
+            # full circles, the right stick turns the other way
+            values = numpy.cos(phase) if axis % 2 == 0 else numpy.sin(phase) * (1.0 if axis < 2 else -1.0)
+        else:
+            values = numpy.abs((t * 1e-9 * 2) % 2 - 1) * 2 - 1
+        records = numpy.zeros(n, dtype=EVENT_DTYPE)
+        records['time'] = t
+        records['kind'] = KIND_AXIS
+        records['index'] = axis
+        records['value'] = numpy.clip(values + rng.normal(0, 0.002, n), -1, 1)
+        chunks.append(records)
+
+    # one button pressed every 250 ms for 100 ms
+    presses = numpy.arange(0, int(duration_ * 4), dtype=numpy.int64)
+    if buttons_:
+        for down, value in ((0, 1.0), (100000000, 0.0)):
+            records = numpy.zeros(len(presses), dtype=EVENT_DTYPE)
+            records['time'] = presses * 250000000 + down
+            records['kind'] = KIND_BUTTON
+            records['index'] = presses % buttons_
+            records['value'] = value
+            chunks.append(records)
+
+    # hats go around the 8 directions, one step every 500 ms
+    directions = [(0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1), (0, 0)]
+    steps = numpy.arange(0, int(duration_ * 2), dtype=numpy.int64)
+    for hat in range(hats_):
+        records = numpy.zeros(len(steps), dtype=EVENT_DTYPE)
+        records['time'] = steps * 500000000
+        records['kind'] = KIND_HAT
+        records['index'] = hat
+        records['value'] = [encode_hat(directions[s % len(directions)]) for s in steps.tolist()]
+        chunks.append(records)
+
+    records = numpy.concatenate(chunks)
+    records['device'] = device_
+    return records[numpy.argsort(records['time'], kind='stable')]
+
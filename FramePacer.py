@@ -0,0 +1,118 @@
+# encoding: utf-8
+"""
+                   GNU GENERAL PUBLIC LICENSE
+                       Version 3, 29 June 2007
+ Copyright (C) 2007 Free Software Foundation, Inc. <http://fsf.org/>
+ Everyone is permitted to copy and distribute verbatim copies
+ of this license document, but changing it is not allowed.
+ """
+
+__author__ = "Yoann Berenguer"
+__credits__ = ["Yoann Berenguer"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Yoann Berenguer"
+__email__ = "yoyoberenguer@hotmail.com"
+__status__ = "Joystick Demo"
+
+import time
+
+import pygame
+
+
+# Adaptive frame pacing
+# While inputs are active (input records, window events) or an animation is running, frames
+# are paced at fps_ (high FPS mode). After linger_ ms without activity the loop goes idle and
+# blocks until an input record or a window event arrives, or until idle_timeout_ ms elapsed
+# (overlays keep refreshing at a low rate). The idle wait pumps every idle_slice_ ms and the
+# backend is told to poll at the same interval (see DeviceBackend.set_idle).
+# SDL only pumps its event queue on the main thread, while waiting for the next frame the
+# pacer pumps it every slice_ ms so that the input sampler (background thread) timestamps
+# the joystick events within a slice instead of once per frame.
+# e.g
+# PACER = FramePacer(GL.BACKEND, fps_=120)
+# while True:
+#     ...
+#     PACER.activity(len(records) > 0 or len(events) > 0)
+#     ...draw and present the frame...
+#     PACER.tick(animating_=len(GL.HALO_POOL) > 0)
+
+class FramePacer:
+
+    def __init__(self, backend_, fps_: int = 120, idle_timeout_: int = 250, linger_: int = 500, slice_: int = 2,
+                 idle_slice_: int = 15):
+        """
+        :param backend_: DeviceBackend delivering the input records (see DeviceBackend.wait)
+        :param fps_: frame rate while inputs are active, 0 for no limit
+        :param idle_timeout_: maximum time in ms between two frames when idle
+        :param linger_: time in ms without activity before going idle
+        :param slice_: interval in ms between two pumps of the SDL event queue while waiting
+                       (resolution of the joystick timestamps, see InputSampler)
+        :param idle_slice_: interval in ms between two pumps of the SDL event queue while idle
+                            (latency of the first input after an idle period)
+        """
+        self.backend = backend_
+        self.fps = fps_
+        self.idle_timeout = idle_timeout_ * 1e-3
+        self.linger = linger_ * 1e-3
+        self.slice = slice_ * 1e-3
+        self.idle_slice = idle_slice_ * 1e-3
+        self.clock = pygame.time.Clock()
+        self.last_activity = time.perf_counter()
+        self.last_frame = time.perf_counter()  # end of the last call to tick
+        self.idle = False
+
+    def activity(self, active_: bool = True):
+        """ Report input activity for the current frame. """
+        if active_:
+            self.last_activity = time.perf_counter()
+
+    def pump(self, until_: float):
+        """ Pump the SDL event queue every self.slice seconds until until_ (time.perf_counter). """
+        while True:
+            pygame.event.pump()
+            remaining = until_ - time.perf_counter()
+            if remaining <= self.slice:
+                return
+            time.sleep(self.slice)
+
+    def wait(self, timeout_: float) -> bool:
+        """
+        Block until an input record or a window event is available, or timeout_ seconds elapsed.
+        The window queue is only peeked (pygame.event.wait would take joystick events from the
+        queue before the input sampler), input records wake the loop immediately.
+        Return True when woken up by an input.
+        """
+        deadline = time.perf_counter() + timeout_
+        pump = not self.backend.pump
+        while True:
+            if pygame.event.peek(pump=pump):
+                return True
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return False
+            if self.backend.wait(min(self.idle_slice, remaining)):
+                return True
+
+    def tick(self, animating_: bool = False) -> int:
+        """
+        End of frame, wait for the next one.
+        :param animating_: True while an animation is running (e.g halos), the frame rate stays high
+        :return: time in ms since the previous call (see pygame.time.Clock.tick)
+        """
+        if animating_ or time.perf_counter() - self.last_activity < self.linger:
+            if self.idle:
+                self.idle = False
+                self.backend.set_idle(None)
+            if self.fps and not self.backend.pump:
+                self.pump(self.last_frame + 1.0 / self.fps)
+            elapsed = self.clock.tick(self.fps)
+        else:
+            if not self.idle:
+                self.idle = True
+                self.backend.set_idle(self.idle_slice)
+            if self.wait(self.idle_timeout):
+                self.activity()
+            elapsed = self.clock.tick()
+        self.last_frame = time.perf_counter()
+        return elapsed
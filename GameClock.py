@@ -0,0 +1,89 @@
+# encoding: utf-8
+"""
+                   GNU GENERAL PUBLIC LICENSE
+                       Version 3, 29 June 2007
+ Copyright (C) 2007 Free Software Foundation, Inc. <http://fsf.org/>
+ Everyone is permitted to copy and distribute verbatim copies
+ of this license document, but changing it is not allowed.
+ """
+
+__author__ = "Yoann Berenguer"
+__credits__ = ["Yoann Berenguer"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Yoann Berenguer"
+__email__ = "yoyoberenguer@hotmail.com"
+__status__ = "Joystick Demo"
+
+import time
+
+
+# Fixed timestep clock shared by all the sprites
+# The frame time is measured with time.perf_counter_ns and added to an accumulator that is
+# consumed in fixed steps. Sprites advance by elapsed_ns (a whole number of steps) instead
+# of the frame time, animations run at the same speed whatever the frame rate.
+# e.g
+# GL.CLOCK = GameClock(rate_=60)
+# while True:
+#     GL.CLOCK.tick()
+#     GL.All.update()             # sprites read GL.CLOCK.elapsed_ns
+#
+# class Sprite:
+#     def update(self):
+#         self.dt += GL.CLOCK.elapsed_ns
+#         while self.dt >= self.period_ns:
+#             self.dt -= self.period_ns
+#             ...next animation frame...
+
+class GameClock:
+
+    def __init__(self, rate_: int = 60, max_steps_: int = 8):
+        """
+        :param rate_: number of fixed steps per second
+        :param max_steps_: maximum number of steps per frame, the time above is dropped
+                           (long stalls do not fast forward the animations)
+        """
+        assert isinstance(rate_, int) and rate_ > 0, 'Argument rate_ should be a positive integer.'
+        self.rate = rate_
+        self.step_ns = 1000000000 // rate_
+        self.max_steps = max_steps_
+        self.last = None  # perf_counter_ns of the last tick
+        self.accumulator = 0  # time not consumed by the steps (ns)
+        self.delta_ns = 0  # frame time (ns)
+        self.steps = 0  # fixed steps elapsed during the last frame
+        self.elapsed_ns = 0  # steps * step_ns
+        self.time_ns = 0  # fixed step time since the first tick (ns)
+        self.frames = 0  # number of ticks
+
+    def tick(self, delta_ns_: int = None) -> int:
+        """
+        Start a new frame.
+        :param delta_ns_: frame time in ns, default measured with time.perf_counter_ns
+                          (e.g replays and benchmarks can advance the clock deterministically)
+        :return: number of fixed steps elapsed
+        """
+        now = time.perf_counter_ns()
+        if delta_ns_ is None:
+            delta_ns_ = now - self.last if self.last is not None else 0
+        self.last = now
+        self.delta_ns = delta_ns_
+        self.accumulator += delta_ns_
+        steps = self.accumulator // self.step_ns
+        self.accumulator -= steps * self.step_ns
+        if steps > self.max_steps:
+            steps = self.max_steps
+        self.steps = steps
+        self.elapsed_ns = steps * self.step_ns
+        self.time_ns += self.elapsed_ns
+        self.frames += 1
+        return steps
+
+    @property
+    def delta_ms(self) -> float:
+        """ Frame time in ms (sub millisecond resolution). """
+        return self.delta_ns * 1e-6
+
+    @property
+    def alpha(self) -> float:
+        """ Fraction of a step left in the accumulator, in range [0, 1[ (interpolation between two steps). """
+        return self.accumulator / self.step_ns
@@ -0,0 +1,110 @@
+# encoding: utf-8
+"""
+                   GNU GENERAL PUBLIC LICENSE
+                       Version 3, 29 June 2007
+ Copyright (C) 2007 Free Software Foundation, Inc. <http://fsf.org/>
+ Everyone is permitted to copy and distribute verbatim copies
+ of this license document, but changing it is not allowed.
+ """
+
+__author__ = "Yoann Berenguer"
+__credits__ = ["Yoann Berenguer"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Yoann Berenguer"
+__email__ = "yoyoberenguer@hotmail.com"
+__status__ = "Joystick Demo"
+
+import os
+import struct
+import time
+
+import numpy
+
+from InputServer import EVENT_DTYPE
+
+# Recording file layout
+# header  : magic (8 bytes), record size (uint32), reserved (uint32),
+#           perf_counter_ns at creation (int64), epoch time at creation (float64)
+# records : EVENT_DTYPE records (19 bytes each), appended in chunks
+RECORDING_MAGIC = b'JOYREC01'
+HEADER_FORMAT = '<8sIIqd'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+
+def read_header(file: str) -> dict:
+    """ Return the header of a recording file (see InputRecorder). """
+    with open(file, 'rb') as file_:
+        magic, itemsize, _, origin_ns, origin_time = struct.unpack(HEADER_FORMAT, file_.read(HEADER_SIZE))
+    if magic != RECORDING_MAGIC or itemsize != EVENT_DTYPE.itemsize:
+        raise ValueError('\n[-] Error : %s is not a joystick recording.' % file)
+    return {'origin_ns': origin_ns, 'origin_time': origin_time}
+
+
+def load_recording(file: str) -> numpy.ndarray:
+    """
+    Map a recording file in memory (read only, no copy).
+    Return a numpy.memmap of EVENT_DTYPE records, an incomplete trailing record is ignored.
+    """
+    read_header(file)
+    count = (os.path.getsize(file) - HEADER_SIZE) // EVENT_DTYPE.itemsize
+    if count == 0:
+        return numpy.zeros(0, dtype=EVENT_DTYPE)
+    return numpy.memmap(file, dtype=EVENT_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+
+# Binary input recorder
+# Input records (see InputSampler) are accumulated in a fixed buffer and appended
+# to the recording file one chunk at a time, a call to write is a single array copy.
+# e.g
+# RECORDER = InputRecorder('session.rec')
+# RECORDER.write(SAMPLER.drain())
+# RECORDER.close()
+# records = load_recording('session.rec')
+
+class InputRecorder:
+
+    def __init__(self, file: str, chunk_: int = 1 << 16):
+        """
+        :param file: recording file, records are appended if the file already exists
+        :param chunk_: number of records buffered before writing to disk
+        """
+        self.file = file
+        new = not os.path.exists(file) or os.path.getsize(file) == 0
+        if not new:
+            read_header(file)
+        self.handle = open(file, 'ab')
+        if new:
+            self.handle.write(struct.pack(HEADER_FORMAT, RECORDING_MAGIC, EVENT_DTYPE.itemsize, 0,
+                                          time.perf_counter_ns(), time.time()))
+        self.buffer = numpy.zeros(chunk_, dtype=EVENT_DTYPE)
+        self.size = 0  # records pending in the buffer
+        self.count = 0  # records written by this recorder
+
+    def write(self, records_: numpy.ndarray):
+        """ Append input records (EVENT_DTYPE). """
+        n = len(records_)
+        chunk = len(self.buffer)
+        while n:
+            m = min(n, chunk - self.size)
+            self.buffer[self.size:self.size + m] = records_[:m]
+            self.size += m
+            records_ = records_[m:]
+            n -= m
+            if self.size == chunk:
+                self.flush()
+
+    def flush(self):
+        """ Write the pending records to disk. """
+        if self.size:
+            self.handle.write(self.buffer[:self.size].tobytes())
+            self.count += self.size
+            self.size = 0
+        self.handle.flush()
+
+    def close(self):
+        """ Flush the pending records and close the file. """
+        if self.handle is not None:
+            self.flush()
+            self.handle.close()
+            self.handle = None
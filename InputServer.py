@@ -0,0 +1,346 @@
+# encoding: utf-8
+"""
+                   GNU GENERAL PUBLIC LICENSE
+                       Version 3, 29 June 2007
+ Copyright (C) 2007 Free Software Foundation, Inc. <http://fsf.org/>
+ Everyone is permitted to copy and distribute verbatim copies
+ of this license document, but changing it is not allowed.
+ """
+
+__author__ = "Yoann Berenguer"
+__credits__ = ["Yoann Berenguer"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Yoann Berenguer"
+__email__ = "yoyoberenguer@hotmail.com"
+__status__ = "Joystick Demo"
+
+import pygame
+import numpy
+import threading
+import time
+
+# Joystick events processed by the input server
+JOYSTICK_EVENTS = (pygame.JOYBUTTONDOWN, pygame.JOYBUTTONUP, pygame.JOYAXISMOTION, pygame.JOYHATMOTION)
+
+# Device hotplug is only reported by pygame 2 (SDL2)
+JOYDEVICEADDED = getattr(pygame, 'JOYDEVICEADDED', None)
+JOYDEVICEREMOVED = getattr(pygame, 'JOYDEVICEREMOVED', None)
+
+# Input record, one per joystick event (see RingBuffer and InputSampler)
+# time   : perf_counter_ns timestamp
+# device : instance id
+# kind   : KIND_BUTTON, KIND_AXIS, KIND_HAT or KIND_REMOVED
+# index  : button, axis or hat number
+# value  : button 0/1, axis value, hat encoded with encode_hat
+EVENT_DTYPE = numpy.dtype([('time', numpy.int64), ('device', numpy.int32), ('kind', numpy.int8),
+                           ('index', numpy.int16), ('value', numpy.float32)])
+KIND_BUTTON, KIND_AXIS, KIND_HAT, KIND_REMOVED = 0, 1, 2, 3
+
+
+def encode_hat(hat_: tuple) -> int:
+    """ Encode a hat position (x, y), x and y in (-1, 0, 1), into a single value in [-4, 4]. """
+    return hat_[0] + 3 * hat_[1]
+
+
+def decode_hat(value_) -> tuple:
+    """ Decode a hat value created with encode_hat. """
+    y = int(round(value_ / 3.0))
+    return int(round(value_)) - 3 * y, y
+
+
+def instance_id(object_) -> int:
+    """
+    Return the instance id of a joystick or a joystick event.
+    pygame 2 identifies devices with an instance id, pygame 1.9 with the device index.
+    """
+    if hasattr(object_, 'type'):
+        return getattr(object_, 'instance_id', getattr(object_, 'joy', None))
+    get_instance_id = getattr(object_, 'get_instance_id', None)
+    return get_instance_id() if get_instance_id is not None else object_.get_id()
+
+
+# State of a single device, updated by InputControl from joystick events.
+# e.g
+# state = DeviceState(pygame.joystick.Joystick(0))
+# state.buttons[0], state.axes[1], state.hats[0]
+
+class DeviceState:
+
+    def __init__(self, joystick_):
+        """
+        Read the device name, the number of inputs and the current input values once.
+        :param joystick_: initialised pygame.joystick.Joystick
+        """
+        self.name = joystick_.get_name()
+        # SDL GUID, pygame 2 only
+        self.guid = joystick_.get_guid() if hasattr(joystick_, 'get_guid') else ''
+        self.instance_id = instance_id(joystick_)
+        self.buttons = [joystick_.get_button(b) for b in range(joystick_.get_numbuttons())]
+        self.axes = [joystick_.get_axis(a) for a in range(joystick_.get_numaxes())]
+        self.hats = [joystick_.get_hat(h) for h in range(joystick_.get_numhats())]
+        self.hits = set()  # buttons pressed since the last call to pop_hits
+        self.connected = True
+        self.events = 0  # number of events processed for this device
+        self.timestamp = 0  # perf_counter_ns of the last event (sampled events only)
+
+    def pop_hits(self) -> set:
+        """ Return the buttons pressed since the last call (a press shorter than a refresh is not lost). """
+        hits = self.hits
+        self.hits = set()
+        return hits
+
+
+# Input state store
+# Joystick events are dispatched to the state of their device (indexed by instance id),
+# the display reads the store and never calls the joystick devices.
+# e.g
+# INPUT_SERVER = InputControl()
+# INPUT_SERVER.add(pygame.joystick.Joystick(0))
+# for event in pygame.event.get():
+#     INPUT_SERVER.process(event)
+
+class InputControl:
+
+    def __init__(self):
+        self.devices = {}  # instance id -> DeviceState
+
+    def add(self, joystick_) -> DeviceState:
+        """ Register a device (the joystick is initialised if needed) and return its state. """
+        if not joystick_.get_init():
+            joystick_.init()
+        state = DeviceState(joystick_)
+        self.devices[state.instance_id] = state
+        return state
+
+    def get(self, instance_id_: int):
+        """ Return the state of a device or None if the device is unknown. """
+        return self.devices.get(instance_id_)
+
+    def remove(self, instance_id_: int):
+        """ Forget a device, its following events are ignored. Return its state or None if unknown. """
+        return self.devices.pop(instance_id_, None)
+
+    def process(self, event_) -> bool:
+        """
+        Update the store with a pygame event.
+        Return True if the event was a joystick event of a registered device.
+        """
+        if event_.type not in JOYSTICK_EVENTS and event_.type != JOYDEVICEREMOVED:
+            return False
+
+        state = self.devices.get(instance_id(event_))
+        if state is None:
+            return False
+
+        if event_.type == pygame.JOYAXISMOTION:
+            state.axes[event_.axis] = event_.value
+        elif event_.type == pygame.JOYBUTTONDOWN:
+            state.buttons[event_.button] = 1
+            state.hits.add(event_.button)
+        elif event_.type == pygame.JOYBUTTONUP:
+            state.buttons[event_.button] = 0
+        elif event_.type == pygame.JOYHATMOTION:
+            state.hats[event_.hat] = event_.value
+        else:
+            state.connected = False
+        state.events += 1
+        return True
+
+    def process_records(self, records_: numpy.ndarray) -> int:
+        """
+        Update the store with input records (EVENT_DTYPE) drained from an InputSampler.
+        Records are applied in order, the store holds the latest value of every input.
+        Return the number of records applied.
+        """
+        applied = 0
+        for t, device, kind, index, value in records_.tolist():
+            state = self.devices.get(device)
+            if state is None:
+                continue
+            if kind == KIND_AXIS:
+                state.axes[index] = value
+            elif kind == KIND_BUTTON:
+                state.buttons[index] = int(value)
+                if value:
+                    state.hits.add(index)
+            elif kind == KIND_HAT:
+                state.hats[index] = decode_hat(value)
+            else:
+                state.connected = False
+            state.events += 1
+            state.timestamp = t
+            applied += 1
+        return applied
+
+
+# Lock-free single producer / single consumer ring buffer of input records.
+# The producer only moves self.head and the consumer only moves self.tail,
+# records are written before the head is published.
+# e.g
+# ring = RingBuffer(4096)
+# ring.push(time.perf_counter_ns(), 0, KIND_AXIS, 1, 0.5)
+# records = ring.pop()
+
+class RingBuffer:
+
+    def __init__(self, capacity_: int = 1 << 16):
+        """
+        :param capacity_: number of records, rounded up to a power of two
+        """
+        capacity = 1
+        while capacity < capacity_:
+            capacity <<= 1
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.buffer = numpy.zeros(capacity, dtype=EVENT_DTYPE)
+        self.head = 0  # total number of records written (producer)
+        self.tail = 0  # total number of records read (consumer)
+        self.dropped = 0  # records lost because the buffer was full
+
+    def __len__(self):
+        return self.head - self.tail
+
+    def push(self, time_: int, device_: int, kind_: int, index_: int, value_: float) -> bool:
+        """ Append a record, return False (record dropped) if the buffer is full. """
+        head = self.head
+        if head - self.tail >= self.capacity:
+            self.dropped += 1
+            return False
+        self.buffer[head & self.mask] = (time_, device_, kind_, index_, value_)
+        self.head = head + 1
+        return True
+
+    def pop(self) -> numpy.ndarray:
+        """ Return (copy) and remove all the pending records, oldest first. """
+        tail, head = self.tail, self.head
+        if head == tail:
+            return self.buffer[:0].copy()
+        start, end = tail & self.mask, head & self.mask
+        if start < end:
+            records = self.buffer[start:end].copy()
+        else:
+            records = numpy.concatenate((self.buffer[start:], self.buffer[:end]))
+        self.tail = head
+        return records
+
+
+# High rate joystick sampler
+# Joystick events are drained from the SDL queue up to rate_ times per second in a background
+# thread, timestamped with time.perf_counter_ns and stored into a RingBuffer. The renderer
+# consumes the records once per frame (see InputControl.process_records).
+# SDL turns the joystick changes into events when the queue is pumped (SDL_PumpEvents), which
+# is only supported on the thread that initialised the video (Cocoa asserts on macOS, X11 races
+# with the display updates), the background thread never pumps. The timestamp resolution is
+# the pumping interval of the main thread (see FramePacer, pumping in short slices). While the
+# main loop is idle it pumps less often and the sampler polls at the same interval (set_period).
+# e.g
+# SAMPLER = InputSampler(rate_=1000)
+# SAMPLER.start()
+# ...
+# INPUT_SERVER.process_records(SAMPLER.drain())
+
+class InputSampler:
+
+    def __init__(self, rate_: int = 1000, capacity_: int = 1 << 16, threaded_: bool = True, pump_: bool = False):
+        """
+        :param rate_: sampling rate in Hz
+        :param capacity_: ring buffer capacity (records)
+        :param threaded_: True to sample in a background thread, False to call poll from the main loop
+        :param pump_: True if the sampler pumps the SDL event queue, only allowed when the sampler is not
+                      threaded (poll is then called by the main thread). Otherwise the main thread pumps
+                      the queue and the sampler drains it with pump=False.
+                      When the sampler pumps, the main loop should read its events with pump=False.
+        """
+        assert isinstance(rate_, int) and rate_ > 0, 'Argument rate_ should be a positive integer.'
+        assert not (threaded_ and pump_), 'The SDL event queue cannot be pumped from the sampler thread.'
+        self.rate = rate_
+        self.period = 1.0 / rate_
+        self.interval = self.period  # current polling interval (see set_period)
+        self.ring = RingBuffer(capacity_)
+        self.threaded = threaded_
+        self.pump = pump_
+        self.thread = None
+        self.running = False
+        self.polls = 0  # number of queue reads
+        self.samples = 0  # number of records captured
+        self.ready = threading.Event()  # set when records are waiting in the ring buffer
+
+    def poll(self) -> int:
+        """ Drain the joystick events from the SDL queue into the ring buffer, return the number of records. """
+        types = JOYSTICK_EVENTS + ((JOYDEVICEREMOVED,) if JOYDEVICEREMOVED is not None else ())
+        events = pygame.event.get(eventtype=types, pump=self.pump)
+        self.polls += 1
+        if not events:
+            return 0
+        t = time.perf_counter_ns()
+        push = self.ring.push
+        for event in events:
+            device = instance_id(event)
+            if event.type == pygame.JOYAXISMOTION:
+                push(t, device, KIND_AXIS, event.axis, event.value)
+            elif event.type == pygame.JOYBUTTONDOWN:
+                push(t, device, KIND_BUTTON, event.button, 1.0)
+            elif event.type == pygame.JOYBUTTONUP:
+                push(t, device, KIND_BUTTON, event.button, 0.0)
+            elif event.type == pygame.JOYHATMOTION:
+                push(t, device, KIND_HAT, event.hat, encode_hat(event.value))
+            else:
+                push(t, device, KIND_REMOVED, 0, 0.0)
+        self.samples += len(events)
+        self.ready.set()
+        return len(events)
+
+    def run(self):
+        """ Sampling loop (background thread). """
+        next_time = time.perf_counter()
+        while self.running:
+            try:
+                self.poll()
+            except pygame.error:
+                # pygame has been shut down
+                break
+            next_time += self.interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # late, do not try to catch up
+                next_time = time.perf_counter()
+
+    def set_period(self, period_: float = None):
+        """
+        Poll every period_ seconds, e.g while the main loop is idle and pumps the SDL queue at a
+        lower rate (polling faster than the queue is pumped finds no new events).
+        :param period_: polling interval in seconds, None to restore the sampling rate
+        """
+        self.interval = self.period if period_ is None else max(period_, self.period)
+
+    def start(self):
+        """ Start the background thread (no effect when threaded_ is False). """
+        if self.threaded and not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self.run, name='InputSampler', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """ Stop the background thread. """
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+    def drain(self) -> numpy.ndarray:
+        """ Return the records captured since the last call (see InputControl.process_records). """
+        if not self.threaded:
+            self.poll()
+        self.ready.clear()
+        return self.ring.pop()
+
+    def wait(self, timeout_: float) -> bool:
+        """ Block until records are waiting (see drain) or timeout_ seconds elapsed, return True if ready. """
+        if not self.threaded:
+            time.sleep(timeout_)
+            self.poll()
+            return len(self.ring) > 0
+        return self.ready.wait(timeout_)
@@ -1,6 +1,21 @@
 # encoding: utf-8
 
+import os
+# Let SDL deliver joystick events from its own thread (see InputSampler), must be set before pygame.init
+os.environ.setdefault('SDL_JOYSTICK_THREAD', '1')
+
 from SoundServer import SoundControl
+from TextCache import TextCache
+from InputServer import InputControl, JOYSTICK_EVENTS, JOYDEVICEADDED, JOYDEVICEREMOVED, instance_id
+from Analyzer import PollingAnalyzer, StickAnalyzer
+from InputRecorder import InputRecorder, load_recording
+from Profiler import FrameProfiler, ProfilerHUD, LatencyProbe
+from FramePacer import FramePacer
+from GameClock import GameClock
+from AssetManager import AssetManager
+from StickTrail import StickTrail, STICK_VIEWS
+from ControllerLayout import LayoutIndex, LayoutDatabase, AXIS_STICK, AXIS_TRIGGER, AXIS_SPLIT
+from DeviceBackend import DeviceBackend, PygameBackend, ReplayBackend
 
 __author__ = "Yoann Berenguer"
 __credits__ = ["Yoann Berenguer"]
@@ -13,260 +28,20 @@ import pygame
 from pygame import freetype
 import numpy
 import _pickle as pickle
+import hashlib
+import time
+import zlib
 
 ASSETS_PATH = 'Assets/'
+HALO_CACHE = ASSETS_PATH + 'Halo.cache'
 
-CONTROLLER_LAYOUT = {
-    # Motion sensing(3 axes, 6 degrees of freedom)
-    # 2× Analog
-    # sticks(10 - bit
-    # precision)
-    # 2× Analog
-    # triggers
-    # (L2, R2)
-    # 6× Pressure - sensitive
-    # buttons
-    # (Triangle, Circle, Cross, Square, L1, R1)
-    # Pressure - sensitive
-    # directional
-    # buttons
-    # 5× Digital
-    # buttons
-    # (Start, Select, "PS", L3, R3)
-
-    # DUALSHOCK 3 PS3 layout connected with USB cable or using bluethooth
-    # with XBOX 360 drivers emulation
-    # Buttons x 10 (11 with PS button)
-
-    'Controller (XBOX 360 For Windows)':
-    # |----- NAME ------------| NUMBER
-        {'buttons':
-             [{'A          :': (575, 327)},  # 0
-              {'B          :': (617, 300)},  # 1
-              {'X          :': (535, 300)},  # 2
-              {'Y          :': (578, 273)},  # 3
-              {'LBUMPER    :': (265, 230)},  # 4
-              {'RBUMPER    :': (576, 230)},  # 5
-              {'BACK       :': (380, 300)},  # 6
-              {'START      :': (467, 300)},  # 7
-              {'STICK LEFT :': (270, 300)},  # 8
-              {'STICK RIGHT:': (500, 361)},  # 9
-              {'XBOX       :': (423, 253)}],  # 10
-         'axis':
-         # ---------------------------------
-         # AXIS ( 2 axis + 2 pads left right
-         # Left / right same axis but values differs,
-         # left side (0, 1) right side (0, -1)
-             [{'8 AXIS X   :': (270, 300)},  # 0  range X(-1, 1)
-              {'8 AXIS Y   :': (270, 300)},  # 1  range Y(-1, 1)
-              {'LEFT/RIGHT :': [(265, 230), (576, 230)]},  # 2  left side (0, 1) right side (0, -1)
-              {'9 AXIS X   :': (500, 361)},  # 9  range X(-1, 1)
-              {'9 AXIS Y   :': (500, 361)}],  # 9  range Y(-1, 1)
-         # ----------------------------------
-         # HATS return a tuple (0, 0)
-         'hats':
-             [{'D-PAD RIGHT   :': (375, 363)},  # tuple[1] range 0 or 1
-              {'D-PAD LEFT    :': (320, 363)},  # tuple[1] range 0 or -1
-              {'D-PAD UP      :': (346, 344)},  # tuple[0] range 0 or 1
-              {'D-PAD DOWN    :': (346, 384)}  # tuple[0] range 0 or -1
-              ]},
-
-    # GIOTECK VX2 2.4G Wireless PS3 controller layout connected
-    # with USB cable or using bluethooth
-    # with XBOX 360 drivers emulation
-    # Buttons x 13
-    'Gioteck VX2 2.4G Wireless Controller':
-        {'buttons':
-             [{'TRIANGLE   :': (530, 326)},  # 0
-              {'CIRCLE     :': (559, 355)},  # 1
-              {'X          :': (530, 385)},  # 2
-              {'SQUARE     :': (498, 356)},  # 3
-              {'L1         :': (310, 272)},  # 4
-              {'R1         :': (530, 272)},  # 5
-              {'L2         :': (310, 272)},  # 6
-              {'R2         :': (530, 272)},  # 7
-              {'SELECT     :': (387, 356)},  # 8
-              {'START      :': (451, 356)},  # 9
-              {'L3 PRESSED :': (362, 411)},  # 10
-              {'R3 PRESSED :': (474, 411)},  # 11
-              {'PS         :': (420, 376)}],  # 12
-         'axis':
-         # -------------------------------
-         # AXIS x 4 detected (axis 2 controlling right pad and left pad)
-             [{'L3 X       : ': (362, 411)},  # 0  range -1, 1
-              {'L3 Y       : ': (362, 411)},  # 1  range -1, 1
-              {'R3 X       : ': (474, 411)},  # 2  range -1, 1
-              {'R3 Y       : ': (474, 411)}],  # 3  range -1, 1
-         'hats':
-         # ----------------------------------
-         # HATS return a tuple (0, 0)
-             [{'D-PAD UP      :': (330, 355)},  # tuple[1] range 0 or 1
-              {'D-PAD DOWN    :': (287, 355)},  # tuple[1] range 0 or -1
-              {'D-PAD RIGHT   :': (309, 336)},  # tuple[0] range 0 or 1
-              {'D-PAD LEFT    :': (309, 375)}  # tuple[0] range 0 or -1
-              ]},
-
-    # DUALSHOCK 4 PS3 layout connected with USB cable or using bluethooth
-    # with XBOX 360 drivers emulation
-    # 6 axis motion sensing (3 axis accelerometer, 3 axis gyroscope)
-    # 2× Analog sticks
-    # 2× Analog triggers
-    # (L2, R2)
-    # 2× Pressure-sensitive buttons
-    # (L1, R1)
-    # 10× Digital buttons
-    # (Triangle, Circle, Cross, Square, L3, R3, "PS", SHARE, OPTIONS, touchpad click)
-    # Digital directional buttons
-    # 2 point capacitive touchpad with click mechanism (see buttons)[24]
-    'Wireless Controller':
-    # Buttons x 14
-        {'buttons':
-             [{'SQUARE   :': (528, 307)},  # 0
-              {'X        :': (560, 333)},  # 1
-              {'CIRCLE   :': (590, 306)},  # 2
-              {'TRIANGLE :': (560, 281)},  # 3
-              {'L1       :': (295, 245)},  # 4
-              {'R1       :': (555, 245)},  # 5
-              {'L2       :': (295, 245)},  # 6 duplicate with axis
-              {'R2       :': (555, 245)},  # 7 duplicate with axis
-              {'SHARE    :': (340, 270)},  # 8
-              {'OPTIONS  :': (515, 270)},  # 9
-              {'L3       :': (358, 355)},  # 10
-              {'R3       :': (495, 355)},  # 11
-              {'PS       :': (425, 355)},  # 12
-              {'TRIGGER  :': (430, 288)}],  # 13
-         'axis':
-         # -------------------------------
-         # AXIS x 6 detected (axis 2 controlling right pad and left pad)
-             [{'L3 X     :': (358, 355)},  # 0  range -1, 1
-              {'L3 Y     :': (358, 355)},  # 1  range -1, 1
-              {'R3 X     :': (495, 355)},  # 2  range -1, 1
-              {'R3 Y     :': (495, 355)},  # 3  range -1, 1
-              {'R2       :': (555, 245)},  # 4  right side (-1, 1)
-              {'L2       :': (295, 245)}],  # 5  left side (-1, 1)
-         'hats':
-         # ----------------------------------
-         # HATS return a tuple (0, 0)
-             [{'D-PAD UP   :': (317, 305)},  # tuple[1] range 0 or 1
-              {'D-PAD DOWN :': (269, 305)},  # tuple[1] range 0 or -1
-              {'D-PAD RIGHT:': (293, 286)},  # tuple[0] range 0 or 1
-              {'D-PAD LEFT :': (293, 323)}  # tuple[0] range 0 or -1
-              ]},
-
-    # new gamepad
-    'MY-POWER CO.,LTD. 2In1 USB Joystick':
-        {'buttons':
-             [{'TRIANGLE   :': (530, 326)},  # 0
-              {'CIRCLE     :': (559, 355)},  # 1
-              {'X          :': (530, 385)},  # 2
-              {'SQUARE     :': (498, 356)},  # 3
-              {'L1         :': (310, 272)},  # 4
-              {'R1         :': (530, 272)},  # 5
-              {'L2         :': (310, 272)},  # 6
-              {'R2         :': (530, 272)},  # 7
-              {'SELECT     :': (387, 356)},  # 8
-              {'START      :': (451, 356)},  # 9
-              {'L3 PRESSED :': (362, 411)},  # 10
-              {'R3 PRESSED :': (474, 411)},  # 11
-              {'PS         :': (420, 376)}],  # 12
-         'axis':
-         # -------------------------------
-         # AXIS x 4 detected (axis 2 controlling right pad and left pad)
-             [{'L3 X       : ': (362, 411)},  # 0  range -1, 1
-              {'L3 Y       : ': (362, 411)},  # 1  range -1, 1
-              {'R3 X       : ': (474, 411)},  # 2  range -1, 1
-              {'R3 Y       : ': (474, 411)}],  # 3  range -1, 1
-         'hats':
-         # ----------------------------------
-         # HATS return a tuple (0, 0)
-             [{'D-PAD UP      :': (330, 355)},  # tuple[1] range 0 or 1
-              {'D-PAD DOWN    :': (287, 355)},  # tuple[1] range 0 or -1
-              {'D-PAD RIGHT   :': (309, 336)},  # tuple[0] range 0 or 1
-              {'D-PAD LEFT    :': (309, 375)}  # tuple[0] range 0 or -1
-              ]}
-}
-
+# Controller layouts, one JSON file per device (see ControllerLayout.LayoutDatabase)
+LAYOUTS_PATH = ASSETS_PATH + 'Layouts/'
+# Layout coordinates are screen coordinates of a panel centered on the 800x600 screen,
+# topleft corner and size of the scheme image in these coordinates (see DashboardTile)
+SCHEME_ORIGIN = (125, 220)
+SCHEME_SIZE = (600, 272)
 
-"""
-        {'buttons': [
-            {'TRIANGLE :': (0, 0)},  # 0
-            {'CIRCLE   :': (0, 0)},  # 1
-            {'X        :': (0, 0)},  # 2
-            {'SQUARE   :': (0, 0)},  # 3
-            {'L1       :': (0, 0)},  # 4
-            {'R1       :': (0, 0)},  # 5
-            {'SELECT   :': (0, 0)},  # 6
-            {'START    :': (0, 0)},  # 7
-            {'L3 CLICK :': (0, 0)},  # 8
-            {'R3 CLICK :': (0, 0)},  # 9
-            {'PS       :': (0, 0)}],  # 10  # not detected when connected with USB cable using XBOX 360 drivers
-            'axis': [
-                # -------------------------------
-                # AXIS x 4 detected (axis 2 controlling right pad and left pad)
-                {'L3 X     :': (0, 0)},  # 0  range -1, 1
-                {'L3 Y     :': (0, 0)},  # 1  range -1, 1
-                {'L2       :': (0, 0)},  # 2  left side (0, 1)
-                {'R2       :': (0, 0)},  # 2  right side (0, -1)
-                {'R3 X     :': (0, 0)},  # 3  range -1, 1
-                {'R3 Y     :': (0, 0)}],  # 4  range -1, 1
-            'hats':
-                 # ----------------------------------
-                 # HATS return a tuple (0, 0)
-                     [{'D-PAD UP      :': (330, 355)},  # tuple[1] range 0 or 1
-                      {'D-PAD DOWN    :': (287, 355)},  # tuple[1] range 0 or -1
-                      {'D-PAD RIGHT   :': (309, 336)},  # tuple[0] range 0 or 1
-                      {'D-PAD LEFT    :': (309, 375)}  # tuple[0] range 0 or -1
-                      ]
-        },
-
-    # XBOX 360 LAYOUT
-    # Input
-    # Digital D-Pad
-    # 2× Analog triggers (LT, RT)
-    # 2× Analog sticks
-    # 11× Digital buttons
-    # (Y, B, A, X, LB, RB, left stick click, right stick click, Menu, View, Xbox)
-    # Wireless pairing button
-    # Connectivity
-    # Wireless
-    # Micro USB
-    # 3.5 mm stereo audio jack (after 2nd revision)
-    # Bluetooth 4.0 (third revision)
-    # USB-C (Elite Series 2)
-
-    'XBOX 360 For Windows':
-    #  |----- NAME ------------| NUMBER
-        {'buttons':
-             ['A          :',  # 0
-              'B          :',  # 1
-              'X          :',  # 2
-              'Y          :',  # 3
-              'LBUMPER    :',  # 4
-              'RBUMPER    :',  # 5
-              'BACK       :',  # 6
-              'START      :',  # 7
-              'STICK LEFT :',  # 8
-              'STICK RIGHT:',  # 9
-              'XBOX       :'],  # 10
-         'axis':
-         # ---------------------------------
-         # AXIS ( 2 axis + 2 pads left right
-         # Left / right same axis but values differs,
-         # left side (0, 1) right side (0, -1)
-             ['8 AXIS X   :',  # 0  range X(-1, 1)
-              '8 AXIS Y   :',  # 1  range Y(-1, 1)
-              'LEFT/RIGHT :',  # 2  left side (0, 1) right side (0, -1)
-              '9 AXIS X   :',  # 9  range X(-1, 1)
-              '9 AXIS Y   :'],  # 9  range Y(-1, 1)
-         # ----------------------------------
-         # HATS return a tuple (0, 0)
-         'hats':
-             ['D-PAD UP      :',  # tuple[1] range 0 or 1
-              'D-PAD DOWN    :',  # tuple[1] range 0 or -1
-              'D-PAD RIGHT   :',  # tuple[0] range 0 or 1
-              'D-PAD LEFT    :'  # tuple[0] range 0 or -1
-              ]},
-"""
 
 OPTIONS_MENU_JOYSTICK = {
     1: {'TEXT': 'Disconnected', 'SIZE': 16,
@@ -277,14 +52,35 @@ OPTIONS_MENU_JOYSTICK = {
 }
 OPTIONS_OPTIONS = [OPTIONS_MENU_JOYSTICK]
 
+# Halo colors, applied at blit time (see Halo.get_tints)
+HALO_RED = pygame.Color(255, 0, 0, 255)
+HALO_GREEN = pygame.Color(25, 255, 18, 255)
+HALO_BLUE = pygame.Color(15, 25, 255, 255)
+HALO_PURPLE = pygame.Color(120, 15, 255, 255)
+# Indexed by the colour index of the compiled layouts (see ControllerLayout.COLOR_RED..)
+HALO_COLORS = (HALO_RED, HALO_GREEN, HALO_BLUE, HALO_PURPLE)
+
 
 class GL:
     All = None
-    TIME_PASSED_SECONDS = None
+    TIME_PASSED_SECONDS = None  # duration of the last frame in ms (see GameClock.delta_ms)
+    CLOCK = None  # GameClock shared by the sprites
     MOUSE_POS = pygame.math.Vector2(0, 0)
     SOUND_SERVER = None
     JOYSTICK = None
     MAIN_MENU_FONT = None
+    TEXT_CACHE = None
+    HALO_POOL = None
+    INPUT_SERVER = None
+    ANALYZER = None
+    SHOW_ANALYSIS = False
+    STICKS = None  # StickAnalyzer, circularity, drift and dead zone of the analog sticks
+    STICK_VIEW = None  # stick trails shown on the panels, None, 'trail' or 'heatmap' (see StickTrail)
+    TRAILS = None  # pygame.sprite.Group of the StickTrail sprites, fed with the input records
+    BACKEND = None
+    LATENCY = None
+    LAYOUTS = None  # LayoutDatabase, compiled controller layouts
+    ASSETS = None  # AssetManager, images loaded on first use
 
 
 def make_array(rgb_array_: numpy.ndarray, alpha_: numpy.ndarray) -> numpy.ndarray:
@@ -397,32 +193,178 @@ def load_per_pixel(file: str) -> pygame.Surface:
         raise SystemExit('\n[-] Error : Could not load image %s %s ' % (file, pygame.get_error()))
 
 
+def load_rgba(file: str) -> numpy.ndarray:
+    """
+    Load an image and return its RGBA values as a 3D numpy array (numpy.uint8) like (width, height, RGBA).
+    The array is a transposed view of the image buffer (rows stay contiguous in memory).
+    """
+    assert isinstance(file, str), 'Expecting path for argument <file> got %s: ' % type(file)
+    try:
+        surface_ = pygame.image.load(file)
+    except pygame.error:
+        raise SystemExit('\n[-] Error : Could not load image %s %s ' % (file, pygame.get_error()))
+    w, h = surface_.get_size()
+    return numpy.frombuffer(pygame.image.tostring(surface_, 'RGBA'), dtype=numpy.uint8).reshape(
+        (h, w, 4)).transpose([1, 0, 2])
+
+
+def blend_texture_batch(rgba_array: numpy.ndarray, colors_: list, steps_: numpy.ndarray) -> numpy.ndarray:
+    """
+    Vectorized equivalent of blend_texture followed by add_transparency_all for
+    every (color, step) pair in a single broadcast pass.
+
+    blend_texture_batch(RGBA array, colors, steps) -> (colors x steps x width x height x RGBA) array
+
+    :param rgba_array: 3D numpy array like (width, height, RGBA), see load_rgba
+    :param colors_: list of destination colors (pygame.Color or tuples)
+    :param steps_: numpy array of blending intervals, one entry per frame
+    :return: 5D numpy array (numpy.uint8). The array is a transposed view of a (colors, steps, height,
+             width, RGBA) buffer, therefore every [color, step] frame is contiguous and can be passed
+             to pygame.image.frombuffer without copy (see halo_surfaces).
+    """
+    w, h = rgba_array.shape[:2]
+    steps_ = numpy.asarray(steps_, dtype=numpy.float32)
+    colors = numpy.array([tuple(color_)[:3] for color_ in colors_], dtype=numpy.float32)
+    source = rgba_array.transpose([1, 0, 2])
+    block = numpy.empty((len(colors), len(steps_), h, w, 4), dtype=numpy.uint8)
+
+    # rgb + (color - rgb) * step == rgb * (1 - step) + color * step
+    # The source term does not depend on the color, the ufunc casts directly into the block.
+    faded = source[numpy.newaxis, :, :, :3] * (1 - steps_)[:, numpy.newaxis, numpy.newaxis, numpy.newaxis]
+    numpy.add(faded[numpy.newaxis], (colors[:, numpy.newaxis, :] * steps_[:, numpy.newaxis])
+              [:, :, numpy.newaxis, numpy.newaxis, :], out=block[..., :3], casting='unsafe')
+
+    # Transparency is identical for every color
+    alpha = source[numpy.newaxis, :, :, 3].astype(numpy.int16) - \
+        (255 * steps_ / 8).astype(numpy.int16)[:, numpy.newaxis, numpy.newaxis]
+    numpy.putmask(alpha, alpha < 0, 0)
+    block[..., 3] = alpha[numpy.newaxis]
+    return block.transpose([0, 1, 3, 2, 4])
+
+
+def halo_surfaces(block_: numpy.ndarray) -> list:
+    """
+    Create the halo animations from a block returned by blend_texture_batch.
+    Each frame is scaled down (frame 0 is empty), one list of pygame.Surface per color.
+    """
+    colors, steps, w, h = block_.shape[:4]
+    animations = []
+    for c in range(colors):
+        frames = []
+        for number in range(steps):
+            # block_[c, number] transposed back is a contiguous (height, width, RGBA) slice
+            surface = pygame.image.frombuffer(block_[c, number].transpose([1, 0, 2]), (w, h), 'RGBA')
+            frames.append(pygame.transform.smoothscale(surface.convert_alpha(),
+                                                       (int(w * number / 60), int(h * number / 60))))
+        animations.append(frames)
+    return animations
+
+
+def halo_cache_key(file: str, steps_: numpy.ndarray, color_) -> tuple:
+    """
+    Return the key identifying a halo animation in the halo cache.
+    The key combines the source image hash, the tint colour, the step table
+    and the display depth (convert_alpha output depends on it).
+    """
+    with open(file, 'rb') as file_:
+        digest = hashlib.md5(file_.read()).hexdigest()
+    screen_ = pygame.display.get_surface()
+    depth = screen_.get_bitsize() if screen_ is not None else 32
+    return digest, tuple(color_)[:4], tuple(numpy.round(steps_, 8).tolist()), depth
+
+
+def load_halo_cache(file: str) -> dict:
+    """ Load the halo cache from disk, return an empty cache if the file is missing or corrupted. """
+    try:
+        with open(file, 'rb') as file_:
+            cache_ = pickle.load(file_)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+        return {}
+    return cache_ if isinstance(cache_, dict) else {}
+
+
+def save_halo_cache(file: str, cache_: dict):
+    """ Serialize the halo cache to disk (frames are stored as zlib compressed RGBA buffers). """
+    try:
+        with open(file, 'wb') as file_:
+            pickle.dump(cache_, file_, protocol=-1)
+    except OSError as error:
+        print('\n[-]INFO - Could not write halo cache %s %s ' % (file, error))
+
+
+def load_halos(file: str, steps_: numpy.ndarray, colors_: list, cache_: dict) -> list:
+    """
+    Return the halo animations (one list of pygame.Surface per color) for a given image file.
+    Animations are taken from cache_ when available, the missing colors are built in a single
+    batch (see blend_texture_batch) and added to cache_ (call save_halo_cache to persist them).
+
+    :param file: path to the halo image (32 bit with per-pixel transparency)
+    :param steps_: numpy array of blending intervals, one entry per frame
+    :param colors_: list of destination colors (pygame.Color or tuples)
+    :param cache_: python dictionary returned by load_halo_cache
+    :return: python list of animations, same order as colors_
+    """
+    keys = [halo_cache_key(file, steps_, color_) for color_ in colors_]
+    missing = [i for i, key in enumerate(keys) if key not in cache_]
+    animations = [None] * len(colors_)
+
+    if missing:
+        block = blend_texture_batch(load_rgba(file), [colors_[i] for i in missing], steps_)
+        for i, surfaces in zip(missing, halo_surfaces(block)):
+            cache_[keys[i]] = [(surface.get_size(), zlib.compress(pygame.image.tostring(surface, 'RGBA'), 1))
+                               for surface in surfaces]
+            animations[i] = surfaces
+
+    for i, key in enumerate(keys):
+        if animations[i] is not None:
+            continue
+        surfaces = []
+        for size, buffer_ in cache_[key]:
+            if 0 in size:
+                # frombuffer does not accept empty surfaces (first frame of the animation)
+                surfaces.append(pygame.Surface(size, flags=pygame.SRCALPHA, depth=32).convert_alpha())
+            else:
+                surfaces.append(pygame.image.frombuffer(zlib.decompress(buffer_), size, 'RGBA').convert_alpha())
+        animations[i] = surfaces
+    return animations
+
+
 class Halo(pygame.sprite.Sprite):
     """
     Create a Halo sprite
     """
 
     images = []
+    steps = []
     containers = None
     inventory = []
+    tints = {}
 
     def __init__(self,
                  rect_,
                  timing_,
                  id_=0,
-                 layer_: int = 0
+                 layer_: int = 0,
+                 color_=None
                  ):
         """
         :param rect_  : pygame.Rect representing the coordinates and sprite center
         :param timing_: integer representing the sprite refreshing time in ms
         :param layer_ : Layer to use, default 0
+        :param color_ : Halo color (pygame.Color or tuple), None for the untinted white halo
         """
-        pygame.sprite.Sprite.__init__(self, self.containers)
+        pygame.sprite.Sprite.__init__(self)
+        self.pool = None  # HaloPool owning the sprite
+        self.start(rect_, timing_, id_, layer_, color_)
+
+    def start(self, rect_, timing_, id_=0, layer_: int = 0, color_=None):
+        """ (Re)start the animation, the sprite is added to Halo.containers. """
+        self.add(self.containers)
 
         if isinstance(GL.All, pygame.sprite.LayeredUpdates):
             GL.All.change_layer(self, layer_)
 
-        self.images_copy = self.images.copy()
+        self.images_copy = self.images  # frames are shared and never modified
         self.image = self.images_copy[0]
         self.center = rect_.center
         self.rect = self.image.get_rect(center=self.center)
@@ -431,28 +373,113 @@ class Halo(pygame.sprite.Sprite):
         self.index = 0  # list index
         self.timing = timing_
         self.id_ = id_
+        self.set_color(color_)
+
+    def set_color(self, color_):
+        """ Change the halo color, None for the untinted white halo. """
+        self.colors = self.get_tints(color_) if color_ is not None else None
+        self._tint = self.colors[self.index] if self.colors else None
+
+    @classmethod
+    def get_tints(cls, color_) -> list:
+        """
+        Return the tint of every frame for a given color.
+        The white halo is blended toward color_ over the animation (same progression as
+        blend_texture with Halo.steps), tints are computed once per color.
+        """
+        key = tuple(color_)[:3]
+        tints = cls.tints.get(key)
+        if tints is None:
+            tints = [tuple(int(255 + (c - 255) * step) for c in key) + (255,) for step in cls.steps]
+            cls.tints[key] = tints
+        return tints
 
     def update(self):
 
-        if self.dt > self.timing:
+        # frames advance with the fixed timestep clock, at most one frame per step
+        self.dt += GL.CLOCK.elapsed_ns
+        period = max(self.timing * 1000000, GL.CLOCK.step_ns)
+
+        if self.dt >= period:
+
+            # frames are skipped when the render rate is below the step rate
+            frames = self.dt // period
+            self.dt -= frames * period
+            self.index = min(self.index + frames - 1, len(self.images_copy) - 1)
 
             self.image = self.images_copy[self.index]
             self.rect = self.image.get_rect(center=self.center)
+            if self.colors:
+                self._tint = self.colors[self.index]
 
             if self.index < len(self.images_copy) - 1:
                 self.index += 1
             else:
                 if self.id_ in self.inventory:
                     self.inventory.remove(self.id_)
-                self.kill()
+                if self.pool is not None:
+                    self.pool.release(self)
+                else:
+                    self.kill()
+
+
+class HaloPool:
+    """
+    Fixed capacity pool of Halo sprites.
+    Sprites are recycled when their animation ends and only one halo can be active
+    for a given position, an input held down keeps its running halo instead of
+    stacking new sprites every refresh.
+    """
+
+    def __init__(self, capacity_: int = 32):
+        """
+        :param capacity_: maximum number of Halo sprites alive at the same time
+        """
+        assert isinstance(capacity_, int) and capacity_ > 0, 'Argument capacity_ should be a positive integer.'
+        self.capacity = capacity_
+        self.free = []  # Halo sprites ready to be reused
+        self.active = {}  # Halo sprites being displayed, indexed by position
+        self.count = 0  # number of Halo sprites created
+
+    def get(self, rect_, timing_, id_=0, layer_: int = 0, color_=None):
+        """
+        Display a halo at rect_ center.
+        Return the Halo sprite or None when the pool is exhausted.
+        """
+        center = tuple(rect_.center)
+        halo = self.active.get(center)
+        if halo is not None:
+            # same input still active, keep the running animation
+            halo.set_color(color_)
+            return halo
+
+        if self.free:
+            halo = self.free.pop()
+            halo.start(rect_, timing_, id_, layer_, color_)
+        elif self.count < self.capacity:
+            halo = Halo(rect_, timing_, id_, layer_, color_)
+            halo.pool = self
+            self.count += 1
+        else:
+            return None
+
+        self.active[center] = halo
+        return halo
 
-            self.dt = 0
+    def release(self, halo_: Halo):
+        """ Remove a halo from the display and return it to the pool. """
+        halo_.kill()
+        if self.active.get(tuple(halo_.center)) is halo_:
+            del self.active[tuple(halo_.center)]
+        self.free.append(halo_)
 
-        self.dt += GL.TIME_PASSED_SECONDS
+    def __len__(self):
+        return len(self.active)
 
 
 class JoystickEmulator(pygame.sprite.Sprite, GL):
     images = None
+    BASES = {}  # scheme image -> panel background, shared by the panels of the same model
 
     def __init__(self,  joystickid_, menu_position_, offset_, layer_=0, timing_=120):
 
@@ -467,19 +494,21 @@ class JoystickEmulator(pygame.sprite.Sprite, GL):
                           (list, pygame.Surface)), 'Images should be defined as a list of pygame.Surfaces'
         assert isinstance(self.SOUND_SERVER, SoundControl), 'Sound Server is not initialised.'
         assert isinstance(MOUSE_CLICK_SOUND, pygame.mixer.Sound), 'MOUSE_CLICK_SOUND should be a pygame.mixer.Sound.'
-        self.layer = layer_
+        # pygame 2 does not allow setting Sprite.layer once the sprite belongs to a group
+        self._layer = layer_
 
         if isinstance(self.All, pygame.sprite.LayeredUpdates):
             self.All.change_layer(self, layer_)
 
         if self.images:
-            self.images_copy = self.images.copy()
+            # the scheme image is shared by the panels of the same controller model (see AssetManager)
+            self.images_copy = self.images.copy() if isinstance(self.images, list) else self.images
             self.image = self.images_copy[0] if isinstance(self.images_copy, list) else self.images_copy
             self.rect = self.image.get_rect(center=(menu_position_[0], menu_position_[1]))
 
         self.force_kill = False  # Variable used for killing the active window
-        self.dt = 0  # Time constant
-        self.timing = timing_  # Refreshing time used by the method update
+        self.dt = 0  # Fixed step time since the last refresh (ns)
+        self.timing = timing_  # Refreshing time used by the method update (ms)
         self.menu_position = menu_position_  # Window position into the screen, represent the topleft corner
         self.index = 0  # Iteration variable
 
@@ -487,19 +516,23 @@ class JoystickEmulator(pygame.sprite.Sprite, GL):
 
         self.canw, self.canh = (700, 500)
         self.canw2, self.canh2 = (700 >> 1, 500 >> 1)
-        self.canvas = pygame.Surface((700, 500), depth=32,
-                                     flags=(pygame.SWSURFACE | pygame.SRCALPHA))
-
         assert isinstance(FRAME_BORDER_LEFT, pygame.Surface), \
             'FRAME_BORDER_LEFT is not defined or is not a pygame.Surface.'
 
-        bw, bh = FRAME_BORDER_LEFT.get_size()
-        self.transparent = pygame.Surface((self.canw - bw, self.canh),
-                                          depth=32, flags=(pygame.SWSURFACE | pygame.SRCALPHA))
-        self.transparent.fill((50, 80, 138, 220))
-        self.canvas.blit(self.transparent, (bw, 0))
-        self.canvas.blit(self.image, (self.canw2 - (width >> 1) + 25, self.canh2 - 80))
-        self.canvas.blit(FRAME_BORDER_LEFT, (0, 0))
+        # Panel background (frame, scheme) built once per scheme image,
+        # the panels of the same controller model start from a copy.
+        base = self.BASES.get(self.image)
+        if base is None:
+            base = pygame.Surface((700, 500), depth=32, flags=(pygame.SWSURFACE | pygame.SRCALPHA))
+            bw, bh = FRAME_BORDER_LEFT.get_size()
+            transparent = pygame.Surface((self.canw - bw, self.canh),
+                                         depth=32, flags=(pygame.SWSURFACE | pygame.SRCALPHA))
+            transparent.fill((50, 80, 138, 220))
+            base.blit(transparent, (bw, 0))
+            base.blit(self.image, (self.canw2 - (width >> 1) + 25, self.canh2 - 80))
+            base.blit(FRAME_BORDER_LEFT, (0, 0))
+            self.BASES[self.image] = base
+        self.canvas = base.copy()
 
         self.image = self.canvas
         self.rect = self.image.get_rect(center=(menu_position_[0], menu_position_[1]))
@@ -523,11 +556,84 @@ class JoystickEmulator(pygame.sprite.Sprite, GL):
         self.avtive = True
         self.offset = offset_
 
-    def highlight(self, coordinates_, id_):
+        # The device is opened once, inputs are then read from the input server
+        # (fed by joystick events), layout() does not call the device.
+        assert isinstance(self.INPUT_SERVER, InputControl), 'Input Server is not initialised.'
+        try:
+            if isinstance(self.BACKEND, DeviceBackend):
+                self.joystick = self.BACKEND.get_device(self.joystickid)
+            else:
+                self.joystick = pygame.joystick.Joystick(self.joystickid)
+        except pygame.error as error:
+            print('\n[-]ERROR - %s ' % error)
+            raise SystemExit
+        self.state = self.INPUT_SERVER.add(self.joystick)
+
+        self.sticks = []  # (X axis, Y axis) of every stick of the layout
+        self.stick_points = []  # stick positions on the panel
+        self.trails = []  # StickTrail sprites of the sticks
+        self.stick_view = None  # view of the trails (see GL.STICK_VIEW)
+        if not isinstance(self.LAYOUTS, LayoutIndex):
+            GL.LAYOUTS = LayoutDatabase(LAYOUTS_PATH)
+        self.set_controller()
+
+        # Incremental redraw, every label drawn onto the panel is recorded as a cell
+        # (key -> (state, rect)) and repainted only when its state changes.
+        self.image = self.image_copy.copy()
+        self.cells = {}
+        self.drawn = set()  # cells drawn during the current refresh
+        self.switch_state = None  # red switch state (0 normal, 1 hover, 2 pressed)
+        self.dirty_rects = []  # panel areas modified since the last refresh (panel coordinates)
+
+    def set_controller(self):
+        """
+        Look the controller layout up by GUID then by name (see LayoutIndex.find),
+        coordinates are offset once for this panel. Called again when layouts are reloaded.
+        """
+        self.layouts_version = self.LAYOUTS.version
+        self.controller = self.LAYOUTS.find(self.state.guid, self.state.name)
+        # the trails are rebuilt on the next update (stick positions may have changed)
+        self.show_trails(None)
+        if self.controller is None:
+            print('\n[-]INFO - No layout associated to joystick device %s ' % self.state.name)
+            return
+        offset = numpy.array(self.offset, dtype=numpy.int32)
+        self.button_points = (self.controller.button_xy + offset).tolist()
+        self.axis_points = (self.controller.axis_xy + offset).tolist()
+        self.hat_points = (self.controller.hat_xy + offset).tolist()
+        self.button_tints = [HALO_COLORS[c] for c in self.controller.button_colors.tolist()]
+        self.axis_tints = [HALO_COLORS[c] for c in self.controller.axis_colors.tolist()]
+        self.axis_types = self.controller.axis_types.tolist()
+        # consecutive stick axes are the X and Y axes of a stick, drawn at the X axis position
+        axes = [ax for ax, type_ in enumerate(self.axis_types[:len(self.state.axes)]) if type_ & AXIS_STICK]
+        self.sticks = [tuple(axes[i:i + 2]) for i in range(0, len(axes) - 1, 2)]
+        self.stick_points = [(self.axis_points[ax][0][0] - self.menu_position[0],
+                              self.axis_points[ax][0][1] - self.menu_position[1]) for ax, _ in self.sticks]
+        if isinstance(self.STICKS, StickAnalyzer):
+            self.STICKS.register(self.state.instance_id, self.sticks)
+
+    def show_trails(self, view_):
+        """ Replace the stick trails of the panel, view_ 'trail', 'heatmap' or None (see StickTrail). """
+        for trail in self.trails:
+            trail.kill()
+        self.trails = [] if view_ is None or self.controller is None else \
+            [StickTrail(self.state.instance_id, axes, self.axis_points[axes[0]][0], self.CLOCK,
+                        mode_=view_, layer_=self._layer) for axes in self.sticks]
+        self.stick_view = view_
+
+    def kill(self):
+        """ Remove the panel and its stick trails from all the groups. """
+        self.show_trails(None)
+        pygame.sprite.Sprite.kill(self)
+
+    def highlight(self, coordinates_, id_, color_=HALO_RED):
         # create a colorful halo where the button is pressed
         rect = pygame.Rect(0, 0, 10, 10)
         rect.center = coordinates_
-        Halo(rect_=rect, timing_=1, layer_=self.layer, id_=id_)
+        if isinstance(self.HALO_POOL, HaloPool):
+            self.HALO_POOL.get(rect_=rect, timing_=1, layer_=self._layer, id_=id_, color_=color_)
+        else:
+            Halo(rect_=rect, timing_=1, layer_=self._layer, id_=id_, color_=color_)
 
     def tick(self):
         # play the sound MOUSE_CLICK_SOUND
@@ -535,210 +641,232 @@ class JoystickEmulator(pygame.sprite.Sprite, GL):
                                    volume_=0.1, fade_out_ms=0, panning_=True,
                                    name_='MOUSE CLICK', x_=self.MOUSE_POS[0])
 
+    def restore(self, rect_: pygame.Rect) -> pygame.Rect:
+        """ Restore the panel background (image_copy) under rect_ and mark the area dirty. """
+        # plain blit would alpha blend the background over the label, copy the pixels instead
+        self.image.fill((0, 0, 0, 0), rect_)
+        self.image.blit(self.image_copy, rect_, rect_, special_flags=pygame.BLEND_RGBA_ADD)
+        self.dirty_rects.append(rect_)
+        return rect_
+
+    def draw_cell(self, key_, position_, text_, color_, value_=None, size_=8, width_=None):
+        """
+        Draw a label onto the panel (see TextCache.blit) only if the label, value or color
+        changed since the last refresh. The previous label is erased and the modified
+        area is added to self.dirty_rects.
+        width_ clips the cell (e.g cells of two columns on the same row), the text beyond
+        is not drawn and the cell never erases its neighbours.
+        """
+        self.drawn.add(key_)
+        state = (position_, text_, value_, tuple(color_))
+        cell = self.cells.get(key_)
+        if cell is not None:
+            if cell[0] == state:
+                return
+            self.restore(cell[1])
+        if width_ is not None:
+            self.image.set_clip(pygame.Rect(position_[0], 0, width_, self.canh))
+        # blit returns the area actually drawn, within the clip area
+        rect = self.TEXT_CACHE.blit(self.image, text_, position_, color_, value_=value_, size_=size_)
+        if width_ is not None:
+            self.image.set_clip(None)
+        self.dirty_rects.append(rect)
+        self.cells[key_] = (state, rect)
+
+    def erase_cells(self):
+        """ Erase the cells that were not drawn during the current refresh. """
+        for key in [key for key in self.cells if key not in self.drawn]:
+            self.restore(self.cells.pop(key)[1])
+        self.drawn.clear()
+
+    def draw_switch(self, state_: int):
+        """ Draw the red switch (0 normal, 1 hover, 2 pressed) when its state changes. """
+        if state_ == self.switch_state:
+            return
+        self.switch_state = state_
+        self.restore(RED_SWITCH1.get_rect(topleft=(615, 0)))
+        for image in (RED_SWITCH1, RED_SWITCH2, RED_SWITCH3)[:state_ + 1]:
+            self.image.blit(image, (615, 0))
+
     def connection(self):
 
         # Check the joystick status connected | disconnected
         for key, value in OPTIONS_OPTIONS[0].items():
 
-            if pygame.joystick.get_count() > 0:
-                value['TEXT'] = 'Joystick %s Connected.' % pygame.joystick.Joystick(self.joystickid).get_name()
+            if self.state.connected:
+                value['TEXT'] = 'Joystick %s Connected.' % self.state.name
                 value['FOREGROUND'] = (128, 220, 98, 255)
-                rect = self.MAIN_MENU_FONT.get_rect(value['TEXT'],
-                                                    style=freetype.STYLE_NORMAL, size=10)
-                self.image.blit(self.MAIN_MENU_FONT.render(value['TEXT'],
-                                                           fgcolor=(128, 220, 98, 255),
-                                                           style=freetype.STYLE_NORMAL,
-                                                           size=10)[0], ((self.canw - rect.w + 25) // 2, 10))
+                text = self.TEXT_CACHE.get(value['TEXT'], (128, 220, 98, 255), size_=10)
+                self.draw_cell('status', ((self.canw - text.get_width() + 25) // 2, 10),
+                               value['TEXT'], (128, 220, 98, 255), size_=10)
             else:
                 value['TEXT'] = 'Joystick Disconnected'
                 value['FOREGROUND'] = (218, 25, 18, 255)
-                rect = self.MAIN_MENU_FONT.get_rect(value['TEXT'],
-                                                    style=freetype.STYLE_NORMAL, size=10)
-                self.image.blit(self.MAIN_MENU_FONT.render(value['TEXT'],
-                                                           fgcolor=(218, 25, 18, 255),
-                                                           style=freetype.STYLE_NORMAL,
-                                                           size=10)[0], ((self.canw - rect.w + 25) // 2, 10))
+                text = self.TEXT_CACHE.get(value['TEXT'], (218, 25, 18, 255), size_=10)
+                self.draw_cell('status', ((self.canw - text.get_width() + 25) // 2, 10),
+                               value['TEXT'], (218, 25, 18, 255), size_=10)
+
+    def analysis(self):
+        """ Polling rate overlay, statistics of the device over the analyzer window (see PollingAnalyzer). """
+        white = (255, 255, 255, 255)
+        # left column of the bottom rows, the stick figures use the right column (see stick_analysis)
+        x, y, ly, w = 80, 455, 15, 292
+        entry = self.ANALYZER.report().get(self.state.instance_id)
+        if entry is None:
+            self.draw_cell(('analysis', 0), (x, y), 'REPORT RATE HZ       :', white, value_='n/a', width_=w)
+            return
+        jitter = entry['jitter_ms']
+        self.draw_cell(('analysis', 0), (x, y), 'REPORT RATE HZ       :', white,
+                       value_='%.1f' % entry['rate_hz'], width_=w)
+        self.draw_cell(('analysis', 1), (x, y + ly), 'JITTER P50/P99 MS    :', white,
+                       value_='%.2f/%.2f' % (jitter[0], jitter[-1]), width_=w)
+        self.draw_cell(('analysis', 2), (x, y + 2 * ly), 'DROPPED/DUPLICATED   :', white,
+                       value_='%d/%d' % (entry['dropped'], entry['duplicated']), width_=w)
+
+    def stick_analysis(self):
+        """ Stick overlay, circularity, centre drift and dead zone of every stick (see StickAnalyzer). """
+        white = (255, 255, 255, 255)
+        # right column of the bottom rows, clipped to the panel border
+        x, y, ly, w = 375, 455, 15, 315
+        entries = self.STICKS.report().get(self.state.instance_id)
+        if not entries:
+            return
+        for s, entry in enumerate(entries[:len(self.stick_points)]):
+            self.draw_stick(('stick', s), self.stick_points[s], entry)
+        self.draw_cell(('stick', 'error'), (x, y), 'STICK ERR % :', white,
+                       value_=' '.join('%.1f' % entry['circularity_error'] for entry in entries), width_=w)
+        self.draw_cell(('stick', 'drift'), (x, y + ly), 'DRIFT/NOISE :', white,
+                       value_=' '.join('%.3f/%.3f' % (entry['drift'], entry['noise']) for entry in entries), width_=w)
+        self.draw_cell(('stick', 'zone'), (x, y + 2 * ly), 'DEADZONE/SAT:', white,
+                       value_=' '.join('%.3f/%.2f' % (entry['dead_zone'], entry['saturation']) for entry in entries),
+                       width_=w)
+
+    def draw_stick(self, key_, center_, entry_, radius_: int = 30):
+        """
+        Draw the analysis of a stick around its position on the scheme (recorded as a cell, see draw_cell):
+        unit circle (white), dead zone (blue), outer envelope per angle bucket (green, red when
+        the error is above 5%) and centre drift (yellow, 10 x magnified, pinned to the cell border).
+        """
+        self.drawn.add(key_)
+        envelope = numpy.nan_to_num(entry_['envelope'], nan=0.0)
+        state = (center_, numpy.round(envelope, 2).tobytes(), round(entry_['dead_zone'], 3), round(entry_['drift'], 3))
+        cell = self.cells.get(key_)
+        if cell is not None:
+            if cell[0] == state:
+                return
+            self.restore(cell[1])
+        cx, cy = center_
+        rect = pygame.Rect(0, 0, radius_ * 3, radius_ * 3)
+        rect.center = center_
+        rect = rect.clip(self.image.get_rect())
+        pygame.draw.circle(self.image, (255, 255, 255, 255), center_, radius_, 1)
+        if not numpy.isnan(entry_['dead_zone']):
+            pygame.draw.circle(self.image, (25, 120, 255, 255), center_, max(int(entry_['dead_zone'] * radius_), 1), 1)
+        # outer envelope through the bucket centres, clipped to the drawing area
+        buckets = len(envelope)
+        angle = (numpy.arange(buckets) + 0.5) * (2 * numpy.pi / buckets) - numpy.pi
+        length = numpy.minimum(envelope, 1.5) * radius_
+        points = numpy.column_stack((cx + length * numpy.cos(angle), cy + length * numpy.sin(angle))).tolist()
+        for b in numpy.flatnonzero(envelope > 0).tolist():
+            following = (b + 1) % buckets
+            color = (255, 40, 40, 255) if abs(entry_['error'][b]) > 0.05 else (60, 230, 60, 255)
+            pygame.draw.line(self.image, color, points[b], points[following if envelope[following] > 0 else b], 2)
+        if not numpy.isnan(entry_['drift']):
+            drift = entry_['centre'] * (radius_ * 10)
+            # large drifts are pinned to the border of the cell
+            pygame.draw.circle(self.image, (255, 220, 0, 255),
+                               (int(numpy.clip(cx + drift[0], rect.left + 2, rect.right - 3)),
+                                int(numpy.clip(cy + drift[1], rect.top + 2, rect.bottom - 3))), 2)
+        self.dirty_rects.append(rect)
+        self.cells[key_] = (state, rect)
 
     def layout(self):
-        style = freetype.STYLE_NORMAL
         size_ = 8
         x = 80
         y = 50
         red = (255, 0, 0, 255)
         white = (255, 255, 255, 255)
-        color_ = white
         lx = 160
         ly = 20
         rows = 7
-        try:
-            joystick_bind = pygame.joystick.Joystick(self.joystickid)
-        except pygame.error as error:
-            print('\n[-]ERROR - %s ' % error)
-            raise SystemExit
+        state = self.state
+        hits = state.pop_hits()
+        controller = self.controller
 
-        if not joystick_bind.get_init():
-            joystick_bind.init()
+        if controller is None:
+            return
 
-        joystick_name = joystick_bind.get_name()
+        button_number = len(state.buttons)
+        if len(controller.button_labels) >= button_number:
+
+            points = self.button_points
+            tints = self.button_tints
+            for b in range(button_number):
+                if state.buttons[b] or b in hits:
+                    self.highlight(points[b], id_=0, color_=tints[b])
+                    input_ = controller.button_on[b]
+                    color_ = red
+                    self.tick()
+                else:
+                    input_ = controller.button_off[b]
+                    color_ = white
 
-        if isinstance(CONTROLLER_LAYOUT, dict):
-            layouts = CONTROLLER_LAYOUT.keys()
-        else:
-            raise AssertionError('\n[-]ERROR - CONTROLLER_LAYOUT is not a python dictionary')
+                if b != 0 and b % rows == 0:
+                    y = 50
+                    x += lx
 
-        if joystick_name not in layouts:
-            print('\n[-]INFO - No layout associated to joystick device %s ' % joystick_name)
-        else:
+                self.draw_cell(('button', b), (x, y), input_, color_, size_=size_)
+                y += ly
 
-            layout = CONTROLLER_LAYOUT[joystick_name]
-            buttons = layout['buttons']
-            axes = layout['axis']
-            hats = layout['hats']
-            i = 0
-
-            button_number = joystick_bind.get_numbuttons()
+        x += lx
+        y = 50
+        axes_number = len(state.axes)
+        if len(controller.axis_labels) >= axes_number:
+
+            points = self.axis_points
+            tints = self.axis_tints
+            types = self.axis_types
+            for ax in range(axes_number):
+                value_ = None  # numeric value, composed from the glyph atlas
+
+                if ax != 0 and ax % rows == 0:
+                    y = 50
+                    x += lx
+
+                pressed = state.axes[ax]
+                type_ = types[ax]
+                if abs(pressed) > 0.1 and not (type_ & AXIS_TRIGGER and abs(pressed) >= 1):
+                    # split axis, first position for positive values
+                    point = points[ax][1 if type_ & AXIS_SPLIT and pressed <= 0 else 0]
+                    self.highlight(point, id_=0, color_=tints[ax])
+                    input_, value_ = controller.axis_labels[ax], str(round(pressed, 3))
+                    color_ = red
+                else:
+                    input_ = controller.axis_rest[ax]
+                    color_ = white
 
-            if len(buttons) >= button_number:
+                self.draw_cell(('axis', ax), (x, y), input_, color_, value_=value_, size_=size_)
+                y += ly
 
-                for b in range(0, button_number):
+        x += lx
+        y = 50
+        hats_number = len(state.hats)
+        if len(controller.hat_labels) >= hats_number:
+
+            points = self.hat_points
+            for h in range(hats_number):
+                hat = state.hats[h]
+                if any(hat):
+                    color_ = red
+                    # D-pad positions (right, left, up, down), vertical wins on diagonals
+                    point = points[2 if hat[1] == 1 else 3] if hat[1] else points[0 if hat[0] == 1 else 1]
+                    self.highlight(point, id_=0, color_=HALO_BLUE)
+                    self.tick()
+                else:
                     color_ = white
-                    pressed = joystick_bind.get_button(b)
-                    if b == 0:
-                        Halo.images = HALO_SPRITE_PURPLE
-                    elif b == 1:
-                        Halo.images = HALO_SPRITE_BLUE
-                    elif b in (2, 6, 7):
-                        Halo.images = HALO_SPRITE_RED
-                    elif b == 3:
-                        Halo.images = HALO_SPRITE_GREEN
-
-                    else:
-                        Halo.images = HALO_SPRITE_GREEN
-
-                    if pressed:
-                        xx, yy = list(*buttons[b].values())
-
-                        self.highlight((xx + self.offset[0], yy + self.offset[1]), id_=0)
-                        input_ = str(list(buttons[i].keys())[0]) + 'pressed'
-                        color_ = red
-                        self.tick()  # if b not in (6, 7) else None
-                    else:
-                        input_ = str(list(buttons[i].keys())[0]) + 'n/a'
-
-                    if i != 0 and i % rows == 0:
-                        y = 50
-                        x += lx
-
-                    self.image.blit(self.MAIN_MENU_FONT.render(input_,
-                                                               fgcolor=color_,
-                                                               style=style,
-                                                               size=size_)[0], (x, y))
-                    i += 1
-                    y += ly
-
-            x += lx
-            y = 50
-            axes_number = joystick_bind.get_numaxes()
-            i = 0
-            if len(axes) >= axes_number:
-
-                for ax in range(0, axes_number):
-                    input_ = str(axes[i])
-
-                    if i != 0 and i % rows == 0:
-                        y = 50
-                        x += lx
-
-                    pressed = joystick_bind.get_axis(ax)
-                    if abs(pressed) > 0.1:
-
-                        if joystick_name in ('Wireless Controller',
-                                             'Gioteck VX2 2.4G Wireless Controller',
-                                             'MY-POWER CO.,LTD. 2In1 USB Joystick',
-                                             'Generic'):
-
-                            if ax in (4, 5):
-
-                                if abs(pressed) < 1:
-                                    xx, yy = list(list(axes[ax].values()))[0]
-                                    Halo.images = HALO_SPRITE_PURPLE
-                                    self.highlight((xx + self.offset[0], yy + self.offset[1]), id_=0)
-                                    color_ = red
-                                    input_ = str(list(axes[ax].keys())[0]) + str(round(pressed, 3))
-                                else:
-                                    color_ = white
-                                    input_ = str(list(axes[ax].keys())[0]) + '0.0'
-
-                            else:
-
-                                xx, yy = list(list(axes[ax].values()))[0]
-                                Halo.images = HALO_SPRITE_RED
-                                self.highlight((xx + self.offset[0], yy + self.offset[1]), id_=0)
-                                input_ = str(list(axes[ax].keys())[0]) + str(round(pressed, 3))
-                                color_ = red
-
-                        elif joystick_name == 'Controller (XBOX 360 For Windows)':
-                            if ax == 2:
-                                values = list(*axes[ax].values())
-                                left, right = values[0], values[1]
-                                if pressed > 0:
-                                    xx, yy = left
-                                else:
-                                    xx, yy = right
-                                Halo.images = HALO_SPRITE_RED
-                                self.highlight((xx + self.offset[0], yy + self.offset[1]), id_=0)
-                                color_ = red
-                                input_ = str(list(axes[ax].keys())[0]) + str(round(pressed, 3))
-                            else:
-                                xx, yy = list(list(axes[ax].values()))[0]
-                                Halo.images = HALO_SPRITE_PURPLE
-                                self.highlight((xx + self.offset[0], yy + self.offset[1]), id_=0)
-                                color_ = red
-                                input_ = str(list(axes[ax].keys())[0]) + str(round(pressed, 3))
-
-                        else:
-                            print('\n[-]INFO - Joystick not recognized...')
-
-                    else:
-                        input_ = str(list(axes[ax].keys())[0]) + '0.0'
-                        color_ = white
-
-                    self.image.blit(self.MAIN_MENU_FONT.render(input_, fgcolor=color_, style=style,
-                                                               size=size_)[0], (x, y))
-                    i += 1
-                    y += ly
-
-            x += lx
-            y = 50
-            hats_number = joystick_bind.get_numhats()
-            if len(hats) >= hats_number:
-                for h in range(0, hats_number):
-                    hat = joystick_bind.get_hat(h)
-                    if any(hat):
-                        color_ = red
-                    else:
-                        color_ = white
-                    input_ = 'D-PAD   ' + str(hat)  # str(list(hats[0].keys())[0]) + str(hat)
-
-                    if any(hat) != 0:
-                        xx = 0
-                        yy = 0
-                        Halo.images = HALO_SPRITE_BLUE
-                        if hat[0] == 1:
-                            xx, yy = list(*hats[0].values())
-                        if hat[0] == -1:
-                            xx, yy = list(*hats[1].values())
-                        if hat[1] == 1:
-                            xx, yy = list(*hats[2].values())
-                        if hat[1] == -1:
-                            xx, yy = list(*hats[3].values())
-
-                        self.highlight((xx + self.offset[0], yy + self.offset[1]), id_=0)
-                        self.tick()
-                    self.image.blit(self.MAIN_MENU_FONT.render(input_, fgcolor=color_, style=style,
-                                                               size=size_)[0], (x, y))
-
-                    y += ly
+                input_ = 'D-PAD   ' + str(hat)
+                self.draw_cell(('hat', h), (x, y), input_, color_, size_=size_)
+                y += ly
 
     def update(self):
 
@@ -750,43 +878,396 @@ class JoystickEmulator(pygame.sprite.Sprite, GL):
             self.kill()
             return
 
-        if self.dt > self.timing:
+        if self.STICK_VIEW != self.stick_view:
+            self.show_trails(self.STICK_VIEW)
+
+        self.dt += self.CLOCK.elapsed_ns
+        if self.dt >= self.timing * 1000000:
 
-            self.image = self.image_copy.copy()
+            # Only the cells that changed since the last refresh are repainted
+            self.dirty_rects = []
 
             self.active = True
 
             self.connection()
 
-            if pygame.joystick.get_count() > 0:
+            if self.LAYOUTS.version != self.layouts_version:
+                # layout files modified on disk
+                self.set_controller()
+
+            if self.state.connected:
                 self.layout()
+                if isinstance(self.LATENCY, LatencyProbe):
+                    self.LATENCY.rendered(self.state.instance_id)
+                if self.SHOW_ANALYSIS and isinstance(self.ANALYZER, PollingAnalyzer):
+                    self.analysis()
+                if self.SHOW_ANALYSIS and isinstance(self.STICKS, StickAnalyzer):
+                    self.stick_analysis()
 
-            self.image.blit(RED_SWITCH1, (615, 0))
+            self.erase_cells()
 
+            switch_state = 0
             # collision detection with the red switch
             if self.exit_rect.collidepoint(self.MOUSE_POS):
 
-                self.image.blit(RED_SWITCH2, (615, 0))
+                switch_state = 1
                 # user pressed left click to confirm exit
                 if pygame.mouse.get_pressed()[0]:
-                    self.image.blit(RED_SWITCH3, (615, 0))
+                    switch_state = 2
                     self.force_kill = True
 
+            self.draw_switch(switch_state)
+
             if isinstance(self.images_copy, list):
                 if self.index < len(self.images_copy) - 1:
                     self.index += 1
 
             self.rect = self.image.get_rect(topleft=self.menu_position)
             self.rect.clamp_ip(SCREENRECT)
-            self.dt = 0
+            # keep the refresh cadence, a long frame does not trigger several refreshes
+            self.dt %= self.timing * 1000000
+
+
+# Dashboard tile
+# Downscaled panel of a device for the dashboard mode (many devices at once). The scheme
+# image is drawn at the tile size and shared by the tiles of the same controller model
+# (tile background cached per scheme and size), the inputs are shown as markers over the
+# scheme: pressed buttons, deflected axes and D-pad. A tile is only redrawn when its device
+# reported new events, idle tiles cost nothing to update and draw (see draw_dirty).
+# e.g
+# tile = DashboardTile(0, 'PS4.png', pygame.Rect(0, 0, 200, 150))
 
-        self.dt += self.TIME_PASSED_SECONDS
+class DashboardTile(pygame.sprite.Sprite, GL):
+
+    BASES = {}  # (scheme image file, tile size) -> tile background
+
+    def __init__(self, joystickid_, scheme_: str, rect_: pygame.Rect, layer_: int = 0, timing_: int = 50):
+        """
+        :param joystickid_: device index
+        :param scheme_: scheme image file (see AssetManager)
+        :param rect_: tile position and size on the screen
+        :param layer_: layer of the tile
+        :param timing_: minimum time in ms between two redraws
+        """
+        assert isinstance(GL.All, LayeredUpdatesModified), 'GL.All should be a LayeredUpdatesModified class.'
+        assert isinstance(self.INPUT_SERVER, InputControl), 'Input Server is not initialised.'
+        pygame.sprite.Sprite.__init__(self, self.All)
+        self._layer = layer_
+        self.All.change_layer(self, layer_)
+
+        self.joystickid = joystickid_
+        self.scheme = scheme_
+        self.timing = timing_
+        self.dt = 0
+        self.force_kill = False  # same interface as JoystickEmulator (see DeviceManager)
+        self.dirty_rects = []  # tile areas modified since the last draw (tile coordinates)
+        try:
+            if isinstance(self.BACKEND, DeviceBackend):
+                self.joystick = self.BACKEND.get_device(self.joystickid)
+            else:
+                self.joystick = pygame.joystick.Joystick(self.joystickid)
+        except pygame.error as error:
+            print('\n[-]ERROR - %s ' % error)
+            raise SystemExit
+        self.state = self.INPUT_SERVER.add(self.joystick)
+        if not isinstance(self.LAYOUTS, LayoutIndex):
+            GL.LAYOUTS = LayoutDatabase(LAYOUTS_PATH)
+        self.resize(rect_)
+
+    def resize(self, rect_: pygame.Rect):
+        """ Move the tile, the image and the marker positions are rebuilt when the size changes. """
+        rect_ = pygame.Rect(rect_)
+        if getattr(self, 'rect', None) is not None and self.rect.size == rect_.size:
+            self.rect = rect_
+            return
+        self.rect = rect_
+        w, h = rect_.size
+        self.scale, size = self.scheme_size(w, h)
+        self.origin = ((w - size[0]) // 2, 18 + (h - 18 - size[1]) // 2)
+        key = (self.scheme, (w, h))
+        base = self.BASES.get(key)
+        if base is None:
+            base = pygame.Surface((w, h), depth=32, flags=(pygame.SWSURFACE | pygame.SRCALPHA))
+            base.fill((50, 80, 138, 220))
+            pygame.draw.rect(base, (128, 220, 98, 255), base.get_rect(), 1)
+            base.blit(self.ASSETS.get(self.scheme, size_=size), self.origin)
+            self.BASES[key] = base
+        self.base = base
+        self.image = pygame.Surface((w, h), depth=32, flags=(pygame.SWSURFACE | pygame.SRCALPHA))
+        self.set_controller()
+
+    @staticmethod
+    def scheme_size(w_: int, h_: int) -> tuple:
+        """ Scale and size of the scheme image in a tile of size (w_, h_), below the title line. """
+        scale = min((w_ - 8) / SCHEME_SIZE[0], (h_ - 22) / SCHEME_SIZE[1])
+        return scale, (max(int(SCHEME_SIZE[0] * scale), 1), max(int(SCHEME_SIZE[1] * scale), 1))
+
+    @classmethod
+    def prune(cls, size_: tuple):
+        """ Forget the tile backgrounds and scheme variants of the tile sizes other than size_. """
+        for key in [key for key in cls.BASES if key[1] != tuple(size_)]:
+            del cls.BASES[key]
+            GL.ASSETS.release(key[0], cls.scheme_size(*key[1])[1])
+
+    def set_controller(self):
+        """ Look the controller layout up and convert its coordinates into tile coordinates. """
+        self.layouts_version = self.LAYOUTS.version
+        self.controller = self.LAYOUTS.find(self.state.guid, self.state.name)
+        self.seen = None  # force a redraw
+        if self.controller is None:
+            return
+        origin = numpy.array(SCHEME_ORIGIN, dtype=numpy.float32)
+        offset = numpy.array(self.origin, dtype=numpy.float32)
+
+        def convert(xy_):
+            return ((xy_ - origin) * self.scale + offset).astype(numpy.int32).tolist()
+
+        self.button_points = convert(self.controller.button_xy)
+        self.axis_points = convert(self.controller.axis_xy)
+        self.hat_points = convert(self.controller.hat_xy)
+        self.button_tints = [HALO_COLORS[c] for c in self.controller.button_colors.tolist()]
+        self.axis_tints = [HALO_COLORS[c] for c in self.controller.axis_colors.tolist()]
+        self.axis_types = self.controller.axis_types.tolist()
+
+    def markers(self):
+        """ Draw the active inputs over the scheme, return True when a button press was drawn. """
+        state = self.state
+        controller = self.controller
+        hits = state.pop_hits()
+        image = self.image
+        radius = max(int(12 * self.scale), 2)
+        circle = pygame.draw.circle
+
+        if len(controller.button_labels) >= len(state.buttons):
+            points = self.button_points
+            tints = self.button_tints
+            for b, pressed in enumerate(state.buttons):
+                if pressed or b in hits:
+                    circle(image, tints[b], points[b], radius)
+
+        if len(controller.axis_labels) >= len(state.axes):
+            points = self.axis_points
+            tints = self.axis_tints
+            types = self.axis_types
+            for ax, value in enumerate(state.axes):
+                type_ = types[ax]
+                if abs(value) > 0.1 and not (type_ & AXIS_TRIGGER and abs(value) >= 1):
+                    point = points[ax][1 if type_ & AXIS_SPLIT and value <= 0 else 0]
+                    circle(image, tints[ax], point, max(int(radius * abs(value)), 1), 1)
+
+        if len(controller.hat_labels) >= len(state.hats):
+            points = self.hat_points
+            for hat in state.hats:
+                if any(hat):
+                    point = points[2 if hat[1] == 1 else 3] if hat[1] else points[0 if hat[0] == 1 else 1]
+                    circle(image, HALO_BLUE, point, radius)
+        return len(hits) > 0
+
+    def update(self):
+        self.dt += self.CLOCK.elapsed_ns
+        if self.dt < self.timing * 1000000:
+            return
+        self.dt %= self.timing * 1000000
+        if self.LAYOUTS.version != self.layouts_version:
+            self.set_controller()
+
+        state = self.state
+        seen = (state.events, state.connected)
+        if seen == self.seen:
+            # no new input, the tile is not redrawn
+            return
+        self.seen = seen
+
+        image = self.image
+        # plain blit would alpha blend the background, copy the pixels instead
+        image.fill((0, 0, 0, 0))
+        image.blit(self.base, (0, 0), special_flags=pygame.BLEND_RGBA_ADD)
+        if state.connected:
+            self.TEXT_CACHE.blit(image, state.name[:(self.rect.w - 8) // 8], (4, 4), (128, 220, 98, 255))
+            if self.controller is not None and self.markers():
+                # short presses are shown once, the tile is redrawn on the next refresh
+                self.seen = None
+        else:
+            self.TEXT_CACHE.blit(image, 'DISCONNECTED', (4, 4), (218, 25, 18, 255))
+        if isinstance(self.LATENCY, LatencyProbe):
+            self.LATENCY.rendered(state.instance_id)
+        self.dirty_rects = [image.get_rect()]
+
+
+# Hotplug aware device manager
+# A panel is created when a device is connected (JOYDEVICEADDED or the devices found at
+# start-up) and retired when the device has been removed for linger_ ms or when the panel
+# is closed (red switch). The layout, scheme image, panel background and labels of a
+# controller model are loaded once and shared by all the devices of that model, connecting
+# a known model only costs a panel and an input state.
+# In dashboard mode the devices are shown as tiles (see DashboardTile) arranged in a grid
+# filling the dashboard area, the grid is rearranged when a device is added or retired.
+# e.g
+# DEVICES = DeviceManager(SCREENRECT.center)      or  DeviceManager(SCREENRECT.center, dashboard_=SCREENRECT)
+# DEVICES.scan()                    # devices already connected
+# while True:
+#     for event in pygame.event.get():
+#         DEVICES.process(event)    # JOYDEVICEADDED
+#     DEVICES.update()              # retire the removed devices and closed panels
+
+class DeviceManager:
+
+    def __init__(self, position_: tuple, scheme_size_: tuple = SCHEME_SIZE, default_scheme_: str = 'PS3_Layout.png',
+                 timing_: int = 100, linger_: int = 2000, dashboard_: pygame.Rect = None):
+        """
+        :param position_: center of the panels (each panel is offset by its slot)
+        :param scheme_size_: size of the scheme images
+        :param default_scheme_: scheme image of the devices without layout
+        :param timing_: panel refreshing time in ms (see JoystickEmulator)
+        :param linger_: time in ms a removed device stays displayed as disconnected
+        :param dashboard_: screen area of the dashboard (tiles), None for the full size panels
+        """
+        self.position = position_
+        self.dashboard = pygame.Rect(dashboard_) if dashboard_ is not None else None
+        self.scheme_size = scheme_size_
+        self.default_scheme = default_scheme_
+        self.timing = timing_
+        self.linger = linger_ * 1e-3
+        self.panels = {}  # instance id -> JoystickEmulator
+        self.slots = {}  # instance id -> slot (panel offset and layer)
+        self.removed = {}  # instance id -> perf_counter when the removal was noticed
+        self.models = set()  # layouts whose labels are preloaded
+        self.added = 0  # number of panels created
+        self.retired = 0  # number of panels retired
+
+    def add(self, index_: int, arrange_: bool = True):
+        """
+        Create the panel of a device (device index), the panel of a device already managed is returned.
+        Return None when the device cannot be opened.
+        :param arrange_: rearrange the dashboard (see arrange)
+        """
+        try:
+            device = GL.BACKEND.get_device(index_)
+            if not device.get_init():
+                device.init()
+        except pygame.error as error:
+            print('\n[-]ERROR - %s ' % error)
+            return None
+        id_ = instance_id(device)
+        panel = self.panels.get(id_)
+        if panel is not None:
+            return panel
+
+        controller = GL.LAYOUTS.find(device.get_guid() if hasattr(device, 'get_guid') else '', device.get_name())
+        scheme = controller.scheme if controller is not None else self.default_scheme
+        slot = min(set(range(len(self.slots) + 1)) - set(self.slots.values()))
+        if self.dashboard is not None:
+            # placed by arrange
+            panel = DashboardTile(index_, scheme, pygame.Rect(self.dashboard.topleft, (64, 48)), layer_=slot,
+                                  timing_=self.timing)
+        else:
+            JoystickEmulator.containers = GL.All
+            JoystickEmulator.images = GL.ASSETS.get(scheme, size_=self.scheme_size)
+            panel = JoystickEmulator(index_, self.position, offset_=(slot * 50, slot * 50), layer_=slot,
+                                     timing_=self.timing)
+            if panel.controller is not None and panel.controller.name not in self.models:
+                # Labels and digits of the layout panel are rendered once per model
+                GL.TEXT_CACHE.preload([panel.controller], ((255, 255, 255, 255), (255, 0, 0, 255)))
+                self.models.add(panel.controller.name)
+        self.panels[id_] = panel
+        self.slots[id_] = slot
+        self.added += 1
+        if arrange_:
+            self.arrange()
+        print('\n[+]INFO - Joystick %s connected (%s panels) ' % (device.get_name(), len(self.panels)))
+        return panel
+
+    def scan(self) -> int:
+        """ Create the panels of the devices already connected, return the number of panels. """
+        for index in range(GL.BACKEND.get_count()):
+            self.add(index, arrange_=False)
+        self.arrange()
+        return len(self.panels)
+
+    def retire(self, instance_id_: int):
+        """ Remove the panel and the input state of a device. """
+        panel = self.panels.pop(instance_id_, None)
+        if panel is None:
+            return
+        del self.slots[instance_id_]
+        self.removed.pop(instance_id_, None)
+        panel.kill()
+        GL.INPUT_SERVER.remove(instance_id_)
+        if isinstance(GL.STICKS, StickAnalyzer):
+            GL.STICKS.remove(instance_id_)
+        if isinstance(GL.LATENCY, LatencyProbe):
+            GL.LATENCY.remove(instance_id_)
+        try:
+            panel.joystick.quit()
+        except pygame.error:
+            pass
+        self.retired += 1
+        self.arrange()
+
+    def arrange(self):
+        """ Dashboard mode, arrange the tiles in a grid (slot order) filling the dashboard area. """
+        if self.dashboard is None or not self.panels:
+            return
+        area = self.dashboard
+        count = len(self.panels)
+        ratio = SCHEME_SIZE[0] / (SCHEME_SIZE[1] + 22)
+
+        def scheme_width(columns_):
+            # width of the scheme drawn in a tile of a grid with columns_ columns
+            return min(area.w / columns_, area.h / -(-count // columns_) * ratio)
+
+        columns = max(range(1, count + 1), key=scheme_width)
+        rows = -(-count // columns)
+        w, h = area.w // columns, area.h // rows
+        for i, id_ in enumerate(sorted(self.panels, key=self.slots.get)):
+            self.panels[id_].resize(pygame.Rect(area.x + (i % columns) * w + 2, area.y + (i // columns) * h + 2,
+                                                w - 4, h - 4))
+        # one background per model at the current tile size
+        DashboardTile.prune((w - 4, h - 4))
+
+    def process(self, event_) -> bool:
+        """ Handle a JOYDEVICEADDED event, return True when a panel was created. """
+        if JOYDEVICEADDED is None or event_.type != JOYDEVICEADDED:
+            return False
+        count = len(self.panels)
+        self.add(event_.device_index)
+        return len(self.panels) > count
+
+    def update(self):
+        """ Retire the panels closed by the user and the devices removed for more than linger_ ms. """
+        now = time.perf_counter()
+        for id_, panel in list(self.panels.items()):
+            if not panel.alive():
+                self.retire(id_)
+            elif not panel.state.connected:
+                removed = self.removed.setdefault(id_, now)
+                if now - removed >= self.linger:
+                    self.retire(id_)
+
+    def __len__(self):
+        return len(self.panels)
 
 
 class LayeredUpdatesModified(pygame.sprite.LayeredUpdates):
 
     def __init__(self):
         pygame.sprite.LayeredUpdates.__init__(self)
+        self.scratch = {}  # tinting surfaces, one per image size
+
+    def tint(self, image_: pygame.Surface, color_) -> pygame.Surface:
+        """
+        Return image_ multiplied by color_ (RGBA).
+        The result is written into a scratch surface shared by all sprites with the same image size,
+        the surface is only valid until the next call.
+        """
+        size = image_.get_size()
+        surface_ = self.scratch.get(size)
+        if surface_ is None:
+            surface_ = pygame.Surface(size, flags=pygame.SRCALPHA, depth=32)
+            self.scratch[size] = surface_
+        surface_.fill(color_)
+        surface_.blit(image_, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
+        return surface_
 
     def draw(self, surface_):
         """draw all sprites in the right order onto the passed surface
@@ -803,10 +1284,14 @@ class LayeredUpdatesModified(pygame.sprite.LayeredUpdates):
         for spr in self.sprites():
             rec = spritedict[spr]
 
+            image = spr.image
+            if getattr(spr, '_tint', None) is not None:
+                image = self.tint(image, spr._tint)
+
             if hasattr(spr, '_blend') and spr._blend is not None:
-                newrect = surface_blit(spr.image, spr.rect, special_flags=spr._blend)
+                newrect = surface_blit(image, spr.rect, special_flags=spr._blend)
             else:
-                newrect = surface_blit(spr.image, spr.rect)
+                newrect = surface_blit(image, spr.rect)
 
             if rec is init_rect:
                 dirty_append(newrect)
@@ -819,9 +1304,114 @@ class LayeredUpdatesModified(pygame.sprite.LayeredUpdates):
             spritedict[spr] = newrect
         return dirty
 
+    @staticmethod
+    def merge_rects(rects_: list, area_: pygame.Rect, overhead_: int = 2048) -> list:
+        """
+        Merge a list of dirty rectangles.
+        Two rectangles are merged when their union costs less than updating them separately
+        (overhead_ is the cost of an extra rectangle in pixels). When the dirty area covers
+        more than half of area_, area_ is returned instead.
+
+        :param rects_: python list of pygame.Rect
+        :param area_: pygame.Rect, surface area (rectangles are clipped to it)
+        :param overhead_: cost of an extra rectangle expressed in pixels
+        :return: python list of pygame.Rect
+        """
+        rects = [rect.clip(area_) for rect in rects_ if rect.colliderect(area_)]
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(rects)):
+                a = rects[i]
+                for j in range(i + 1, len(rects)):
+                    b = rects[j]
+                    union = a.union(b)
+                    if union.w * union.h <= a.w * a.h + b.w * b.h + overhead_:
+                        rects[i] = union
+                        del rects[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+
+        if sum(rect.w * rect.h for rect in rects) > (area_.w * area_.h) >> 1:
+            return [area_.copy()]
+        return rects
+
+    def draw_dirty(self, surface_: pygame.Surface, background_: pygame.Surface) -> list:
+        """
+        Dirty rectangle presentation.
+        Only the areas that changed since the last call are restored from background_ and
+        redrawn (sprites are clipped to the dirty areas, layer order is preserved).
+        A sprite providing a dirty_rects list (e.g JoystickEmulator) is only redrawn under
+        those rectangles unless it moved, other sprites are redrawn when visible.
+
+        LayeredUpdatesModified.draw_dirty(surface, background): return Rect_list
+        (pass the list to pygame.display.update)
+        """
+        spritedict = self.spritedict
+        init_rect = self._init_rect
+        area = surface_.get_rect()
+        dirty = self.lostsprites
+        self.lostsprites = []
+        sprites = self.sprites()
+
+        for spr in sprites:
+            rec = spritedict[spr]
+            if rec is init_rect:
+                dirty.append(spr.rect)
+            elif rec != spr.rect:
+                dirty.append(rec)
+                dirty.append(spr.rect)
+            elif hasattr(spr, 'dirty_rects'):
+                x, y = spr.rect.topleft
+                dirty.extend(rect.move(x, y) for rect in spr.dirty_rects)
+            else:
+                dirty.append(spr.rect)
+            if hasattr(spr, 'dirty_rects'):
+                spr.dirty_rects = []
+
+        dirty = self.merge_rects(dirty, area)
+        clip = surface_.get_clip()
+        surface_blit = surface_.blit
+        for rect in dirty:
+            surface_.set_clip(rect)
+            surface_blit(background_, rect, rect)
+            for spr in sprites:
+                if not spr.rect.colliderect(rect):
+                    continue
+                image = spr.image
+                if getattr(spr, '_tint', None) is not None:
+                    image = self.tint(image, spr._tint)
+                if hasattr(spr, '_blend') and spr._blend is not None:
+                    surface_blit(image, spr.rect, special_flags=spr._blend)
+                else:
+                    surface_blit(image, spr.rect)
+        surface_.set_clip(clip)
+
+        for spr in sprites:
+            spritedict[spr] = spr.rect.clip(area)
+        return dirty
+
 
 if __name__ == '__main__':
 
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Game controller tester')
+    parser.add_argument('--replay', help='replay a recording file instead of reading the joysticks')
+    parser.add_argument('--name', default='Wireless Controller', help='device name used for the replay')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed (1.0 real time, 0 maximum speed)')
+    parser.add_argument('--loop', action='store_true', help='restart the replay at the end of the recording')
+    parser.add_argument('--profile', help='write the duration of every frame to a CSV file')
+    parser.add_argument('--latency', help='measure the input to display latency, report written to a JSON file')
+    parser.add_argument('--assets', help='write the load time and memory of every image to a JSON file')
+    parser.add_argument('--dashboard', action='store_true', help='show the devices as tiles in a grid')
+    parser.add_argument('--fps', type=int, default=60, help='frame rate while inputs are active (default 60)')
+    parser.add_argument('--idle-timeout', type=int, default=250,
+                        help='maximum time in ms between two frames when no input is active (default 250)')
+    ARGS = parser.parse_args()
+
     pygame.init()
     pygame.mixer.init()
 
@@ -829,42 +1419,26 @@ if __name__ == '__main__':
     MAIN_MENU_FONT = freetype.Font(ASSETS_PATH + 'ARCADE_R.TTF', size=14)
     MAIN_MENU_FONT.antialiased = True
     GL.MAIN_MENU_FONT = MAIN_MENU_FONT
+    # Labels and digits of the layout panel are rendered once
+    GL.TEXT_CACHE = TextCache(MAIN_MENU_FONT, size_=8)
+    # Only the layouts of the connected devices are loaded (compiled cache in Assets/Layouts/)
+    GL.LAYOUTS = LayoutDatabase(LAYOUTS_PATH)
 
     SCREENRECT = pygame.Rect(0, 0, 800, 600)
     screen = pygame.display.set_mode(SCREENRECT.size, pygame.HWSURFACE, 32)
-    BACKGROUND = pygame.image.load(ASSETS_PATH + 'ps3-logo2.png').convert()
-    BACKGROUND = pygame.transform.smoothscale(BACKGROUND, SCREENRECT.size)
-
-    PS3_SCHEME = pygame.image.load(ASSETS_PATH + 'PS3_Layout.png').convert_alpha()
-    PS3_SCHEME = pygame.transform.smoothscale(PS3_SCHEME, (600, 272))
-
-    XBOX_SCHEME = pygame.image.load(ASSETS_PATH + 'xbox1.png').convert_alpha()
-    XBOX_SCHEME = pygame.transform.smoothscale(XBOX_SCHEME, (600, 272))
+    # Images are loaded on first use in the display format, the controller schemes
+    # (see the scheme field of the layouts) only for the connected devices.
+    GL.ASSETS = AssetManager(ASSETS_PATH)
+    GL.ASSETS.declare('ps3-logo2.png', alpha_=False)
+    BACKGROUND = GL.ASSETS.get('ps3-logo2.png', size_=SCREENRECT.size)
 
-    DUALSHOCK4 = pygame.image.load(ASSETS_PATH + 'PS4.png')
-    DUALSHOCK4 = pygame.transform.smoothscale(DUALSHOCK4, (600, 272))
-    DUALSHOCK4.set_colorkey((255, 255, 255, 255))
+    FRAME_BORDER_LEFT = GL.ASSETS.load('dModScreens06.png')
+    FRAME_BORDER_LEFT = GL.ASSETS.get('dModScreens06.png', size_=(FRAME_BORDER_LEFT.get_width(), 500))
 
-    FRAME_BORDER_LEFT = pygame.image.load(ASSETS_PATH + 'dModScreens06.png').convert_alpha()
-    FRAME_BORDER_LEFT = pygame.transform.smoothscale(FRAME_BORDER_LEFT, (FRAME_BORDER_LEFT.get_width(), 500))
+    RED_SWITCH1 = GL.ASSETS.get('switchRed01.png')
+    RED_SWITCH2 = GL.ASSETS.get('switchRed02.png')
+    RED_SWITCH3 = GL.ASSETS.get('switchRed03.png')
 
-    RED_SWITCH1 = pygame.image.load(ASSETS_PATH + 'switchRed01.png').convert_alpha()
-    RED_SWITCH2 = pygame.image.load(ASSETS_PATH + 'switchRed02.png').convert_alpha()
-    RED_SWITCH3 = pygame.image.load(ASSETS_PATH + 'switchRed03.png').convert_alpha()
-
-    GRAY_BUTTON0 = pygame.image.load(ASSETS_PATH + 'modGrayBtn02.png').convert_alpha()
-    GRAY_BUTTON0_SELECT = pygame.image.load(ASSETS_PATH + 'modGrayBtn03.png').convert_alpha()
-
-    GREEN_SWITCH1 = pygame.image.load(ASSETS_PATH + 'switchGreen01.png').convert_alpha()
-    GREEN_SWITCH2 = pygame.image.load(ASSETS_PATH + 'switchGreen02.png').convert_alpha()
-    GREEN_SWITCH3 = pygame.image.load(ASSETS_PATH + 'switchGreen03.png').convert_alpha()
-
-    TEXTPREV = pygame.image.load(ASSETS_PATH + 'txtPrev01.png').convert_alpha()
-    TEXTNEXT = pygame.image.load(ASSETS_PATH + 'txtPrev02.png').convert_alpha()
-
-    # WHITE HALO
-    HALO_SPRITE = []
-    HALO_SPRITE_ = load_per_pixel(ASSETS_PATH + 'WhiteHalo.png')
     steps = numpy.array([0., 0.03333333, 0.06666667, 0.1, 0.13333333,
                          0.16666667, 0.2, 0.23333333, 0.26666667, 0.3,
                          0.33333333, 0.36666667, 0.4, 0.43333333, 0.46666667,
@@ -872,73 +1446,18 @@ if __name__ == '__main__':
                          0.66666667, 0.7, 0.73333333, 0.76666667, 0.8,
                          0.83333333, 0.86666667, 0.9, 0.93333333, 0.96666667])
 
-    for number in range(30):
-        surface = blend_texture(HALO_SPRITE_, steps[number], pygame.Color(128, 255, 255, 255))
-        rgb = pygame.surfarray.pixels3d(surface)
-        alpha = pygame.surfarray.array_alpha(surface)
-        surface = add_transparency_all(rgb, alpha, int(255 * steps[number] / 8))
-        size = pygame.math.Vector2(surface.get_size())
-        size *= (number / 60)
-        surface1 = pygame.transform.smoothscale(surface, (int(size.x), int(size.y)))
-        HALO_SPRITE.append(surface1)
-
-    # RED HALO
-    HALO_SPRITE_RED = []
-    HALO_SPRITE_RED_ = load_per_pixel(ASSETS_PATH + 'WhiteHalo.png')
-
-    for number in range(30):
-        surface = blend_texture(HALO_SPRITE_RED_, steps[number], pygame.Color(255, 0, 0, 255))
-        rgb = pygame.surfarray.pixels3d(surface)
-        alpha = pygame.surfarray.array_alpha(surface)
-        surface = add_transparency_all(rgb, alpha, int(255 * steps[number] / 8))
-        size = pygame.math.Vector2(surface.get_size())
-        size *= (number / 60)
-        surface1 = pygame.transform.smoothscale(surface, (int(size.x), int(size.y)))
-        HALO_SPRITE_RED.append(surface1)
-
-    # GREEN HALO
-    HALO_SPRITE_GREEN = []
-    HALO_SPRITE_GREEN_ = load_per_pixel(ASSETS_PATH + 'WhiteHalo.png')
-
-    for number in range(30):
-        surface = blend_texture(HALO_SPRITE_GREEN_, steps[number], pygame.Color(25, 255, 18, 255))
-        rgb = pygame.surfarray.pixels3d(surface)
-        alpha = pygame.surfarray.array_alpha(surface)
-        surface = add_transparency_all(rgb, alpha, int(255 * steps[number] / 8))
-        size = pygame.math.Vector2(surface.get_size())
-        size *= (number / 60)
-        surface1 = pygame.transform.smoothscale(surface, (int(size.x), int(size.y)))
-        HALO_SPRITE_GREEN.append(surface1)
-
-    # BLUE HALO
-    HALO_SPRITE_BLUE = []
-    HALO_SPRITE_BLUE_ = load_per_pixel(ASSETS_PATH + 'WhiteHalo.png')
-
-    for number in range(30):
-        # Blend red
-        surface = blend_texture(HALO_SPRITE_BLUE_, steps[number], pygame.Color(15, 25, 255, 255))
-        rgb = pygame.surfarray.pixels3d(surface)
-        alpha = pygame.surfarray.array_alpha(surface)
-        surface = add_transparency_all(rgb, alpha, int(255 * steps[number] / 8))
-        size = pygame.math.Vector2(surface.get_size())
-        size *= (number / 60)
-        surface1 = pygame.transform.smoothscale(surface, (int(size.x), int(size.y)))
-        HALO_SPRITE_BLUE.append(surface1)
-
-    # PURPLE HALO
-    HALO_SPRITE_PURPLE = []
-    HALO_SPRITE_PURPLE_ = load_per_pixel(ASSETS_PATH + 'WhiteHalo.png')
-
-    for number in range(30):
-        # Blend red
-        surface = blend_texture(HALO_SPRITE_PURPLE_, steps[number], pygame.Color(120, 15, 255, 255))
-        rgb = pygame.surfarray.pixels3d(surface)
-        alpha = pygame.surfarray.array_alpha(surface)
-        surface = add_transparency_all(rgb, alpha, int(255 * steps[number] / 8))
-        size = pygame.math.Vector2(surface.get_size())
-        size *= (number / 60)
-        surface1 = pygame.transform.smoothscale(surface, (int(size.x), int(size.y)))
-        HALO_SPRITE_PURPLE.append(surface1)
+    # Halo animations are rebuilt only when the cache file is missing or when
+    # the source image, tint colour, steps or display depth changed.
+    HALO_CACHE_ = load_halo_cache(HALO_CACHE)
+    HALO_CACHE_SIZE = len(HALO_CACHE_)
+
+    # WHITE HALO, a single sequence of faded frames.
+    # Colors are applied at blit time (see LayeredUpdatesModified.draw).
+    HALO_SPRITE = load_halos(ASSETS_PATH + 'WhiteHalo.png', steps,
+                             [pygame.Color(255, 255, 255, 255)], HALO_CACHE_)[0]
+
+    if len(HALO_CACHE_) != HALO_CACHE_SIZE:
+        save_halo_cache(HALO_CACHE, HALO_CACHE_)
 
     SoundControl.SCREENRECT = SCREENRECT
     GL.SOUND_SERVER = SoundControl(10)
@@ -946,41 +1465,130 @@ if __name__ == '__main__':
     MOUSE_CLICK_SOUND = pygame.mixer.Sound(ASSETS_PATH + 'MouseClick.ogg')
 
     GL.All = LayeredUpdatesModified()
+    GL.INPUT_SERVER = InputControl()
+    # Polling rate and jitter statistics over the last 5 seconds (F9 overlay, F10 export)
+    GL.ANALYZER = PollingAnalyzer(window_=5.0)
+    # Stick circularity, centre drift, dead zone and noise floor (F9 overlay, F10 export)
+    GL.STICKS = StickAnalyzer()
     GL.TIME_PASSED_SECONDS = 0
+    # Halo animations and panel refreshes run on a 60 Hz fixed timestep whatever the frame rate
+    GL.CLOCK = GameClock(rate_=60)
 
-    Halo.images = HALO_SPRITE_RED
+    Halo.images = HALO_SPRITE
+    Halo.steps = steps
     Halo.containers = GL.All
+    GL.HALO_POOL = HaloPool(capacity_=64)
+    # Stick trails and heatmaps drawn above the panels (F7 cycles the views)
+    GL.TRAILS = pygame.sprite.Group()
+    StickTrail.containers = GL.All, GL.TRAILS
+
+    # Input records come from the real joysticks or from a recording
+    # (run with SDL_VIDEODRIVER=dummy SDL_AUDIODRIVER=dummy for headless replays)
+    if ARGS.replay:
+        RECORDING = load_recording(ARGS.replay)
+        if len(RECORDING) == 0:
+            print('\n[-]INFO - Recording %s is empty...' % ARGS.replay)
+            raise SystemExit
+        GL.BACKEND = ReplayBackend(RECORDING, names_={device: ARGS.name for device in numpy.unique(RECORDING['device']).tolist()},
+                                   speed_=ARGS.speed, loop_=ARGS.loop)
+    else:
+        GL.BACKEND = PygameBackend(rate_=1000)
+
+    # Panels are created and retired as the devices are connected and removed
+    DEVICES = DeviceManager(SCREENRECT.center, dashboard_=SCREENRECT if ARGS.dashboard else None)
+    if not DEVICES.scan():
+        if JOYDEVICEADDED is None or isinstance(GL.BACKEND, ReplayBackend):
+            print('\n[-]INFO - Joystick not connected...')
+            raise SystemExit
+        print('\n[-]INFO - Waiting for a joystick...')
 
-    count = pygame.joystick.get_count()
-    if not count > 0:
-        print('\n[-]INFO - Joystick not connected...')
-        raise SystemExit
-
-    for id in range(count):
-        jjobject = pygame.joystick.Joystick(id)
-        jjobject.init()
-        if jjobject.get_name() == 'Controller (XBOX 360 For Windows)':
-            SCHEME = XBOX_SCHEME
-        elif jjobject.get_name() == 'Wireless Controller':
-            SCHEME = DUALSHOCK4
-        else:
-            SCHEME = PS3_SCHEME
-        JoystickEmulator.containers = GL.All
-        JoystickEmulator.images = SCHEME
-        JoystickEmulator(id, SCREENRECT.center, offset_=(id * 50, id * 50), layer_=id, timing_=100)
-
-    clock = pygame.time.Clock()
+    # Frames are paced at ARGS.fps while inputs are active or halos are displayed,
+    # the loop sleeps until the next input when idle.
+    PACER = FramePacer(GL.BACKEND, fps_=ARGS.fps, idle_timeout_=ARGS.idle_timeout)
     STOP_GAME = False
 
+    # Dirty rectangle presentation, only the screen areas that changed are
+    # restored and sent to the display (set to False for full screen flips).
+    DIRTY_RECTS = True
+    screen.blit(BACKGROUND, (0, 0))
+    pygame.display.flip()
+
+    # Joystick events are drained at 1 kHz by a background thread (or replayed), the SDL queue
+    # is pumped by the main thread (event loop and frame pacer slices, see FramePacer.pump),
+    # the panels read the latest input values once per frame.
+    GL.BACKEND.start()
+    SAMPLED_EVENTS = JOYSTICK_EVENTS + ((JOYDEVICEREMOVED,) if JOYDEVICEREMOVED is not None else ())
+    # Input recording (F11 start/stop), see InputRecorder.load_recording
+    RECORDER = None
+
+    # Frame profiler, sections of the main loop are timed every frame (F12 overlay)
+    PROFILER = FrameProfiler()
+    if ARGS.profile:
+        PROFILER.open_csv(ARGS.profile)
+    HUD = ProfilerHUD(PROFILER, GL.TEXT_CACHE, (SCREENRECT.w - 240, 10), layer_=100)
+
+    # Input to display latency per input type, see LatencyProbe
+    if ARGS.latency:
+        GL.LATENCY = LatencyProbe()
+
     FRAME = 0
     while not STOP_GAME:
 
-        for event in pygame.event.get():
+        PROFILER.begin_frame()
+        GL.CLOCK.tick()
+        GL.TIME_PASSED_SECONDS = GL.CLOCK.delta_ms
+        RECORDS = GL.BACKEND.poll()
+        GL.INPUT_SERVER.process_records(RECORDS)
+        if GL.LATENCY is not None:
+            GL.LATENCY.tag(RECORDS)
+        GL.ANALYZER.feed(RECORDS)
+        GL.STICKS.feed(RECORDS)
+        for trail in GL.TRAILS:
+            trail.feed(RECORDS)
+        if RECORDER is not None:
+            RECORDER.write(RECORDS)
+        if GL.BACKEND.finished:
+            # end of the replay
+            STOP_GAME = True
+        # layout files edited while the tester is running (checked once per second)
+        GL.LAYOUTS.reload()
+
+        EVENTS = pygame.event.get(exclude=SAMPLED_EVENTS, pump=not GL.BACKEND.pump)
+        PACER.activity(len(RECORDS) > 0 or len(EVENTS) > 0)
+        for event in EVENTS:
             keys = pygame.key.get_pressed()
 
+            if DEVICES.process(event):
+                continue
+
             if keys[pygame.K_F8]:
                 pygame.image.save(screen, 'screenshot' + str(FRAME) + '.png')
 
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F7:
+                views = (None,) + STICK_VIEWS
+                GL.STICK_VIEW = views[(views.index(GL.STICK_VIEW) + 1) % len(views)]
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F9:
+                GL.SHOW_ANALYSIS = not GL.SHOW_ANALYSIS
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F10:
+                GL.ANALYZER.export('polling_report' + str(FRAME) + '.json')
+                GL.STICKS.export('stick_report' + str(FRAME) + '.json')
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F11:
+                if RECORDER is None:
+                    RECORDER = InputRecorder('recording' + str(FRAME) + '.rec')
+                else:
+                    RECORDER.close()
+                    print('\n[+]INFO - %s records saved in %s ' % (RECORDER.count, RECORDER.file))
+                    RECORDER = None
+
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F12:
+                if HUD.alive():
+                    HUD.kill()
+                else:
+                    GL.All.add(HUD)
+
             if event.type == pygame.QUIT:
                 print('Quitting')
                 STOP_GAME = True
@@ -989,13 +1597,43 @@ if __name__ == '__main__':
                 GL.MOUSE_POS = pygame.math.Vector2(event.pos)
                 # print(GL.MOUSE_POS)
 
-        screen.blit(BACKGROUND, (0, 0))
-        GL.All.update()
-        GL.All.draw(screen)
-        GL.TIME_PASSED_SECONDS = clock.tick(60)
+        DEVICES.update()
+        PROFILER.mark('events')
+
+        if DIRTY_RECTS:
+            GL.All.update()
+            PROFILER.mark('update')
+            rects = GL.All.draw_dirty(screen, BACKGROUND)
+            PROFILER.mark('draw')
 
-        pygame.display.flip()
+            pygame.display.update(rects)
+        else:
+            screen.blit(BACKGROUND, (0, 0))
+            GL.All.update()
+            PROFILER.mark('update')
+            GL.All.draw(screen)
+            PROFILER.mark('draw')
+
+            pygame.display.flip()
+        if GL.LATENCY is not None:
+            GL.LATENCY.presented()
+        PROFILER.mark('display')
         FRAME += 1
         GL.SOUND_SERVER.update()
-
+        PROFILER.mark('sound')
+        # the frame is presented before waiting for the next one
+        PACER.tick(animating_=len(GL.HALO_POOL) > 0 or any(trail.animating for trail in GL.TRAILS))
+        PROFILER.mark('wait')
+        PROFILER.end_frame(sprites_=len(GL.All), halos_=len(GL.HALO_POOL))
+
+    GL.BACKEND.stop()
+    if RECORDER is not None:
+        RECORDER.close()
+    PROFILER.close()
+    if GL.LATENCY is not None:
+        for name, entry in GL.LATENCY.export(ARGS.latency).items():
+            print('\n[+]INFO - latency %s : %s ' % (name, entry))
+    if ARGS.assets:
+        for name, entry in GL.ASSETS.export(ARGS.assets).items():
+            print('\n[+]INFO - asset %s : %s ' % (name, entry))
     pygame.quit()
@@ -0,0 +1,285 @@
+# encoding: utf-8
+"""
+                   GNU GENERAL PUBLIC LICENSE
+                       Version 3, 29 June 2007
+ Copyright (C) 2007 Free Software Foundation, Inc. <http://fsf.org/>
+ Everyone is permitted to copy and distribute verbatim copies
+ of this license document, but changing it is not allowed.
+ """
+
+__author__ = "Yoann Berenguer"
+__credits__ = ["Yoann Berenguer"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Yoann Berenguer"
+__email__ = "yoyoberenguer@hotmail.com"
+__status__ = "Joystick Demo"
+
+import json
+import time
+from collections import deque
+
+import numpy
+import pygame
+
+from InputServer import KIND_BUTTON, KIND_AXIS, KIND_HAT
+
+# Main loop sections timed by the profiler (see Joystick.py)
+SECTIONS = ('events', 'update', 'draw', 'display', 'sound', 'wait')
+
+# Input types followed by the latency probe
+LATENCY_KINDS = {KIND_BUTTON: 'button', KIND_AXIS: 'axis', KIND_HAT: 'hat'}
+
+
+# Frame profiler
+# Every section of the main loop is timed with time.perf_counter, the durations of the
+# last capacity_ frames are kept in a numpy array (rolling window) for the percentiles
+# and histograms. Frames can also be written to a CSV file for offline analysis.
+# e.g
+# PROFILER = FrameProfiler()
+# PROFILER.open_csv('frames.csv')
+# while True:
+#     PROFILER.begin_frame()
+#     ...
+#     PROFILER.mark('events')
+#     ...
+#     PROFILER.end_frame(sprites_=len(GL.All), halos_=len(GL.HALO_POOL))
+
+class FrameProfiler:
+
+    def __init__(self, sections_: tuple = SECTIONS, capacity_: int = 600, bins_: int = 50, range_: float = 50.0):
+        """
+        :param sections_: names of the timed sections
+        :param capacity_: number of frames kept in the rolling window
+        :param bins_: number of histogram bins
+        :param range_: histogram upper bound in ms (longer frames fall into the last bin)
+        """
+        self.sections = tuple(sections_)
+        self.columns = {name: i for i, name in enumerate(self.sections)}
+        self.capacity = capacity_
+        # durations in ms, one row per frame, the last column is the frame time
+        self.times = numpy.zeros((capacity_, len(self.sections) + 1), dtype=numpy.float64)
+        self.counts = numpy.zeros((capacity_, 2), dtype=numpy.int32)  # sprites, halos
+        self.current = numpy.zeros(len(self.sections) + 1, dtype=numpy.float64)
+        self.edges = numpy.linspace(0.0, range_, bins_ + 1)
+        self.frames = 0  # number of frames recorded
+        self.start = None  # perf_counter at the start of the frame
+        self.last = None  # perf_counter at the last mark
+        self.csv = None
+
+    def begin_frame(self):
+        """ Start timing a frame. """
+        self.current[:] = 0.0
+        self.start = self.last = time.perf_counter()
+
+    def mark(self, section_: str):
+        """ Add the time elapsed since the previous mark (or the start of the frame) to section_. """
+        t = time.perf_counter()
+        self.current[self.columns[section_]] += (t - self.last) * 1e3
+        self.last = t
+
+    def end_frame(self, sprites_: int = 0, halos_: int = 0):
+        """ Record the frame (sections and total frame time) into the rolling window and the CSV file. """
+        if self.start is None:
+            return
+        self.current[-1] = (time.perf_counter() - self.start) * 1e3
+        row = self.frames % self.capacity
+        self.times[row] = self.current
+        self.counts[row] = (sprites_, halos_)
+        if self.csv is not None:
+            self.csv.write('%d,%.6f,%s,%d,%d\n' % (self.frames, self.start,
+                                                  ','.join('%.4f' % v for v in self.current.tolist()),
+                                                  sprites_, halos_))
+        self.frames += 1
+        self.start = None
+
+    def window(self) -> numpy.ndarray:
+        """ Return the durations (ms) of the frames of the rolling window (frames x sections + frame). """
+        return self.times[:min(self.frames, self.capacity)]
+
+    def stats(self) -> dict:
+        """
+        Statistics of the rolling window.
+        :return: python dictionary {'fps', 'frame': (p50, p99), section: (p50, p99), 'sprites', 'halos'}
+        """
+        times = self.window()
+        if len(times) == 0:
+            return {}
+        p50, p99 = numpy.percentile(times, (50, 99), axis=0)
+        stats = {name: (p50[i], p99[i]) for i, name in enumerate(self.sections)}
+        stats['frame'] = (p50[-1], p99[-1])
+        mean = times[:, -1].mean()
+        stats['fps'] = 1e3 / mean if mean > 0 else 0.0
+        last = (self.frames - 1) % self.capacity
+        stats['sprites'], stats['halos'] = self.counts[last].tolist()
+        return stats
+
+    def histogram(self, section_: str = None) -> numpy.ndarray:
+        """ Histogram of the durations of a section (default the frame time) over the rolling window. """
+        times = self.window()[:, self.columns[section_] if section_ else -1]
+        return numpy.histogram(numpy.minimum(times, self.edges[-1] - 1e-9), self.edges)[0]
+
+    def open_csv(self, file: str):
+        """ Write every following frame to a CSV file (one line per frame, durations in ms). """
+        self.close()
+        self.csv = open(file, 'w')
+        self.csv.write('frame,start_s,%s,frame_ms,sprites,halos\n' % ','.join(name + '_ms' for name in self.sections))
+
+    def close(self):
+        """ Close the CSV file. """
+        if self.csv is not None:
+            self.csv.close()
+            self.csv = None
+
+
+# Profiling overlay
+# Sprite displaying the FPS, the frame time and section percentiles, the sprite and halo
+# counts and the frame time histogram. The image is refreshed every interval_ ms and only
+# reported dirty when refreshed (see LayeredUpdatesModified.draw_dirty).
+# e.g
+# HUD = ProfilerHUD(PROFILER, GL.TEXT_CACHE, (10, 10), layer_=100)
+# GL.All.add(HUD)
+
+class ProfilerHUD(pygame.sprite.Sprite):
+
+    def __init__(self, profiler_: FrameProfiler, text_cache_, position_: tuple, layer_: int = 100,
+                 interval_: int = 250):
+        """
+        :param profiler_: FrameProfiler
+        :param text_cache_: TextCache used to render the text
+        :param position_: topleft corner of the overlay
+        :param layer_: layer of the overlay (above the panels)
+        :param interval_: refreshing time in ms
+        """
+        pygame.sprite.Sprite.__init__(self)
+        self._layer = layer_
+        self.profiler = profiler_
+        self.text_cache = text_cache_
+        self.interval = interval_ * 1e-3
+        self.last = 0.0
+        self.image = pygame.Surface((230, 150 + 10 * len(profiler_.sections)), flags=pygame.SRCALPHA, depth=32)
+        self.rect = self.image.get_rect(topleft=position_)
+        self.dirty_rects = []
+
+    def update(self):
+        now = time.perf_counter()
+        if now - self.last < self.interval:
+            return
+        self.last = now
+
+        stats = self.profiler.stats()
+        if not stats:
+            return
+        image = self.image
+        blit = self.text_cache.blit
+        white, yellow = (255, 255, 255, 255), (255, 220, 0, 255)
+        image.fill((0, 0, 0, 170))
+        x, y, ly = 6, 6, 10
+        blit(image, 'FPS          :', (x, y), white, value_='%.1f' % stats['fps'])
+        y += ly
+        blit(image, 'FRAME P50/P99:', (x, y), white, value_='%.2f/%.2f' % stats['frame'])
+        y += ly
+        blit(image, 'SPRITES      :', (x, y), white, value_=str(stats['sprites']))
+        y += ly
+        blit(image, 'HALOS        :', (x, y), white, value_=str(stats['halos']))
+        y += ly + 4
+        for name in self.profiler.sections:
+            blit(image, '%-13s:' % name.upper(), (x, y), yellow, value_='%.2f/%.2f' % stats[name])
+            y += ly
+
+        # frame time histogram (0 - range ms)
+        counts = self.profiler.histogram()
+        h = image.get_height() - y - 8
+        w = max((image.get_width() - 2 * x) // len(counts), 1)
+        peak = max(int(counts.max()), 1)
+        for i, count in enumerate(counts.tolist()):
+            if count:
+                bar = max(int(h * count / peak), 1)
+                image.fill((128, 220, 98, 255), (x + i * w, image.get_height() - 6 - bar, max(w - 1, 1), bar))
+        self.dirty_rects = [image.get_rect()]
+
+
+# Input to photon latency probe
+# Every input record (see InputSampler, timestamped with perf_counter_ns when the event is
+# taken from the SDL queue) is tagged, the tag follows the input until the panel of its device
+# is refreshed (JoystickEmulator.update) and the frame showing it is presented (display update).
+# For each input type, the probe keeps the total latency (event to presented frame) and the
+# part spent waiting for the panel refresh (event to refresh), over the last capacity_ inputs.
+# e.g
+# LATENCY = LatencyProbe()
+# LATENCY.tag(records)                  # input records applied to the input server
+# LATENCY.rendered(instance_id)         # panel of the device refreshed
+# LATENCY.presented()                   # after pygame.display.update / flip
+# LATENCY.remove(instance_id)           # device retired, its pending inputs are dropped
+# LATENCY.export('latency.json')
+
+class LatencyProbe:
+
+    def __init__(self, capacity_: int = 1 << 16):
+        """
+        :param capacity_: number of measures kept per input type (rolling window)
+        """
+        self.capacity = capacity_
+        self.pending = {}  # (device, kind, index) -> event time, inputs not rendered yet
+        self.rendered_ = []  # (device, kind, event time, refresh time), inputs waiting for the display
+        # (device, event to presented frame, event to panel refresh) in ns, per input type
+        self.measures = {kind: deque(maxlen=capacity_) for kind in LATENCY_KINDS}
+
+    def tag(self, records_: numpy.ndarray):
+        """ Tag input records (EVENT_DTYPE), only the oldest pending change of every input is followed. """
+        pending = self.pending
+        for t, device, kind, index, _ in records_.tolist():
+            if kind in LATENCY_KINDS:
+                key = (device, kind, index)
+                if key not in pending:
+                    pending[key] = t
+
+    def rendered(self, device_: int):
+        """ The panel of device_ has been refreshed, all its tagged inputs are now drawn. """
+        now = time.perf_counter_ns()
+        for key in [key for key in self.pending if key[0] == device_]:
+            self.rendered_.append((device_, key[1], self.pending.pop(key), now))
+
+    def presented(self):
+        """ The frame has been presented, record the latency of the inputs rendered since the last call. """
+        if not self.rendered_:
+            return
+        now = time.perf_counter_ns()
+        measures = self.measures
+        for device, kind, t, refresh in self.rendered_:
+            measures[kind].append((device, now - t, refresh - t))
+        self.rendered_ = []
+
+    def remove(self, device_: int):
+        """ Drop the pending inputs of a device (e.g device removed), its measures are kept for the report. """
+        for key in [key for key in self.pending if key[0] == device_]:
+            del self.pending[key]
+        self.rendered_ = [entry for entry in self.rendered_ if entry[0] != device_]
+
+    def report(self) -> dict:
+        """
+        Latency distributions per input type (ms).
+        :return: python dictionary {type: {'count', 'p50', 'p95', 'p99', 'max', 'refresh_p50', 'refresh_p99'}}
+        """
+        report = {}
+        for kind, name in LATENCY_KINDS.items():
+            if not self.measures[kind]:
+                report[name] = {'count': 0}
+                continue
+            measures = numpy.array(self.measures[kind], dtype=numpy.float64)
+            latencies = measures[:, 1] * 1e-6
+            refresh = measures[:, 2] * 1e-6
+            p50, p95, p99 = numpy.percentile(latencies, (50, 95, 99))
+            r50, r99 = numpy.percentile(refresh, (50, 99))
+            report[name] = {'count': int(latencies.size),
+                            'p50': round(float(p50), 3), 'p95': round(float(p95), 3),
+                            'p99': round(float(p99), 3), 'max': round(float(latencies.max()), 3),
+                            'refresh_p50': round(float(r50), 3), 'refresh_p99': round(float(r99), 3)}
+        return report
+
+    def export(self, file: str) -> dict:
+        """ Write the latency report (ms) to a JSON file, return the report. """
+        report = self.report()
+        with open(file, 'w') as file_:
+            json.dump(report, file_, indent=2)
+        return report
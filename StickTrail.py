@@ -0,0 +1,148 @@
+# encoding: utf-8
+"""
+                   GNU GENERAL PUBLIC LICENSE
+                       Version 3, 29 June 2007
+ Copyright (C) 2007 Free Software Foundation, Inc. <http://fsf.org/>
+ Everyone is permitted to copy and distribute verbatim copies
+ of this license document, but changing it is not allowed.
+ """
+
+__author__ = "Yoann Berenguer"
+__credits__ = ["Yoann Berenguer"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Yoann Berenguer"
+__email__ = "yoyoberenguer@hotmail.com"
+__status__ = "Joystick Demo"
+
+import numpy
+import pygame
+
+from Analyzer import stick_positions
+
+# Stick views, in display order (see GL.STICK_VIEW)
+STICK_VIEWS = ('trail', 'heatmap')
+
+# Half-life of the accumulated positions in seconds
+HALF_LIFE = {'trail': 0.25, 'heatmap': 10.0}
+
+# Bins below this count are cleared (less than 1/256 of a sample)
+FLUSH = 1.0 / 256
+
+
+def make_palette(stops_: list) -> numpy.ndarray:
+    """
+    Build a 256 entries RGBA palette from colour stops.
+    :param stops_: python list of (level in range [0, 255], (R, G, B, A))
+    :return: 2D numpy array (256, 4) numpy.uint8
+    """
+    levels = [level for level, _ in stops_]
+    colors = numpy.array([color for _, color in stops_], dtype=numpy.float64)
+    x = numpy.arange(256)
+    return numpy.column_stack([numpy.interp(x, levels, colors[:, c]) for c in range(4)]).astype(numpy.uint8)
+
+
+PALETTES = {
+    # single colour fading out
+    'trail': make_palette([(0, (120, 230, 255, 0)), (255, (220, 250, 255, 255))]),
+    # blue (rare positions) to red (most visited)
+    'heatmap': make_palette([(0, (0, 0, 255, 0)), (32, (0, 120, 255, 140)), (96, (0, 230, 120, 190)),
+                             (160, (255, 230, 0, 220)), (255, (255, 30, 0, 240))])}
+
+
+def map_palette(surface_: pygame.Surface, palette_: numpy.ndarray) -> numpy.ndarray:
+    """ Convert an RGBA palette (256, 4) into pixel values of surface_ (see pygame.surfarray.blit_array). """
+    shifts = surface_.get_shifts()
+    mapped = numpy.zeros(len(palette_), dtype=numpy.uint32)
+    for c in range(4):
+        mapped |= palette_[:, c].astype(numpy.uint32) << numpy.uint32(shifts[c])
+    return mapped
+
+
+# Stick trail and heatmap
+# The positions of a stick (see Analyzer.stick_positions) are accumulated into a 2D histogram
+# (one bin per pixel, X along the first axis as pygame.surfarray) that decays exponentially
+# with the frame time. Every frame the histogram is converted to pixels through a palette and
+# written with a single pygame.surfarray.blit_array, the cost does not depend on the number
+# of samples (minutes of 1 kHz history cost the same as a single frame).
+# trail   : recent movements (0.25 s half-life), a visited bin is fully lit then fades out
+# heatmap : density of the positions (10 s half-life), normalized by the most visited bin
+# e.g
+# StickTrail.containers = GL.All, GL.TRAILS
+# trail = StickTrail(device, (0, 1), (358, 355), GL.CLOCK, mode_='heatmap')
+# trail.feed(records)            # every frame, input records (EVENT_DTYPE)
+# GL.All.update()                # decay and redraw
+
+class StickTrail(pygame.sprite.Sprite):
+
+    containers = None
+
+    def __init__(self, device_: int, axes_: tuple, center_: tuple, clock_, mode_: str = 'trail',
+                 size_: int = 61, layer_: int = 0, half_life_: float = None):
+        """
+        :param device_: device instance id
+        :param axes_: (X axis, Y axis) of the stick
+        :param center_: position of the stick on the screen (center of the view)
+        :param clock_: GameClock, the decay follows the frame time (delta_ns)
+        :param mode_: 'trail' or 'heatmap' (see STICK_VIEWS)
+        :param size_: width and height of the view in pixels (one histogram bin per pixel)
+        :param layer_: layer of the sprite (the panel layer, drawn above the panel)
+        :param half_life_: half-life of the accumulated positions in seconds, default HALF_LIFE[mode_]
+        """
+        assert mode_ in STICK_VIEWS, 'Argument mode_ should be one of %s.' % str(STICK_VIEWS)
+        pygame.sprite.Sprite.__init__(self)
+        self._layer = layer_
+        self.device = device_
+        self.axes = tuple(axes_)
+        self.clock = clock_
+        self.mode = mode_
+        self.size = size_
+        self.half_life = half_life_ or HALF_LIFE[mode_]
+        self.histogram = numpy.zeros((size_, size_), dtype=numpy.float32)
+        self.last = (0.0, 0.0)  # stick position after the last record
+        self.image = pygame.Surface((size_, size_), flags=pygame.SRCALPHA, depth=32)
+        self.rect = self.image.get_rect(center=center_)
+        self.palette = map_palette(self.image, PALETTES[mode_])
+        self.visible = False  # histogram not empty
+        self.dirty_rects = []
+        if self.containers is not None:
+            self.add(self.containers)
+
+    @property
+    def animating(self) -> bool:
+        """ True while a trail is fading out (heatmaps fade slowly, idle refreshes are enough). """
+        return self.visible and self.mode == 'trail'
+
+    def feed(self, records_: numpy.ndarray):
+        """ Accumulate the positions of the stick from input records (EVENT_DTYPE). """
+        samples, self.last = stick_positions(records_[records_['device'] == self.device], self.axes, self.last)
+        if len(samples) == 0:
+            return
+        size = self.size
+        index = numpy.rint((numpy.clip(samples, -1.0, 1.0) + 1.0) * (0.5 * (size - 1))).astype(numpy.intp)
+        self.histogram += numpy.bincount(index[:, 0] * size + index[:, 1], minlength=size * size).reshape(size, size)
+        self.visible = True
+
+    def clear(self):
+        """ Forget the accumulated positions. """
+        self.histogram.fill(0)
+        self.visible = False
+        self.image.fill((0, 0, 0, 0))
+        self.dirty_rects = [self.image.get_rect()]
+
+    def update(self):
+        if not self.visible:
+            self.dirty_rects = []
+            return
+        histogram = self.histogram
+        histogram *= numpy.float32(0.5 ** (self.clock.delta_ns * 1e-9 / self.half_life))
+        peak = float(histogram.max())
+        if peak < FLUSH:
+            self.clear()
+            return
+        if self.mode == 'heatmap':
+            level = numpy.sqrt(histogram * numpy.float32(1.0 / peak)) * numpy.float32(255)
+        else:
+            level = numpy.minimum(histogram, numpy.float32(1.0)) * numpy.float32(255)
+        pygame.surfarray.blit_array(self.image, self.palette[level.astype(numpy.uint8)])
+        self.dirty_rects = [self.image.get_rect()]
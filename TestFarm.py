@@ -0,0 +1,315 @@
+# encoding: utf-8
+"""
+                   GNU GENERAL PUBLIC LICENSE
+                       Version 3, 29 June 2007
+ Copyright (C) 2007 Free Software Foundation, Inc. <http://fsf.org/>
+ Everyone is permitted to copy and distribute verbatim copies
+ of this license document, but changing it is not allowed.
+ """
+
+__author__ = "Yoann Berenguer"
+__credits__ = ["Yoann Berenguer"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Yoann Berenguer"
+__email__ = "yoyoberenguer@hotmail.com"
+__status__ = "Joystick Demo"
+
+# Headless controller test farm
+# Every device (connected joystick or device of a recording file) is certified by a worker
+# process running scripted test sequences: press every button, full stick circle and trigger
+# sweep. The inputs are read as the tester does (DeviceBackend -> InputControl, see
+# JoystickEmulator.layout), the sequences observe the device state after every batch of
+# records. Results are gathered into a pass/fail report per device.
+# e.g
+# python TestFarm.py session1.rec session2.rec --name 'Wireless Controller' --output report.json
+# python TestFarm.py --devices --duration 60         # connected pads, operators run the sequences
+# python TestFarm.py --synthetic 16 --workers 4      # synthetic devices (throughput check)
+
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import json
+import math
+import multiprocessing
+import sys
+import time
+
+import numpy
+import pygame
+
+from ControllerLayout import LayoutDatabase, AXIS_STICK, AXIS_TRIGGER, AXIS_SPLIT
+from DeviceBackend import ReplayBackend, synthetic_records
+from InputRecorder import load_recording
+from InputServer import InputControl, InputSampler
+
+# Layout directory of the tester (Joystick.LAYOUTS_PATH). Joystick is not imported,
+# SoundServer initialises pygame and the mixer on import (SDL signal handlers in every worker).
+LAYOUTS_PATH = 'Assets/Layouts/'
+
+
+# Test sequences
+# A sequence observes the state of a device (see DeviceState) after every batch of input
+# records and reports whether the device passed. Inputs are chosen from the layout of the
+# device (axis types), devices without layout use the usual SDL order (sticks on the axes
+# 0 to 3, triggers on the axes 4 and 5).
+# e.g
+# sequence = ButtonSequence(layout, state)
+# sequence.observe(state, state.pop_hits())
+# sequence.result()                       # {'passed': True, ...}
+
+class TestSequence:
+
+    name = ''
+
+    def __init__(self, layout_, state_):
+        """
+        :param layout_: CompiledLayout of the device or None
+        :param state_: DeviceState of the device
+        """
+        self.layout = layout_
+
+    def axes(self, types_: int, default_: tuple, state_) -> list:
+        """ Return the axes of the device whose layout type is in types_ (default_ without layout). """
+        count = len(state_.axes)
+        if self.layout is None or len(self.layout.axis_types) < count:
+            return [a for a in default_ if a < count]
+        return [a for a, type_ in enumerate(self.layout.axis_types.tolist()[:count]) if type_ & types_]
+
+    def observe(self, state_, hits_: set):
+        """ Device state after a batch of records, hits_ are the buttons pressed during the batch. """
+        raise NotImplementedError
+
+    def result(self) -> dict:
+        """ Return a python dictionary {'passed': bool, ...details}. """
+        raise NotImplementedError
+
+
+class ButtonSequence(TestSequence):
+    """ Press every button of the device once. """
+
+    name = 'press every button'
+
+    def __init__(self, layout_, state_):
+        TestSequence.__init__(self, layout_, state_)
+        self.buttons = set(range(len(state_.buttons)))
+        self.pressed = set()
+
+    def observe(self, state_, hits_: set):
+        self.pressed |= hits_
+
+    def result(self) -> dict:
+        missing = sorted(self.buttons - self.pressed)
+        return {'passed': not missing, 'pressed': len(self.pressed & self.buttons),
+                'buttons': len(self.buttons), 'missing': missing}
+
+
+class StickCircle(TestSequence):
+    """ Turn every stick around a full circle at the edge of its range (radius_ or above). """
+
+    name = 'full stick circle'
+
+    def __init__(self, layout_, state_, buckets_: int = 36, radius_: float = 0.9):
+        """
+        :param buckets_: number of angle sectors that must be reached
+        :param radius_: minimum stick deflection for a sector to count
+        """
+        TestSequence.__init__(self, layout_, state_)
+        axes = self.axes(AXIS_STICK, (0, 1, 2, 3), state_)
+        # consecutive stick axes are the X and Y axes of a stick
+        self.sticks = [tuple(axes[i:i + 2]) for i in range(0, len(axes) - 1, 2)]
+        self.buckets = buckets_
+        self.radius = radius_
+        self.reached = [set() for _ in self.sticks]
+        self.peak = [0.0] * len(self.sticks)
+
+    def observe(self, state_, hits_: set):
+        values = state_.axes
+        for s, (ax, ay) in enumerate(self.sticks):
+            x, y = values[ax], values[ay]
+            radius = math.hypot(x, y)
+            if radius > self.peak[s]:
+                self.peak[s] = radius
+            if radius >= self.radius:
+                self.reached[s].add(int((math.atan2(y, x) + math.pi) / (2 * math.pi) * self.buckets) % self.buckets)
+
+    def result(self) -> dict:
+        sticks = [{'axes': list(axes), 'coverage': round(len(reached) / self.buckets, 3),
+                   'peak_radius': round(peak, 3)}
+                  for axes, reached, peak in zip(self.sticks, self.reached, self.peak)]
+        return {'passed': all(len(reached) == self.buckets for reached in self.reached),
+                'skipped': not self.sticks, 'sticks': sticks}
+
+
+class TriggerSweep(TestSequence):
+    """ Sweep every trigger over its whole range (split axes, both directions). """
+
+    name = 'trigger sweep'
+
+    def __init__(self, layout_, state_, bins_: int = 20, limit_: float = 0.95):
+        """
+        :param bins_: number of intervals of [-1, 1] that must be reached
+        :param limit_: both ends of the range must be reached (-limit_ and limit_)
+        """
+        TestSequence.__init__(self, layout_, state_)
+        self.triggers = self.axes(AXIS_TRIGGER | AXIS_SPLIT, (4, 5), state_)
+        self.bins = bins_
+        self.limit = limit_
+        self.reached = [set() for _ in self.triggers]
+        self.low = [1.0] * len(self.triggers)
+        self.high = [-1.0] * len(self.triggers)
+
+    def observe(self, state_, hits_: set):
+        values = state_.axes
+        for t, axis in enumerate(self.triggers):
+            value = values[axis]
+            self.reached[t].add(min(int((value + 1.0) * 0.5 * self.bins), self.bins - 1))
+            self.low[t] = min(self.low[t], value)
+            self.high[t] = max(self.high[t], value)
+
+    def result(self) -> dict:
+        triggers = [{'axis': axis, 'coverage': round(len(reached) / self.bins, 3),
+                     'min': round(low, 3), 'max': round(high, 3)}
+                    for axis, reached, low, high in zip(self.triggers, self.reached, self.low, self.high)]
+        passed = all(len(reached) == self.bins and low <= -self.limit and high >= self.limit
+                     for reached, low, high in zip(self.reached, self.low, self.high))
+        return {'passed': passed, 'skipped': not self.triggers, 'triggers': triggers}
+
+
+SEQUENCES = (ButtonSequence, StickCircle, TriggerSweep)
+
+
+def certify(backend_, device_, finished_) -> dict:
+    """
+    Run the test sequences on one device.
+    :param backend_: DeviceBackend or InputSampler delivering the input records (poll / drain)
+    :param device_: pygame.joystick.Joystick like object
+    :param finished_: function (sequences) returning True when the run is over
+    :return: python dictionary {'name', 'guid', 'layout', 'records', 'passed', 'tests': {name: result}}
+    """
+    inputs = InputControl()
+    state = inputs.add(device_)
+    layout = LayoutDatabase(LAYOUTS_PATH).find(state.guid, state.name)
+    sequences = [sequence(layout, state) for sequence in SEQUENCES]
+    poll = backend_.poll if hasattr(backend_, 'get_device') else backend_.drain
+    records = 0
+    while not finished_(sequences):
+        batch = poll()
+        records += inputs.process_records(batch)
+        hits = state.pop_hits()
+        for sequence in sequences:
+            sequence.observe(state, hits)
+    tests = {sequence.name: sequence.result() for sequence in sequences}
+    return {'name': state.name, 'guid': state.guid, 'layout': layout.name if layout is not None else None,
+            'records': records, 'passed': all(test['passed'] for test in tests.values()), 'tests': tests}
+
+
+def run_job(job_: dict) -> dict:
+    """
+    Worker, certify the device of a job.
+    :param job_: python dictionary {'source': recording file, 'synthetic' or 'device', 'device': instance id
+                 or device index, 'name': device name (replays), 'duration': seconds (devices),
+                 'batch': records per observation (replays)}
+    :return: report of the device (see certify) with the job source, device and duration
+    """
+    t = time.perf_counter()
+    source = job_['source']
+    if source == 'device':
+        # live device, the worker reads the SDL event queue itself
+        pygame.display.init()
+        pygame.joystick.init()
+        sampler = InputSampler(rate_=1000, threaded_=False, pump_=True)
+        device = pygame.joystick.Joystick(job_['device'])
+        device.init()
+        deadline = time.perf_counter() + job_['duration']
+
+        def finished(sequences_):
+            sampler.wait(0.001)
+            return time.perf_counter() >= deadline or all(s.result()['passed'] for s in sequences_)
+
+        report = certify(sampler, device, finished)
+        pygame.quit()
+    else:
+        if source == 'synthetic':
+            records = synthetic_records(device_=job_['device'], duration_=job_['duration'], seed_=job_['device'])
+        else:
+            records = load_recording(source)
+            records = numpy.array(records[records['device'] == job_['device']])
+        backend = ReplayBackend(records, names_={job_['device']: job_['name']}, speed_=0, batch_=job_['batch'])
+        backend.start()
+        report = certify(backend, backend.get_device(0), lambda sequences_: backend.finished)
+    report.update(source=source, device=job_['device'], duration_s=round(time.perf_counter() - t, 3))
+    return report
+
+
+def collect_jobs(args_) -> list:
+    """ Return the jobs (see run_job) of the command line, one per device. """
+    jobs = []
+    for file in args_.recordings:
+        for device in numpy.unique(load_recording(file)['device']).tolist():
+            jobs.append({'source': file, 'device': device, 'name': args_.name, 'batch': args_.batch})
+    for device in range(args_.synthetic):
+        jobs.append({'source': 'synthetic', 'device': device, 'name': args_.name, 'batch': args_.batch,
+                     'duration': args_.duration})
+    if args_.devices:
+        pygame.joystick.init()
+        count = pygame.joystick.get_count()
+        pygame.joystick.quit()
+        for device in range(count):
+            jobs.append({'source': 'device', 'device': device, 'duration': args_.duration})
+    return jobs
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Certify controllers in parallel (headless)')
+    parser.add_argument('recordings', nargs='*', help='recording files, every device of a file is certified')
+    parser.add_argument('--devices', action='store_true', help='certify the connected joysticks')
+    parser.add_argument('--synthetic', type=int, default=0, help='number of synthetic devices')
+    parser.add_argument('--name', default='Wireless Controller', help='device name used for the replays')
+    parser.add_argument('--duration', type=float, default=30.0,
+                        help='test time in seconds of a connected joystick (length of the synthetic input)')
+    parser.add_argument('--batch', type=int, default=16, help='records replayed between two observations')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--output', help='write the report to a JSON file')
+    args = parser.parse_args()
+
+    jobs = collect_jobs(args)
+    if not jobs:
+        print('\n[-]INFO - Nothing to certify...')
+        sys.exit(1)
+
+    # every layout is compiled once here, the workers only read the cache
+    LayoutDatabase(LAYOUTS_PATH).index_pending()
+
+    t = time.perf_counter()
+    workers = max(min(args.workers, len(jobs)), 1)
+    # spawn, the workers do not inherit the SDL state of the parent
+    context = multiprocessing.get_context('spawn')
+    pool = context.Pool(processes=workers)
+    reports = []
+    for report in pool.imap_unordered(run_job, jobs):
+        reports.append(report)
+        failed = [name for name, test in report['tests'].items() if not test['passed']]
+        print('[%s] %s:%s %-40s %s' % ('PASS' if report['passed'] else 'FAIL', report['source'],
+                                      report['device'], report['name'], ', '.join(failed)))
+    # workers leave on their own (SDL may have replaced their SIGTERM handler, see Pool.terminate)
+    pool.close()
+    pool.join()
+    elapsed = time.perf_counter() - t
+
+    reports.sort(key=lambda report: (report['source'], report['device']))
+    passed = sum(report['passed'] for report in reports)
+    print('\n[+]INFO - %d/%d devices passed, %d records in %.2f s (%d workers) ' %
+          (passed, len(reports), sum(report['records'] for report in reports), elapsed, workers))
+    if args.output:
+        with open(args.output, 'w') as file_:
+            json.dump({'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'elapsed_s': round(elapsed, 3),
+                       'passed': passed, 'devices': reports}, file_, indent=2)
+    sys.exit(0 if passed == len(reports) else 1)
+
+
+if __name__ == '__main__':
+    main()
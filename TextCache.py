@@ -0,0 +1,143 @@
+# encoding: utf-8
+"""
+                   GNU GENERAL PUBLIC LICENSE
+                       Version 3, 29 June 2007
+ Copyright (C) 2007 Free Software Foundation, Inc. <http://fsf.org/>
+ Everyone is permitted to copy and distribute verbatim copies
+ of this license document, but changing it is not allowed.
+ """
+
+__author__ = "Yoann Berenguer"
+__credits__ = ["Yoann Berenguer"]
+__license__ = "GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Yoann Berenguer"
+__email__ = "yoyoberenguer@hotmail.com"
+__status__ = "Joystick Demo"
+
+import pygame
+from pygame import freetype
+
+
+# Pre-rendered text for the joystick panel.
+# Static labels are rendered once with freetype and numeric values are
+# composed from a glyph atlas, nothing is rasterized once the cache is warm.
+# e.g
+# cache = TextCache(MAIN_MENU_FONT, size_=8)
+# cache.preload([GL.LAYOUTS.get('Wireless Controller')], ((255, 255, 255, 255), (255, 0, 0, 255)))
+# cache.blit(surface, 'L3 X     :', (80, 50), (255, 0, 0, 255), value_=str(round(axis, 3)))
+
+class TextCache:
+
+    # Characters pre-rendered in the glyph atlas (numeric axis values)
+    GLYPHS = '0123456789-.e'
+
+    def __init__(self, font_: freetype.Font, size_: int = 8, style_: int = freetype.STYLE_NORMAL):
+        """
+        :param font_: pygame.freetype.Font used for rendering
+        :param size_: default font size
+        :param style_: freetype style (default STYLE_NORMAL)
+        """
+        assert isinstance(font_, freetype.Font), 'Argument font_ should be a pygame.freetype.Font.'
+        self.font = font_
+        self.size = size_
+        self.style = style_
+        self.labels = {}  # (text, color, size) -> (pygame.Surface, baseline, advance)
+        self.atlas = {}  # (color, size) -> {character: (pygame.Surface, offset, advance)}
+
+    def render(self, text_: str, color_, size_: int = None) -> tuple:
+        """
+        Return a cached label (surface, baseline, advance), the text is rendered on the first call.
+        baseline is the distance from the top of the surface to the font baseline and advance
+        the horizontal distance to the next character.
+        """
+        size_ = size_ or self.size
+        key = (text_, tuple(color_), size_)
+        label = self.labels.get(key)
+        if label is None:
+            surface_, rect = self.font.render(text_, fgcolor=color_, style=self.style, size=size_)
+            metrics = self.font.get_metrics(text_, size=size_)
+            advance = sum(m[4] for m in metrics if m is not None) if metrics else rect.w
+            label = (surface_, rect.y, int(round(advance)))
+            self.labels[key] = label
+        return label
+
+    def get(self, text_: str, color_, size_: int = None) -> pygame.Surface:
+        """ Return the cached surface of a label (see render). """
+        return self.render(text_, color_, size_)[0]
+
+    def glyphs(self, color_, size_: int = None) -> dict:
+        """ Return the glyph atlas for a given color and size, the atlas is built on the first call. """
+        size_ = size_ or self.size
+        key = (tuple(color_), size_)
+        atlas = self.atlas.get(key)
+        if atlas is None:
+            atlas = {}
+            self.atlas[key] = atlas
+            for character in self.GLYPHS:
+                self.add_glyph(atlas, character, color_, size_)
+        return atlas
+
+    def add_glyph(self, atlas_: dict, character_: str, color_, size_: int):
+        """ Render a single character into a glyph atlas. """
+        surface_, rect = self.font.render(character_, fgcolor=color_, style=self.style, size=size_)
+        metrics = self.font.get_metrics(character_, size=size_)
+        advance = metrics[0][4] if metrics and metrics[0] is not None else rect.w
+        atlas_[character_] = (surface_, (rect.x, rect.y), int(round(advance)))
+
+    def preload(self, layouts_: list, colors_: tuple, size_: int = None):
+        """
+        Render every static label/state pair of compiled controller layouts
+        (see ControllerLayout.CompiledLayout) and build the glyph atlas for each color.
+
+        :param layouts_: list of CompiledLayout
+        :param colors_: colors used by the panel, e.g (white, red)
+        :param size_: font size
+        """
+        white, red = colors_[0], colors_[-1]
+        for layout in layouts_:
+            for text in layout.button_on:
+                self.render(text, red, size_)
+            for text in layout.button_off + layout.axis_rest:
+                self.render(text, white, size_)
+            for text in layout.axis_labels:
+                self.render(text, red, size_)
+        for x in (-1, 0, 1):
+            for y in (-1, 0, 1):
+                self.render('D-PAD   ' + str((x, y)), white if x == y == 0 else red, size_)
+        for color_ in colors_:
+            self.glyphs(color_, size_)
+
+    def blit(self, surface_: pygame.Surface, text_: str, position_: tuple, color_,
+             value_: str = None, size_: int = None) -> pygame.Rect:
+        """
+        Draw a label followed by an optional value onto surface_.
+        The label comes from the label cache and the value is composed from the glyph atlas
+        (characters missing from the atlas are added on the fly).
+
+        :param surface_: destination surface
+        :param text_: static label
+        :param position_: topleft corner of the label
+        :param color_: text color
+        :param value_: string appended to the label, e.g str(round(axis, 3))
+        :param size_: font size
+        :return: pygame.Rect, area of surface_ modified
+        """
+        label, baseline, advance = self.render(text_, color_, size_)
+        rect = surface_.blit(label, position_)
+        if not value_:
+            return rect
+
+        size_ = size_ or self.size
+        atlas = self.glyphs(color_, size_)
+        x = position_[0] + advance
+        y = position_[1] + baseline
+        for character in value_:
+            glyph = atlas.get(character)
+            if glyph is None:
+                self.add_glyph(atlas, character, color_, size_)
+                glyph = atlas[character]
+            image, (ox, oy), step = glyph
+            rect.union_ip(surface_.blit(image, (x + ox, y - oy)))
+            x += step
+        return rect